@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Asyncio interface to the SQL Server query layer.
+
+pyodbc has no async API, so AsyncEZLinksRoundsDB runs each blocking
+EZLinksRoundsDB call on a dedicated thread pool and awaits it. Callers can
+overlap warehouse latency with other coroutines (or with each other) using
+the usual asyncio tools - gather(), wait_for(), tasks.
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from db_query import EZLinksRoundsDB
+
+
+class AsyncEZLinksRoundsDB:
+    """Query SQL Server for ezlrounds data from asyncio code."""
+
+    def __init__(self, server: str, database: str, username: Optional[str] = None,
+                 password: Optional[str] = None, use_windows_auth: bool = True,
+                 max_workers: int = 4, **kwargs):
+        """
+        Initialize the async wrapper.
+
+        Args:
+            server: SQL Server hostname or IP
+            database: Database name
+            username: Username (if using SQL auth)
+            password: Password (if using SQL auth)
+            use_windows_auth: Use Windows authentication (default True)
+            max_workers: Driver threads, and connections in the pool
+            **kwargs: Passed through to EZLinksRoundsDB (e.g. fetch_batch_size)
+        """
+        self.db = EZLinksRoundsDB(server, database, username, password, use_windows_auth,
+                                  pool_size=max_workers, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='sql-driver')
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking callable on the driver thread pool.
+
+        The caller's context variables are copied into the worker thread, so
+        per-task state (such as captured output) follows the call.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    async def connect(self) -> bool:
+        """Establish the database connection."""
+        return await self.run(self.db.connect)
+
+    async def disconnect(self):
+        """Close the database connections and the driver threads."""
+        await self.run(self.db.disconnect)
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        if not await self.connect():
+            raise ConnectionError(f"Could not connect to {self.db.database} on {self.db.server}")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+
+    async def query_rounds_data(self, *args, **kwargs) -> List[Dict]:
+        """Async EZLinksRoundsDB.query_rounds_data."""
+        return await self.run(self.db.query_rounds_data, *args, **kwargs)
+
+    async def get_latest_date(self, *args, **kwargs) -> Optional[str]:
+        """Async EZLinksRoundsDB.get_latest_date."""
+        return await self.run(self.db.get_latest_date, *args, **kwargs)
+
+    async def update_csv(self, *args, **kwargs):
+        """Async EZLinksRoundsDB.update_csv."""
+        return await self.run(self.db.update_csv, *args, **kwargs)
+
+    async def refresh_full_csv(self, *args, **kwargs):
+        """Async EZLinksRoundsDB.refresh_full_csv."""
+        return await self.run(self.db.refresh_full_csv, *args, **kwargs)
+
+    async def update_fused_csvs(self, *args, **kwargs):
+        """Async EZLinksRoundsDB.update_fused_csvs."""
+        return await self.run(self.db.update_fused_csvs, *args, **kwargs)
+
+    async def refresh_fused_csvs(self, *args, **kwargs):
+        """Async EZLinksRoundsDB.refresh_fused_csvs."""
+        return await self.run(self.db.refresh_fused_csvs, *args, **kwargs)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark cache storage formats: plain CSV against gzip, lzma and zlib.
+
+For each format the cache is written once (streaming encode), then read
+back through cache_files.read_series (streaming decode plus parsing, as
+analyze_csv does) several times. Prints on-disk size, compression ratio,
+write time and read throughput, so a `compression` setting in
+queries.json can be chosen per query.
+
+Examples:
+  # Synthetic per-course style cache with 2 million rows
+  python3 benchmark_cache_formats.py --rows 2000000
+
+  # An existing cache
+  python3 benchmark_cache_formats.py ../working-dir/ezlrounds.csv
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from cache_files import COMPRESSION_SUFFIXES, convert_cache, open_cache, read_series
+
+
+def write_synthetic_cache(path: str, rows: int, seed: int = 0):
+    """Write a plain CSV cache of `rows` consecutive days with noisy counts."""
+    rng = random.Random(seed)
+    day = date(1900, 1, 1)
+    step = timedelta(days=1)
+    with open_cache(path, 'w') as f:
+        f.write('playdatekey,count\r\n')
+        for _ in range(rows):
+            f.write(f"{day.strftime('%Y%m%d')},{int(rng.gauss(4000, 600))}\r\n")
+            day += step
+
+
+def time_reads(path: str, repeats: int):
+    """Best-of-N seconds to read a cache into a SeriesColumns, and its row count."""
+    best = None
+    rows = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = len(read_series(path))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare cache size and read throughput across storage formats')
+    parser.add_argument('csv_file', nargs='?', help='Plain CSV cache to benchmark (default: synthetic)')
+    parser.add_argument('--rows', type=int, default=1000000,
+                        help='Rows in the synthetic cache (default: 1000000)')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Reads per format; the fastest is reported (default: 3)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cache-bench-')
+    try:
+        plain = os.path.join(workdir, 'cache.csv')
+        if args.csv_file:
+            shutil.copyfile(args.csv_file, plain)
+        else:
+            print(f"Writing synthetic cache with {args.rows} rows...")
+            write_synthetic_cache(plain, args.rows)
+        plain_size = os.path.getsize(plain)
+
+        print(f"{'format':<8} {'bytes':>12} {'ratio':>6} {'write s':>8} {'read s':>8} "
+              f"{'MB/s':>8} {'rows/s':>11}")
+        for compression in [None] + list(COMPRESSION_SUFFIXES):
+            if compression:
+                start = time.perf_counter()
+                path = convert_cache(plain, compression)
+                write_s = time.perf_counter() - start
+            else:
+                path, write_s = plain, 0.0
+            size = os.path.getsize(path)
+            read_s, rows = time_reads(path, args.repeats)
+            print(f"{compression or 'csv':<8} {size:>12} {plain_size / size:>6.1f} {write_s:>8.2f} "
+                  f"{read_s:>8.3f} {plain_size / read_s / 1e6:>8.1f} {rows / read_s:>11.0f}")
+        print("(MB/s is uncompressed CSV bytes delivered per second; write s includes the manifest)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1540 @@
+#!/usr/bin/env python3
+"""
+Helpers for the CSV caches in working-dir/ and their sidecar files.
+
+Each cache file gets a small JSON manifest next to it
+(e.g. working-dir/ezlrounds.csv.manifest.json) recording its date range,
+row count, byte size and a CRC32 of its contents. The incremental update
+reads the watermark from the manifest instead of scanning the CSV, and a
+cheap size/tail check detects a cache that was modified behind its back.
+The manifest also holds a sparse index of the byte offset where each month
+starts, so readers that only need recent rows can seek straight to them.
+
+A cache can also have a month checksum sidecar
+(e.g. working-dir/ezlrounds.csv.checksums.json) holding the warehouse-side
+checksum of each month as of its last pull, so a refresh only re-pulls
+the months that changed.
+
+Daily series can also be held column-wise in a SeriesColumns (typed
+arrays of YYYYMMDD date keys and counts), which both the database layer
+and the analysis read and write without building a dict per row.
+
+Each cache can also have a binary mirror (e.g. working-dir/ezlrounds.csv.series):
+a 32-byte header followed by the int32 date keys and the int64 counts as
+fixed-width little-endian columns. The analysis maps it with mmap and
+views the columns in place instead of parsing the CSV. The header records
+the size and CRC32 of the CSV it was built from, so a mirror that no
+longer matches the manifest is ignored.
+
+The mirrors of every query are also packed into one consolidated store
+(working-dir/series.store): a header, a JSON directory of series, then
+one column block per series. SeriesStore maps it once, so the analysis
+loads any subset of series with one open and no parsing.
+
+A cache can be stored compressed (gzip, lzma or zlib, chosen per query in
+queries.json), marked by the cache file's suffix (.gz, .xz, .zz). Rows are
+encoded and decoded as a stream; an append adds a new compressed member to
+the end of the file, so it is still an append. Compressed caches have no
+byte offsets to seek to, so range reads and upserts decode from the top.
+
+Writes are crash-safe: whole files are written to a temp file, fsynced
+and renamed over the cache, and in-place appends and tail rewrites are
+bracketed by an undo journal (e.g. working-dir/ezlrounds.csv.journal)
+that recover_cache() uses to roll back a write that never reached its
+commit marker.
+
+The anomaly analysis keeps its state beside each cache
+(e.g. working-dir/ezlrounds.csv.analysis.json): the parameters and date
+watermark of the last run, a CRC32 of each month of the series it saw, and
+the dates it flagged, so the next run only re-examines what changed.
+"""
+
+import bisect
+import csv
+import gzip
+import io
+import json
+import lzma
+import mmap
+import operator
+import os
+import struct
+import sys
+import zlib
+from array import array
+from contextlib import contextmanager
+from datetime import date, datetime
+from itertools import chain, islice, repeat
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 2
+
+CHECKSUM_SUFFIX = '.checksums.json'
+
+ANALYSIS_SUFFIX = '.analysis.json'
+ANALYSIS_VERSION = 1
+
+# Bytes read from the end of a cache to check its last row
+TAIL_READ_SIZE = 4096
+
+# Block size when scanning a cache backwards for a date
+REVERSE_SCAN_BLOCK = 65536
+
+SERIES_SUFFIX = '.series'
+SERIES_MAGIC = b'EZSERIES'
+SERIES_VERSION = 2
+
+# magic, version, flags, row count, row capacity, source CSV byte size,
+# source CSV CRC32, byte length of the column names that follow
+SERIES_HEADER = struct.Struct('<8sHHIIQIH6x')
+
+# Column names a cache is written with (see db_query.export_to_csv)
+DEFAULT_COLUMNS = ('playdatekey', 'count')
+
+# Spare rows reserved when a mirror is (re)built, so appends can be written
+# in place: a quarter of the rows, and at least this many
+SERIES_MIN_SPARE_ROWS = 1024
+
+# Header flag: dates were 'YYYY-MM-DD' in the CSV
+SERIES_DASHED = 1
+
+# Compressed cache codecs and the cache file suffix that selects each
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'lzma': '.xz', 'zlib': '.zz'}
+
+# gzip/zlib level: close to level 9's size at several times its speed
+COMPRESSION_LEVEL = 6
+
+# Compressed bytes read per decode step
+DECODE_CHUNK = 65536
+
+# Characters of CSV text parsed per block by read_series
+PARSE_BLOCK_CHARS = 1 << 20
+
+# Bytes checksummed and scanned per step when building a manifest
+MANIFEST_CHUNK = 1 << 20
+
+SERIES_STORE_FILE = 'working-dir/series.store'
+STORE_MAGIC = b'EZSTORE\0'
+STORE_VERSION = 1
+
+# magic, version, reserved, series count, directory byte length
+STORE_HEADER = struct.Struct('<8sHHII4x')
+
+JOURNAL_SUFFIX = '.journal'
+
+# Last line of a journal whose write completed
+JOURNAL_COMMIT = '{"commit": true}'
+
+# Leftovers of interrupted whole-file writes, removed by recover_cache()
+TEMP_SUFFIXES = ('.tmp', MANIFEST_SUFFIX + '.tmp', SERIES_SUFFIX + '.tmp',
+                 CHECKSUM_SUFFIX + '.tmp', ANALYSIS_SUFFIX + '.tmp')
+
+
+def cache_compression(csv_file: str) -> Optional[str]:
+    """Return the codec a cache file is compressed with ('gzip', 'lzma', 'zlib'), or None."""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if csv_file.endswith(suffix):
+            return compression
+    return None
+
+
+class ZlibFile(io.RawIOBase):
+    """
+    Binary file of concatenated zlib streams, one per write session.
+
+    The zlib counterpart of gzip.open()/lzma.open(): reading decodes the
+    streams back to back; opening with 'a' starts a new stream at the end.
+    """
+
+    def __init__(self, path: str, mode: str = 'r'):
+        super().__init__()
+        self._mode = mode[0]
+        self._file = open(path, self._mode + 'b')
+        if self._mode == 'r':
+            self._decompressor = zlib.decompressobj()
+            self._in_stream = False
+            self._pending = b''
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_LEVEL)
+
+    def readable(self):
+        return self._mode == 'r'
+
+    def writable(self):
+        return self._mode != 'r'
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            leftover = b''
+            if self._decompressor.eof:
+                # The next stream starts right after this one ended
+                leftover = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj()
+                self._in_stream = False
+            data = leftover or self._file.read(DECODE_CHUNK)
+            if not data:
+                if self._in_stream:
+                    raise EOFError("Compressed file ended before the end-of-stream marker")
+                return 0
+            self._in_stream = True
+            self._pending = self._decompressor.decompress(data)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def write(self, data) -> int:
+        self._file.write(self._compressor.compress(data))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            try:
+                if self._mode != 'r':
+                    self._file.write(self._compressor.flush())
+            finally:
+                self._file.close()
+        super().close()
+
+
+def open_cache(csv_file: str, mode: str = 'r', compression: Optional[str] = None):
+    """
+    Open a cache as CSV text, compressing or decompressing as a stream.
+
+    Args:
+        csv_file: Path to the cache file
+        mode: 'r', 'w' or 'a'; appending to a compressed cache adds a new
+              compressed member after the existing ones
+        compression: Codec to use (default: from the file's suffix, see
+                     cache_compression); pass it when writing a temp file
+
+    Returns:
+        Text file object (newline='' as csv expects)
+    """
+    compression = compression or cache_compression(csv_file)
+    if compression == 'gzip':
+        return gzip.open(csv_file, mode + 't', compresslevel=COMPRESSION_LEVEL,
+                         encoding='utf-8', newline='')
+    if compression == 'lzma':
+        return lzma.open(csv_file, mode + 't', encoding='utf-8', newline='')
+    if compression == 'zlib':
+        return io.TextIOWrapper(io.BufferedReader(ZlibFile(csv_file, mode)) if mode == 'r'
+                                else io.BufferedWriter(ZlibFile(csv_file, mode)),
+                                encoding='utf-8', newline='')
+    return open(csv_file, mode, encoding='utf-8', newline='')
+
+
+# Incremental decoder for one compressed member, by codec
+_DECOMPRESSORS = {
+    'gzip': lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+    'lzma': lzma.LZMADecompressor,
+    'zlib': zlib.decompressobj,
+}
+
+
+def decompress_cache_chunks(chunks: Iterable[bytes], compression: str) -> Iterator[bytes]:
+    """
+    Decode a stream of raw cache bytes holding one or more back-to-back members.
+
+    Raises:
+        EOFError: If the last member is cut off before its end-of-stream marker
+    """
+    decompressor = None
+    for data in chunks:
+        while data:
+            if decompressor is None:
+                decompressor = _DECOMPRESSORS[compression]()
+            yield decompressor.decompress(data)
+            if not decompressor.eof:
+                break
+            # The next member starts right after this one ended
+            data = decompressor.unused_data
+            decompressor = None
+    if decompressor is not None:
+        raise EOFError("Compressed file ended before the end-of-stream marker")
+
+
+def date_key_to_int(value) -> int:
+    """
+    Convert a date value to an integer YYYYMMDD key.
+
+    Accepts integer keys (e.g. playdatekey), date/datetime objects and
+    'YYYYMMDD' or 'YYYY-MM-DD' strings.
+    """
+    if type(value) is int:
+        return value
+    if isinstance(value, (date, datetime)):
+        return value.year * 10000 + value.month * 100 + value.day
+    text = str(value)
+    if '-' in text[:10]:
+        return dashed_date_key(text)
+    return int(text)
+
+
+def dashed_date_key(text: str) -> int:
+    """Convert a 'YYYY-MM-DD' string (anything after the day is ignored) to a YYYYMMDD key."""
+    return int(text[:4]) * 10000 + int(text[5:7]) * 100 + int(text[8:10])
+
+
+def date_key_parser(value: str):
+    """
+    Pick the parser for a column of date strings from its first value.
+
+    Returns:
+        int for 'YYYYMMDD' values, dashed_date_key for 'YYYY-MM-DD' ones
+    """
+    return dashed_date_key if '-' in value[:10] else int
+
+
+def date_key_to_str(key: int, dashed: bool = False) -> str:
+    """Format an integer YYYYMMDD key as 'YYYYMMDD' or 'YYYY-MM-DD'."""
+    if dashed:
+        return f"{key // 10000:04d}-{key // 100 % 100:02d}-{key % 100:02d}"
+    return str(key)
+
+
+class SeriesColumns:
+    """
+    A daily count series held as compact typed arrays.
+
+    dates is an array('i') of YYYYMMDD keys and counts an array('q'), so a
+    row costs 12 bytes instead of a dict. `dashed` records whether the
+    source dates were 'YYYY-MM-DD' so they are written back the same way.
+    """
+
+    __slots__ = ('dates', 'counts', 'dashed')
+
+    def __init__(self, dates: Optional[array] = None, counts: Optional[array] = None,
+                 dashed: bool = False):
+        self.dates = dates if dates is not None else array('i')
+        self.counts = counts if counts is not None else array('q')
+        self.dashed = dashed
+
+    def __len__(self):
+        return len(self.dates)
+
+    def extend_rows(self, rows):
+        """Append a batch of (date, count, ...) rows, e.g. from cursor.fetchmany()."""
+        if rows and not self.dates and isinstance(rows[0][0], (str, date)):
+            first = rows[0][0]
+            self.dashed = isinstance(first, date) or '-' in first[:10]
+        self.dates.extend(date_key_to_int(row[0]) for row in rows)
+        self.counts.extend(int(row[1]) for row in rows)
+
+    def iter_rows(self) -> Iterator[Tuple[str, int]]:
+        """Yield (date string, count) tuples, for csv.writer.writerows()."""
+        if self.dashed:
+            return zip((date_key_to_str(key, True) for key in self.dates), self.counts)
+        return zip(map(str, self.dates), self.counts)
+
+    def since(self, key: int, ordered: bool = True) -> 'SeriesColumns':
+        """
+        Return the rows dated on or after a YYYYMMDD key.
+
+        A series known to be sorted by date is cut with a binary search, and
+        slices of memoryview-backed series (see read_binary_series) still
+        share the mapping. Pass ordered=False for one that may not be:
+        every row is checked instead, keeping file order.
+        """
+        if not ordered:
+            if numpy is not None:
+                dates, counts = self.as_numpy()
+                keep = dates >= key
+                if keep.all():
+                    return self
+                return SeriesColumns(array('i', dates[keep].tobytes()),
+                                     array('q', counts[keep].tobytes()), self.dashed)
+            keep = [i for i, day in enumerate(self.dates) if day >= key]
+            if len(keep) == len(self):
+                return self
+            return SeriesColumns(array('i', (self.dates[i] for i in keep)),
+                                 array('q', (self.counts[i] for i in keep)), self.dashed)
+        start = bisect.bisect_left(self.dates, key)
+        if start == 0:
+            return self
+        return SeriesColumns(self.dates[start:], self.counts[start:], self.dashed)
+
+    def as_numpy(self):
+        """
+        Return zero-copy NumPy views of the arrays.
+
+        Returns:
+            Tuple of (int32 dates, int64 counts) NumPy arrays
+
+        Raises:
+            ImportError: If NumPy is not installed
+        """
+        if numpy is None:
+            raise ImportError("NumPy is not installed")
+        return (numpy.frombuffer(self.dates, dtype=numpy.int32),
+                numpy.frombuffer(self.counts, dtype=numpy.int64))
+
+
+def read_series(csv_file: str, date_field: str = 'playdatekey',
+                count_field: str = 'count', offset: int = 0) -> SeriesColumns:
+    """
+    Read a CSV cache into a SeriesColumns.
+
+    Args:
+        csv_file: Path to CSV cache file
+        date_field: Header of the date column
+        count_field: Header of the count column
+        offset: Byte offset of the first row to read, e.g. from
+                month_offset(); rows before it are skipped unparsed
+
+    Returns:
+        SeriesColumns with the file's rows (from `offset`) in file order
+
+    Raises:
+        ValueError: If a row's date or count cannot be parsed
+    """
+    series = SeriesColumns()
+    compression = cache_compression(csv_file)
+    with open_cache(csv_file) if compression else open(csv_file, 'rb') as source:
+        line = source.readline()
+        header = next(csv.reader([line if compression else line.decode('utf-8')]), None)
+        if header is None:
+            return series
+        date_index, count_index = header.index(date_field), header.index(count_field)
+        if compression:
+            # No byte offsets into a compressed stream; decode it from the top
+            text = source
+        else:
+            if offset > source.tell():
+                source.seek(offset)
+            text = io.TextIOWrapper(source, encoding='utf-8', newline='')
+
+        while True:
+            block = text.read(PARSE_BLOCK_CHARS)
+            if not block:
+                break
+            if not block.endswith('\n'):
+                block += text.readline()
+            if not _parse_block(block, len(header), date_index, count_index, series):
+                # Quoted, blank or ragged rows: let csv handle the rest
+                _parse_rows(csv.reader(chain(io.StringIO(block), text)), date_index, count_index, series)
+                break
+    return series
+
+
+def _parse_block(block: str, columns: int, date_index: int, count_index: int,
+                 series: SeriesColumns) -> bool:
+    """
+    Parse whole CSV lines written the way the caches are (no quoting, no
+    blank lines or empty fields) straight from the text, without csv.
+
+    The date format is detected from the series' first row and then used
+    for every row. Appends to `series` and returns True, or returns False
+    without appending if the block isn't in that layout or a value doesn't
+    parse as the detected format.
+    """
+    if '"' in block:
+        return False
+    lines = block.split()
+    if (not lines or len(lines) != block.count('\n') + (not block.endswith('\n'))
+            or set(map(str.count, lines, repeat(','))) != {columns - 1}):
+        return False
+    fields = ','.join(lines).split(',')
+    values = fields[date_index::columns]
+    dashed = series.dashed if len(series) else '-' in values[0][:10]
+    try:
+        dates = _dashed_date_keys(values) if dashed else array('i', map(int, values))
+        counts = array('q', map(int, fields[count_index::columns]))
+    except ValueError:
+        return False
+    series.dashed = dashed
+    series.dates.extend(dates)
+    series.counts.extend(counts)
+    return True
+
+
+def _dashed_date_keys(values) -> array:
+    """Convert a list of 'YYYY-MM-DD' strings to an array('i') of YYYYMMDD keys."""
+    joined = ''.join(values)
+    if (set(map(len, values)) == {10} and joined.count('-') == 2 * len(values)
+            and not joined[4::10].strip('-') and not joined[7::10].strip('-')):
+        # Exactly 'YYYY-MM-DD': the digits left without the dashes are the key
+        return array('i', map(int, ' '.join(values).replace('-', '').split()))
+    return array('i', map(dashed_date_key, values))
+
+
+def _parse_rows(reader, date_index: int, count_index: int, series: SeriesColumns):
+    """Parse csv.reader rows into `series`, detecting each date's format."""
+    dates, counts = series.dates, series.counts
+    for row in reader:
+        if not row:
+            continue
+        value = row[date_index]
+        if not dates and '-' in value[:10]:
+            series.dashed = True
+        dates.append(date_key_to_int(value))
+        counts.append(int(row[count_index]))
+
+
+def series_path(csv_file: str) -> str:
+    """Return the binary mirror path for a cache file."""
+    return csv_file + SERIES_SUFFIX
+
+
+def _align8(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+def _block_size(rows: int) -> int:
+    """Bytes in a column block: int32 dates padded to 8 bytes, then int64 counts."""
+    return _align8(rows * 4) + rows * 8
+
+
+def _little_endian(values, typecode: str) -> bytes:
+    """Encode integers as a little-endian array of `typecode`."""
+    values = array(typecode, values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+def _column_block(series: SeriesColumns) -> bytes:
+    """Encode a series as a little-endian column block (see _block_size)."""
+    padding = b'\0' * (_align8(len(series) * 4) - len(series) * 4)
+    return _little_endian(series.dates, 'i') + padding + _little_endian(series.counts, 'q')
+
+
+def _map_columns(view: memoryview, start: int, rows: int, dashed: bool,
+                 capacity: Optional[int] = None) -> SeriesColumns:
+    """
+    View the column block at `start` of a mapping as a SeriesColumns.
+
+    A block with spare rows (see write_binary_series) is `capacity` rows
+    long; only the first `rows` are viewed.
+    """
+    counts_start = start + _align8((rows if capacity is None else capacity) * 4)
+    dates = view[start:start + rows * 4].cast('i')
+    counts = view[counts_start:counts_start + rows * 8].cast('q')
+    if sys.byteorder != 'little':
+        dates, counts = array('i', dates), array('q', counts)
+        dates.byteswap()
+        counts.byteswap()
+    return SeriesColumns(dates, counts, dashed=dashed)
+
+
+def _series_layout(names_size: int, capacity: int) -> Tuple[int, int, int]:
+    """Byte offsets of the dates and counts columns in a binary series file, and its size."""
+    dates_start = SERIES_HEADER.size + _align8(names_size)
+    counts_start = dates_start + _align8(capacity * 4)
+    return dates_start, counts_start, counts_start + capacity * 8
+
+
+def write_binary_series(path: str, series: SeriesColumns, source_size: int = 0,
+                        source_crc32: int = 0, columns: Tuple[str, str] = DEFAULT_COLUMNS,
+                        capacity: Optional[int] = None):
+    """
+    Atomically write a SeriesColumns in the binary series format.
+
+    The header is followed by the CSV's column names, then the dates and
+    counts columns, each `capacity` rows long so later rows can be
+    appended in place (see write_series_mirror).
+
+    Args:
+        path: Output file
+        series: Series to write
+        source_size: Byte size of the CSV the series was read from
+        source_crc32: CRC32 of that CSV
+        columns: Date and count column names of that CSV
+        capacity: Rows to reserve room for (default: just the series)
+    """
+    capacity = max(len(series), capacity or 0)
+    names = ','.join(columns).encode('utf-8')
+    dates_start, counts_start, size = _series_layout(len(names), capacity)
+    header = SERIES_HEADER.pack(SERIES_MAGIC, SERIES_VERSION,
+                                SERIES_DASHED if series.dashed else 0,
+                                len(series), capacity, source_size, source_crc32, len(names))
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header + names)
+        f.seek(dates_start)
+        f.write(_little_endian(series.dates, 'i'))
+        f.seek(counts_start)
+        f.write(_little_endian(series.counts, 'q'))
+        f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    sync_directory(path)
+
+
+def _read_series_file(path: str) -> Tuple[SeriesColumns, int, int, Tuple[str, ...], int]:
+    """
+    Map a binary series file (see read_binary_series).
+
+    Returns:
+        Tuple of (SeriesColumns, source CSV byte size, source CSV CRC32,
+        column names, row capacity)
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(mapped) < SERIES_HEADER.size:
+        raise ValueError(f"{path}: truncated header")
+    (magic, version, flags, rows, capacity, source_size, source_crc32,
+     names_size) = SERIES_HEADER.unpack_from(mapped)
+    if magic != SERIES_MAGIC or version != SERIES_VERSION:
+        raise ValueError(f"{path}: not a version {SERIES_VERSION} series file")
+    dates_start, _, size = _series_layout(names_size, capacity)
+    if rows > capacity or len(mapped) != size:
+        raise ValueError(f"{path}: expected {capacity} rows")
+    columns = tuple(mapped[SERIES_HEADER.size:SERIES_HEADER.size + names_size]
+                    .decode('utf-8').split(','))
+
+    series = _map_columns(memoryview(mapped), dates_start, rows,
+                          dashed=bool(flags & SERIES_DASHED), capacity=capacity)
+    return series, source_size, source_crc32, columns, capacity
+
+
+def read_binary_series(path: str) -> Tuple[SeriesColumns, int, int]:
+    """
+    Map a binary series file.
+
+    The returned SeriesColumns holds read-only memoryviews over the mapping
+    rather than arrays, so nothing is copied or parsed; the mapping stays
+    open for as long as the views are referenced.
+
+    Args:
+        path: Binary series file
+
+    Returns:
+        Tuple of (SeriesColumns, source CSV byte size, source CSV CRC32)
+
+    Raises:
+        ValueError: If the file is not a binary series or is truncated
+    """
+    return _read_series_file(path)[:3]
+
+
+def write_series_mirror(csv_file: str, manifest: Dict, previous: Optional[Dict] = None,
+                        offset: Optional[int] = None):
+    """
+    Bring the binary mirror of a cache up to date with the CSV.
+
+    After an append, pass the manifest the CSV had before it and the byte
+    offset the new rows start at: if the mirror still matches that
+    manifest and has spare rows, only the new rows are parsed and written
+    in place, followed by the header. Otherwise (and for compressed
+    caches, which can't be read from an offset) the mirror is rebuilt from
+    the whole CSV, with SERIES_MIN_SPARE_ROWS or a quarter more rows
+    reserved for later appends.
+
+    Args:
+        csv_file: Path to CSV cache file
+        manifest: Current manifest for csv_file (its size and CRC32 are
+                  recorded in the mirror's header)
+        previous: Manifest of csv_file before rows were appended at `offset`
+        offset: Byte size of csv_file before the append
+    """
+    path = series_path(csv_file)
+    if (previous is not None and not cache_compression(csv_file)
+            and _append_series_mirror(path, csv_file, manifest, previous, offset)):
+        return
+
+    with open_cache(csv_file) as f:
+        header = next(csv.reader([f.readline()]), None)
+    columns = tuple(header[:2]) if header and len(header) >= 2 else DEFAULT_COLUMNS
+    series = read_series(csv_file, *columns)
+    write_binary_series(path, series, manifest['byte_size'], manifest['crc32'], columns,
+                        capacity=len(series) + max(len(series) // 4, SERIES_MIN_SPARE_ROWS))
+
+
+def _append_series_mirror(path: str, csv_file: str, manifest: Dict, previous: Dict,
+                          offset: int) -> bool:
+    """Write rows appended to a CSV at `offset` into its mirror's spare rows; False if it can't."""
+    try:
+        mirrored, source_size, source_crc32, columns, capacity = _read_series_file(path)
+    except (OSError, ValueError):
+        return False
+    if (source_size, source_crc32, len(mirrored)) != (previous['byte_size'], previous['crc32'],
+                                                      previous['row_count']):
+        return False
+    kept, dashed = len(mirrored), mirrored.dashed
+    del mirrored
+
+    added = read_series(csv_file, *columns, offset=offset)
+    rows = kept + len(added)
+    if rows > capacity or (len(added) and kept and added.dashed != dashed):
+        return False
+    dashed = added.dashed if not kept else dashed
+
+    names = ','.join(columns).encode('utf-8')
+    dates_start, counts_start, _ = _series_layout(len(names), capacity)
+    with open(path, 'r+b') as f:
+        # Rows first: until the header is rewritten they are past the row count
+        f.seek(dates_start + kept * 4)
+        f.write(_little_endian(added.dates, 'i'))
+        f.seek(counts_start + kept * 8)
+        f.write(_little_endian(added.counts, 'q'))
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(SERIES_HEADER.pack(SERIES_MAGIC, SERIES_VERSION, SERIES_DASHED if dashed else 0,
+                                   rows, capacity, manifest['byte_size'], manifest['crc32'],
+                                   len(names)))
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
+
+def load_series_mirror(csv_file: str, manifest: Dict) -> Optional[SeriesColumns]:
+    """
+    Map the binary mirror of a cache if it matches the manifest.
+
+    Args:
+        csv_file: Path to CSV cache file
+        manifest: Current (checked) manifest for csv_file
+
+    Returns:
+        SeriesColumns over the mirror, or None if it is missing, unreadable
+        or was built from a different version of the CSV
+    """
+    try:
+        series, source_size, source_crc32 = read_binary_series(series_path(csv_file))
+    except (OSError, ValueError):
+        return None
+    if (source_size != manifest['byte_size'] or source_crc32 != manifest['crc32']
+            or len(series) != manifest['row_count']):
+        return None
+    return series
+
+
+def write_series_store(path: str, caches: Dict[str, str]) -> Dict[str, int]:
+    """
+    Pack the series of several caches into one store file.
+
+    Each cache is taken from its binary mirror when that is current, and
+    from the CSV otherwise. The directory records the size and CRC32 of the
+    CSV behind each series, so SeriesStore.get() can tell when a cache has
+    moved on since the store was packed.
+
+    Args:
+        path: Store file to write (replaced atomically)
+        caches: Dictionary of series name (query name) to CSV cache file;
+                caches that don't exist yet are left out
+
+    Returns:
+        Dictionary of series name to rows stored
+    """
+    directory = {}
+    blocks = []
+    offset = 0
+    for name, csv_file in caches.items():
+        manifest = load_manifest(csv_file)
+        if manifest is None:
+            continue
+        series = load_series_mirror(csv_file, manifest)
+        if series is None:
+            series = read_series(csv_file)
+        directory[name] = {'offset': offset, 'rows': len(series), 'dashed': series.dashed,
+                           'source_size': manifest['byte_size'],
+                           'source_crc32': manifest['crc32']}
+        blocks.append(_column_block(series))
+        offset += len(blocks[-1])
+
+    directory_bytes = json.dumps(directory, sort_keys=True).encode('utf-8')
+    header = STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, 0, len(directory),
+                               len(directory_bytes))
+    padding = _align8(len(header) + len(directory_bytes)) - len(header) - len(directory_bytes)
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header + directory_bytes + b'\0' * padding)
+        for block in blocks:
+            f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    sync_directory(path)
+    return {name: entry['rows'] for name, entry in directory.items()}
+
+
+class SeriesStore:
+    """
+    Read-only view of a consolidated series store (see write_series_store).
+
+    The whole file is mapped once; each series is a pair of memoryviews
+    into the mapping, so loading one or all of them copies nothing.
+    """
+
+    def __init__(self, path: str):
+        """
+        Map a store file.
+
+        Args:
+            path: Store file
+
+        Raises:
+            OSError: If the file can't be opened
+            ValueError: If it is not a valid store
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mapped) < STORE_HEADER.size:
+            raise ValueError(f"{path}: truncated header")
+        magic, version, _, count, directory_size = STORE_HEADER.unpack_from(self._mapped)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            raise ValueError(f"{path}: not a version {STORE_VERSION} series store")
+
+        directory_end = STORE_HEADER.size + directory_size
+        self.directory = json.loads(self._mapped[STORE_HEADER.size:directory_end].decode('utf-8'))
+        self._data_start = _align8(directory_end)
+        if len(self.directory) != count:
+            raise ValueError(f"{path}: directory lists {len(self.directory)} of {count} series")
+        for name, entry in self.directory.items():
+            if self._data_start + entry['offset'] + _block_size(entry['rows']) > len(self._mapped):
+                raise ValueError(f"{path}: series {name} is truncated")
+        self._view = memoryview(self._mapped)
+
+    def names(self):
+        """Names of the stored series."""
+        return sorted(self.directory)
+
+    def get(self, name: str, manifest: Optional[Dict] = None) -> Optional[SeriesColumns]:
+        """
+        Return one stored series.
+
+        Args:
+            name: Series name
+            manifest: Optional current manifest of the series' CSV cache; if
+                      given, a series packed from a different version of the
+                      CSV is treated as missing
+
+        Returns:
+            SeriesColumns over the mapping, or None
+        """
+        entry = self.directory.get(name)
+        if entry is None:
+            return None
+        if manifest and (entry['source_size'] != manifest['byte_size']
+                         or entry['source_crc32'] != manifest['crc32']):
+            return None
+        return _map_columns(self._view, self._data_start + entry['offset'], entry['rows'],
+                            entry['dashed'])
+
+    def load(self, names=None) -> Dict[str, SeriesColumns]:
+        """
+        Return several stored series at once.
+
+        Args:
+            names: Series to load (default: all); unknown names are skipped
+
+        Returns:
+            Dictionary of series name to SeriesColumns
+        """
+        names = self.names() if names is None else names
+        return {name: self.get(name) for name in names if name in self.directory}
+
+
+def open_series_store(path: str = SERIES_STORE_FILE) -> Optional[SeriesStore]:
+    """Map a series store, or return None if it is missing or unreadable."""
+    try:
+        return SeriesStore(path)
+    except (OSError, ValueError) as e:
+        if os.path.exists(path):
+            print(f"WARNING: ignoring series store {path}: {e}")
+        return None
+
+
+def binary_to_csv(series_file: str, csv_file: str) -> int:
+    """
+    Write a binary series file back out as a CSV cache (with manifest).
+
+    Returns:
+        Number of rows written
+    """
+    series, _, _, columns, _ = _read_series_file(series_file)
+    temp_file = csv_file + '.tmp'
+    with open_cache(temp_file, 'w', cache_compression(csv_file)) as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(series.iter_rows())
+    fsync_file(temp_file)
+    os.replace(temp_file, csv_file)
+    sync_directory(csv_file)
+    write_manifest(csv_file, build_manifest(csv_file))
+    return len(series)
+
+
+def manifest_path(csv_file: str) -> str:
+    """Return the manifest path for a cache file."""
+    return csv_file + MANIFEST_SUFFIX
+
+
+def sync_directory(path: str):
+    """
+    Flush the directory entry of a just-renamed file to disk.
+
+    Without this a crash soon after os.replace() can lose the rename. Not
+    supported on Windows, where it is a no-op.
+    """
+    try:
+        fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def fsync_file(path: str):
+    """Flush a closed file's contents to disk (e.g. a compressed temp file before its rename)."""
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def atomic_write_json(path: str, data: Dict):
+    """
+    Write JSON to a temp file, then rename it over the target.
+
+    Readers see either the old or the new file, never a partial one.
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    sync_directory(path)
+
+
+def read_manifest(csv_file: str) -> Optional[Dict]:
+    """
+    Read the manifest for a cache file.
+
+    Returns:
+        Manifest dictionary, or None if missing or unreadable
+    """
+    try:
+        with open(manifest_path(csv_file), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(csv_file: str, manifest: Dict):
+    """Atomically write the manifest for a cache file."""
+    atomic_write_json(manifest_path(csv_file), manifest)
+
+
+def _scan_rows(data: bytes, manifest: Dict, skip_header: bool, base: int = 0):
+    """Fold the rows in a chunk of CSV bytes, found at byte `base` of the file, into a manifest."""
+    month_offsets = manifest['month_offsets']
+    position = base
+    for line in data.split(b'\n'):
+        line_start = position
+        position += len(line) + 1
+        if skip_header:
+            skip_header = False
+            continue
+        if not line.strip():
+            continue
+        date = line.split(b',', 1)[0].decode('utf-8')
+        if manifest['min_date'] is None or date < manifest['min_date']:
+            manifest['min_date'] = date
+        if manifest['max_date'] is None or date > manifest['max_date']:
+            manifest['max_date'] = date
+        manifest['row_count'] += 1
+        if month_offsets is not None:
+            month_offsets.setdefault(month_key(date), line_start)
+
+
+def _scan_chunks(chunks: Iterable[bytes], manifest: Dict, skip_header: bool, base: int = 0):
+    """Fold the rows in a stream of CSV byte chunks, starting at byte `base`, into a manifest."""
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        # Scan the whole lines; a line cut by the chunk boundary waits for the rest
+        cut = pending.rfind(b'\n') + 1
+        if cut:
+            _scan_rows(pending[:cut - 1], manifest, skip_header, base)
+            skip_header = False
+            base += cut
+            pending = pending[cut:]
+    if pending:
+        _scan_rows(pending, manifest, skip_header, base)
+
+
+def _checksummed_chunks(f, manifest: Dict) -> Iterator[bytes]:
+    """Yield the rest of a binary file in MANIFEST_CHUNK pieces, adding them to manifest's byte_size and crc32."""
+    for chunk in iter(lambda: f.read(MANIFEST_CHUNK), b''):
+        manifest['byte_size'] += len(chunk)
+        manifest['crc32'] = zlib.crc32(chunk, manifest['crc32'])
+        yield chunk
+
+
+def build_manifest(csv_file: str) -> Dict:
+    """
+    Build a manifest by scanning the whole cache file.
+
+    The file is read in MANIFEST_CHUNK pieces, so memory use doesn't grow
+    with the cache. byte_size and crc32 describe the file as stored. A
+    compressed cache is decoded for its rows as a stream and has no month
+    index (month_offsets None).
+
+    Args:
+        csv_file: Path to CSV cache file
+
+    Returns:
+        Manifest dictionary
+    """
+    compression = cache_compression(csv_file)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'min_date': None,
+        'max_date': None,
+        'row_count': 0,
+        'byte_size': 0,
+        'crc32': 0,
+        'month_offsets': None if compression else {},
+        'compression': compression,
+    }
+    with open(csv_file, 'rb') as f:
+        chunks = _checksummed_chunks(f, manifest)
+        if compression:
+            chunks = decompress_cache_chunks(chunks, compression)
+        _scan_chunks(chunks, manifest, skip_header=True)
+    return manifest
+
+
+def extend_manifest(csv_file: str, manifest: Dict, offset: int) -> Dict:
+    """
+    Update a manifest after rows were appended to its cache file.
+
+    Only the bytes after `offset` (the file size before the append) are
+    read, in MANIFEST_CHUNK pieces; CRC32 is resumable, so the checksum
+    still covers the whole file. For a compressed cache those bytes are the
+    appended members, which decode on their own.
+
+    Args:
+        csv_file: Path to CSV cache file
+        manifest: Manifest that described the file up to `offset`
+        offset: Byte size of the file before the append
+
+    Returns:
+        New manifest dictionary
+    """
+    updated = dict(manifest)
+    updated['byte_size'] = offset
+    if manifest['month_offsets'] is not None:
+        updated['month_offsets'] = dict(manifest['month_offsets'])
+    compression = cache_compression(csv_file)
+    with open(csv_file, 'rb') as f:
+        f.seek(offset)
+        chunks = _checksummed_chunks(f, updated)
+        if compression:
+            chunks = decompress_cache_chunks(chunks, compression)
+        _scan_chunks(chunks, updated, skip_header=False, base=offset)
+    return updated
+
+
+def month_offset(manifest: Dict, date) -> int:
+    """
+    Byte offset to start reading a cache from to get every row on or after `date`.
+
+    Uses the manifest's month index, so the result is the start of the
+    month containing `date` (or of the first later month present).
+    Compressed caches have no index, so they are read from the start.
+
+    Args:
+        manifest: Current manifest for the cache
+        date: Date as a YYYYMMDD / YYYY-MM-DD string, integer key or date
+
+    Returns:
+        Byte offset (0 to read everything, byte_size if no rows qualify)
+    """
+    if manifest['month_offsets'] is None:
+        return 0
+    month = month_key(date_key_to_int(date))
+    starts = [offset for key, offset in manifest['month_offsets'].items() if key >= month]
+    return min(starts) if starts else manifest['byte_size']
+
+
+def find_date_offset(csv_file: str, date: str, size: Optional[int] = None) -> int:
+    """
+    Find where the rows dated on or after `date` begin.
+
+    Caches are sorted by date, so this scans backwards from the end of the
+    file in blocks and stops at the first row older than `date`. Cost is
+    proportional to the size of the tail, not the whole file.
+
+    Args:
+        csv_file: Path to CSV cache file
+        date: Date to search for (same format as the cache)
+        size: File size, if already known
+
+    Returns:
+        Byte offset of the first row with date >= `date` (end of file if none)
+    """
+    if size is None:
+        size = os.path.getsize(csv_file)
+
+    target = date.encode('utf-8')
+    offset = size
+    block_size = REVERSE_SCAN_BLOCK
+    with open(csv_file, 'rb') as f:
+        while offset > 0:
+            block_start = max(0, offset - block_size)
+            f.seek(block_start)
+            block = f.read(offset - block_start)
+
+            # Only lines that start inside this block are complete
+            cut = 0 if block_start == 0 else block.find(b'\n') + 1
+            if block_start > 0 and not 0 < cut < len(block):
+                # No complete line in this block; read a bigger one
+                block_size *= 2
+                continue
+            block_size = REVERSE_SCAN_BLOCK
+
+            line_starts = []
+            position = cut
+            for line in block[cut:].split(b'\n'):
+                line_starts.append((block_start + position, line))
+                position += len(line) + 1
+
+            for line_start, line in reversed(line_starts):
+                if not line.strip():
+                    continue
+                line_end = line_start + len(line) + 1
+                # Header row, or a row older than the target date
+                if line_start == 0 or line.split(b',', 1)[0] < target:
+                    return min(line_end, size)
+
+            offset = block_start + cut
+
+    return 0
+
+
+def read_rows_from(csv_file: str, offset: int) -> Dict[str, str]:
+    """
+    Read the (date -> count) rows from a byte offset to the end of a cache.
+
+    Returns:
+        Ordered dictionary of date string to count string
+    """
+    with open(csv_file, 'rb') as f:
+        f.seek(offset)
+        data = f.read().decode('utf-8')
+    return {row[0]: row[1] for row in csv.reader(io.StringIO(data)) if row}
+
+
+def truncated_manifest(csv_file: str, manifest: Dict, offset: int, removed_rows: int) -> Dict:
+    """
+    Describe the first `offset` bytes of a cache, before its tail is rewritten.
+
+    The prefix CRC has to be recomputed from the bytes, but no rows are parsed.
+    min_date is kept as-is; callers extend_manifest() after writing the new tail.
+
+    Args:
+        csv_file: Path to CSV cache file
+        manifest: Current manifest for the whole file
+        offset: Byte offset the file will be truncated to
+        removed_rows: Number of rows after `offset`
+
+    Returns:
+        Manifest dictionary for the prefix
+    """
+    crc = 0
+    remaining = offset
+    with open(csv_file, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(REVERSE_SCAN_BLOCK * 16, remaining))
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            remaining -= len(chunk)
+
+    prefix = dict(manifest)
+    prefix['byte_size'] = offset
+    prefix['crc32'] = crc
+    prefix['row_count'] = manifest['row_count'] - removed_rows
+    if manifest['month_offsets'] is not None:
+        prefix['month_offsets'] = {key: start for key, start in manifest['month_offsets'].items()
+                                   if start < offset}
+    if prefix['row_count'] == 0:
+        prefix['min_date'] = None
+    prefix['max_date'] = None
+    return prefix
+
+
+def _last_row_date(csv_file: str, size: int) -> Optional[str]:
+    """Return the date column of the last row, reading only the file tail."""
+    with open(csv_file, 'rb') as f:
+        f.seek(max(0, size - TAIL_READ_SIZE))
+        tail = f.read()
+
+    lines = tail.rstrip(b'\r\n').splitlines()
+    if not lines:
+        return None
+    return lines[-1].split(b',', 1)[0].decode('utf-8')
+
+
+def check_manifest(csv_file: str, manifest: Dict) -> Optional[str]:
+    """
+    Cheaply check that a manifest still describes its cache file.
+
+    Compares the byte size and the date of the last row, without
+    reading the rest of the file.
+
+    Returns:
+        None if the manifest is current, otherwise a reason string
+    """
+    try:
+        size = os.path.getsize(csv_file)
+    except OSError:
+        return "cache file missing"
+
+    if size != manifest.get('byte_size'):
+        return f"size {size} != manifest {manifest.get('byte_size')}"
+
+    # The tail of a compressed cache can't be read without decoding it all
+    if (manifest.get('row_count') and not manifest.get('compression')
+            and _last_row_date(csv_file, size) != manifest.get('max_date')):
+        return "last row does not match manifest max_date"
+
+    return None
+
+
+def verify_manifest(csv_file: str, manifest: Dict) -> Optional[str]:
+    """
+    Fully verify a manifest, including the content checksum.
+
+    The checksum is computed over MANIFEST_CHUNK reads, so memory use
+    doesn't grow with the cache.
+
+    Returns:
+        None if the manifest matches the file, otherwise a reason string
+    """
+    reason = check_manifest(csv_file, manifest)
+    if reason:
+        return reason
+
+    checked = {'byte_size': 0, 'crc32': 0}
+    with open(csv_file, 'rb') as f:
+        for _ in _checksummed_chunks(f, checked):
+            pass
+    if checked['crc32'] != manifest.get('crc32'):
+        return "checksum mismatch"
+    return None
+
+
+def load_manifest(csv_file: str) -> Optional[Dict]:
+    """
+    Return a current manifest for a cache file, rebuilding it if needed.
+
+    Args:
+        csv_file: Path to CSV cache file
+
+    Returns:
+        Manifest dictionary, or None if the cache file does not exist
+    """
+    if not os.path.exists(csv_file):
+        return None
+
+    manifest = read_manifest(csv_file)
+    reason = check_manifest(csv_file, manifest) if manifest else "no manifest"
+    if reason:
+        print(f"Rebuilding manifest for {csv_file} ({reason})")
+        manifest = build_manifest(csv_file)
+        write_manifest(csv_file, manifest)
+    return manifest
+
+
+def month_key(value) -> str:
+    """YYYYMM month of a YYYYMMDD / YYYY-MM-DD date (or a YYYYMM month) key."""
+    return str(value).replace('-', '')[:6]
+
+
+def checksum_path(csv_file: str) -> str:
+    """Path of the month checksum sidecar for a cache file."""
+    return csv_file + CHECKSUM_SUFFIX
+
+
+def read_checksums(csv_file: str, checksum_query: str) -> Optional[Dict[str, int]]:
+    """
+    Read the stored month checksums for a cache.
+
+    Args:
+        csv_file: Path to CSV cache file
+        checksum_query: The query's current checksum_query; checksums stored
+                        for a different statement are ignored
+
+    Returns:
+        Dictionary of YYYYMM month to checksum, or None if there are none
+    """
+    try:
+        with open(checksum_path(csv_file), 'r') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stored.get('checksum_query') != checksum_query:
+        return None
+    return stored.get('months')
+
+
+def write_checksums(csv_file: str, checksum_query: str, months: Dict[str, int]):
+    """Store month checksums beside a cache."""
+    atomic_write_json(checksum_path(csv_file), {'checksum_query': checksum_query,
+                                                'months': months})
+
+
+def analysis_path(csv_file: str) -> str:
+    """Path of the anomaly analysis state sidecar for a cache file."""
+    return csv_file + ANALYSIS_SUFFIX
+
+
+def read_analysis_state(csv_file: str) -> Optional[Dict]:
+    """
+    Read the anomaly analysis state stored beside a cache.
+
+    Returns:
+        State dictionary, or None if missing, unreadable or an older version
+    """
+    try:
+        with open(analysis_path(csv_file), 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get('version') != ANALYSIS_VERSION:
+        return None
+    return state
+
+
+def write_analysis_state(csv_file: str, state: Dict):
+    """Store anomaly analysis state beside a cache."""
+    atomic_write_json(analysis_path(csv_file), dict(state, version=ANALYSIS_VERSION))
+
+
+def series_month_crcs(series: SeriesColumns) -> Optional[Dict[str, int]]:
+    """
+    CRC32 of each month's rows (date keys and counts) in a series.
+
+    Returns:
+        Dictionary of YYYYMM month to CRC32, or None if the dates are not
+        strictly increasing (months can't then be told apart by position)
+    """
+    dates, counts = series.dates, series.counts
+    if not all(map(operator.lt, dates, islice(dates, 1, None))):
+        return None
+    date_bytes, count_bytes = memoryview(dates).cast('B'), memoryview(counts).cast('B')
+    crcs = {}
+    start = 0
+    while start < len(dates):
+        month = dates[start] // 100
+        end = bisect.bisect_left(dates, (month + 1) * 100, start)
+        crc = zlib.crc32(date_bytes[start * 4:end * 4])
+        crcs[str(month)] = zlib.crc32(count_bytes[start * 8:end * 8], crc)
+        start = end
+    return crcs
+
+
+def journal_path(csv_file: str) -> str:
+    """Return the undo journal path for a cache file."""
+    return csv_file + JOURNAL_SUFFIX
+
+
+@contextmanager
+def journaled(csv_file: str, manifest: Optional[Dict], offset: int):
+    """
+    Bracket an in-place write to a cache from `offset` onwards.
+
+    Before the block runs, the cache bytes from `offset` to the end and the
+    current manifest are saved to <csv>.journal and fsynced. The block may
+    then append, or truncate at `offset` and rewrite, and update the
+    manifest. On success the cache is fsynced, a commit marker is appended
+    to the journal and the journal is removed. If the block raises, the
+    cache and manifest are rolled back before the exception propagates; if
+    the process dies instead, recover_cache() rolls back on the next run.
+
+    Args:
+        csv_file: Path to CSV cache file
+        manifest: Manifest describing the cache before the write
+        offset: First byte the block may change
+    """
+    with open(csv_file, 'rb') as f:
+        f.seek(offset)
+        tail = f.read()
+
+    path = journal_path(csv_file)
+    begin = {'offset': offset, 'tail': tail.decode('latin-1'), 'manifest': manifest}
+    with open(path, 'w') as f:
+        f.write(json.dumps(begin) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    sync_directory(path)
+
+    try:
+        yield
+    except GeneratorExit:
+        # Abandoned without being exited; treat like a crash
+        raise
+    except BaseException:
+        # Including KeyboardInterrupt, so Ctrl-C mid-append is undone too
+        _roll_back(csv_file, begin)
+        raise
+
+    fsync_file(csv_file)
+    with open(path, 'a') as f:
+        f.write(JOURNAL_COMMIT + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(path)
+
+
+def _roll_back(csv_file: str, begin: Dict):
+    """Restore a cache and its manifest from a journal's begin record."""
+    with open(csv_file, 'rb+') as f:
+        f.truncate(begin['offset'])
+        f.seek(begin['offset'])
+        f.write(begin['tail'].encode('latin-1'))
+        f.flush()
+        os.fsync(f.fileno())
+    if begin['manifest']:
+        write_manifest(csv_file, begin['manifest'])
+    elif os.path.exists(manifest_path(csv_file)):
+        os.remove(manifest_path(csv_file))
+    os.remove(journal_path(csv_file))
+
+
+def recover_cache(csv_file: str) -> Optional[str]:
+    """
+    Clean up after a write to a cache that was interrupted by a crash.
+
+    Leftover temp files are removed (the cache they were replacing is
+    intact). A journal without its commit marker is rolled back, restoring
+    the cache and manifest to their state before the write; a committed
+    one only needs its manifest brought up to date. A journal whose begin
+    record is incomplete never reached the cache and is discarded.
+
+    Args:
+        csv_file: Path to CSV cache file
+
+    Returns:
+        Description of what was recovered, or None if nothing needed doing
+    """
+    actions = []
+    for suffix in TEMP_SUFFIXES:
+        if os.path.exists(csv_file + suffix):
+            os.remove(csv_file + suffix)
+            actions.append(f"removed partial {os.path.basename(csv_file + suffix)}")
+
+    path = journal_path(csv_file)
+    try:
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        lines = None
+
+    if lines is not None:
+        try:
+            begin = json.loads(lines[0])
+        except (IndexError, ValueError):
+            begin = None
+
+        if begin is None or not os.path.exists(csv_file):
+            os.remove(path)
+            actions.append("discarded incomplete journal")
+        elif JOURNAL_COMMIT in lines[1:]:
+            os.remove(path)
+            load_manifest(csv_file)
+            actions.append("completed committed write")
+        else:
+            _roll_back(csv_file, begin)
+            actions.append(f"rolled back interrupted write from byte {begin['offset']}")
+
+    return "; ".join(actions) if actions else None
+
+
+def convert_cache(csv_file: str, compression: Optional[str]) -> str:
+    """
+    Copy a cache into another storage format, streaming row by row.
+
+    Args:
+        csv_file: Existing cache file (plain or compressed)
+        compression: Target codec ('gzip', 'lzma', 'zlib'), or None for plain CSV
+
+    Returns:
+        Path of the new cache: csv_file with its codec suffix replaced
+    """
+    base = csv_file
+    current = cache_compression(csv_file)
+    if current:
+        base = csv_file[:-len(COMPRESSION_SUFFIXES[current])]
+    target = base + (COMPRESSION_SUFFIXES[compression] if compression else '')
+    if target == csv_file:
+        return target
+
+    temp_file = target + '.tmp'
+    with open_cache(csv_file) as source, open_cache(temp_file, 'w', compression) as dest:
+        while True:
+            chunk = source.read(DECODE_CHUNK)
+            if not chunk:
+                break
+            dest.write(chunk)
+    fsync_file(temp_file)
+    os.replace(temp_file, target)
+    sync_directory(target)
+    write_manifest(target, build_manifest(target))
+    return target
+
+
+def main():
+    """Verify (and rebuild if needed) the manifests for the given cache files."""
+    import argparse
+    parser = argparse.ArgumentParser(description='Verify CSV cache manifests')
+    parser.add_argument('csv_files', nargs='+', metavar='CSV', help='Cache files to verify')
+    parser.add_argument('--to-binary', action='store_true',
+                        help=f'Also (re)write each cache\'s binary mirror (<csv>{SERIES_SUFFIX})')
+    parser.add_argument('--from-binary', action='store_true',
+                        help=f'Rebuild each CSV from its binary mirror (<csv>{SERIES_SUFFIX}) first')
+    parser.add_argument('--compress', choices=list(COMPRESSION_SUFFIXES) + ['none'],
+                        help='Also write a copy of each cache in this format (e.g. x.csv -> x.csv.gz)')
+    args = parser.parse_args()
+
+    for csv_file in args.csv_files:
+        recovered = recover_cache(csv_file)
+        if recovered:
+            print(f"{csv_file}: {recovered}")
+        if args.from_binary:
+            rows = binary_to_csv(series_path(csv_file), csv_file)
+            print(f"{csv_file}: rebuilt from {series_path(csv_file)} ({rows} rows)")
+        manifest = read_manifest(csv_file)
+        reason = verify_manifest(csv_file, manifest) if manifest else "no manifest"
+        if reason:
+            manifest = build_manifest(csv_file)
+            write_manifest(csv_file, manifest)
+            print(f"{csv_file}: rebuilt ({reason})")
+        else:
+            print(f"{csv_file}: OK")
+        print(f"  {manifest['row_count']} rows, {manifest['min_date']} to {manifest['max_date']}")
+        if args.to_binary:
+            write_series_mirror(csv_file, manifest)
+            print(f"  wrote {series_path(csv_file)}")
+        if args.compress:
+            target = convert_cache(csv_file, None if args.compress == 'none' else args.compress)
+            print(f"  wrote {target} ({os.path.getsize(target)} bytes, was {manifest['byte_size']})")
+
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -4,16 +4,420 @@ Database query module for pulling ezlrounds data from SQL Server.
 """
 
 import pyodbc
+import contextvars
 import csv
-from datetime import datetime
-from typing import List, Dict, Optional
+import gzip
+import hashlib
+import heapq
+import itertools
+import os
+import json
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
+
+from cache_files import (SeriesColumns, atomic_write_json, build_manifest, cache_compression,
+                         extend_manifest, find_date_offset, fsync_file, journaled, load_manifest,
+                         month_key, open_cache, read_checksums, read_rows_from, sync_directory,
+                         truncated_manifest, write_checksums, write_manifest, write_series_mirror)
+from query_loader import DATE_PARAM_TYPES, fuse_key
+from query_metrics import NullTimer, QueryMetrics
+
+# Rows pulled from the cursor per fetchmany() round trip when streaming
+DEFAULT_FETCH_BATCH_SIZE = 5000
+
+# Result cache defaults: entry lifetime (seconds; 0 leaves caching to queries
+# that set cache_ttl) and total size before LRU eviction
+DEFAULT_CACHE_TTL = 0
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Single-quoted SQL string literals (with '' escapes)
+_SQL_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+
+
+def bind_date_param(value: str, param_type: str = 'str'):
+    """
+    Convert a YYYYMMDD (or YYYY-MM-DD) date string to a typed query parameter.
+
+    Args:
+        value: Date string
+        param_type: 'str' (sent as-is), 'int' (YYYYMMDD integer key such as
+                    playdatekey) or 'date' (datetime.date for DATE columns)
+
+    Returns:
+        Value to pass to cursor.execute()
+    """
+    if param_type == 'str':
+        return value
+    digits = value.replace('-', '')
+    if param_type == 'int':
+        return int(digits)
+    if param_type == 'date':
+        return datetime.strptime(digits, '%Y%m%d').date()
+    raise ValueError(f"Unknown date_param_type: {param_type} (expected one of {DATE_PARAM_TYPES})")
+
+
+def shift_date_key(value: str, days: int) -> str:
+    """
+    Add days to a YYYYMMDD or YYYY-MM-DD date string, keeping its format.
+
+    Args:
+        value: Date string as stored in a cache
+        days: Days to add (negative to go back)
+
+    Returns:
+        Shifted date string in the same format
+    """
+    fmt = '%Y-%m-%d' if '-' in value[:10] else '%Y%m%d'
+    shifted = datetime.strptime(value[:10] if fmt == '%Y-%m-%d' else value[:8], fmt) + timedelta(days=days)
+    return shifted.strftime(fmt)
+
+# Window sizes accepted by split_date_range / backfill_csv
+BACKFILL_WINDOWS = ('month', 'week')
+
+# Checkpoint directory for an in-progress backfill, next to the cache file
+BACKFILL_DIR_SUFFIX = '.backfill'
+
+
+def split_date_range(start_date: str, end_date: str, window: str = 'month') -> List[Tuple[str, str]]:
+    """
+    Split an inclusive date range into calendar month or week windows.
+
+    Args:
+        start_date: First date (YYYYMMDD or YYYY-MM-DD)
+        end_date: Last date (YYYYMMDD or YYYY-MM-DD)
+        window: 'month' (calendar months) or 'week' (Monday-Sunday)
+
+    Returns:
+        List of (window_start, window_end) YYYYMMDD tuples, in date order
+    """
+    if window not in BACKFILL_WINDOWS:
+        raise ValueError(f"Unknown backfill window: {window} (expected one of {BACKFILL_WINDOWS})")
+
+    current = datetime.strptime(start_date.replace('-', ''), '%Y%m%d').date()
+    end = datetime.strptime(end_date.replace('-', ''), '%Y%m%d').date()
+
+    windows = []
+    while current <= end:
+        if window == 'month':
+            next_start = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+        else:
+            next_start = current + timedelta(days=7 - current.weekday())
+        window_end = min(next_start - timedelta(days=1), end)
+        windows.append((current.strftime('%Y%m%d'), window_end.strftime('%Y%m%d')))
+        current = next_start
+
+    return windows
+
+
+def month_date_ranges(months: Iterable[str]) -> List[Tuple[str, str]]:
+    """
+    Merge YYYYMM months into date ranges, one per run of consecutive months.
+
+    Returns:
+        List of (first day, last day) YYYYMMDD tuples, in date order
+    """
+    ranges = []
+    for month in sorted(months):
+        start = datetime.strptime(month + '01', '%Y%m%d').date()
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        if ranges and ranges[-1][1] == start - timedelta(days=1):
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return [(start.strftime('%Y%m%d'), end.strftime('%Y%m%d')) for start, end in ranges]
+
+
+class QueryCancelled(pyodbc.Error):
+    """A warehouse statement was cancelled (see EZLinksRoundsDB.cancel)."""
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Collapse runs of whitespace outside string literals.
+
+    Statements that differ only in formatting normalize to the same text.
+    """
+    parts = _SQL_STRING_LITERAL.split(query.strip())
+    # split() with a capturing group puts the literals at the odd indexes
+    return ''.join(part if i % 2 else re.sub(r'\s+', ' ', part) for i, part in enumerate(parts))
+
+
+class ResultCache:
+    """
+    Disk-backed cache of statement results.
+
+    Entries are keyed by a hash of the normalized SQL text and the bound
+    parameters (with their types), and stored as gzip-compressed JSON
+    lines, one fetchmany() batch per line, so a hit is replayed batch by
+    batch like a live cursor. Entries are plain data (see encode_value),
+    so a file planted in the cache directory can't run code. Entries
+    older than their TTL are ignored and purged, and the least recently
+    used entries are evicted once the cache grows past max_bytes.
+    Bookkeeping lives in index.json beside the entries; it is written
+    when entries are stored or evicted, not on every hit.
+    """
+
+    INDEX_FILE = 'index.json'
+    ENTRY_SUFFIX = '.jsonl.gz'
+
+    # Entry files written by earlier versions, removed unread
+    LEGACY_SUFFIXES = ('.pkl.gz',)
+
+    def __init__(self, cache_dir: str, default_ttl: int = DEFAULT_CACHE_TTL,
+                 max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding the entries (created if missing)
+            default_ttl: Entry lifetime in seconds when a query sets none
+            max_bytes: Total entry size to keep before evicting
+        """
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._remove_legacy_entries()
+        self._index = self._load_index()
+
+    @staticmethod
+    def make_key(query: str, params: Optional[List] = None) -> str:
+        """Content address for a statement and its bound parameters."""
+        payload = json.dumps([normalize_sql(query),
+                              [[type(p).__name__, str(p)] for p in params or []]])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.ENTRY_SUFFIX)
+
+    def _remove_legacy_entries(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.LEGACY_SUFFIXES):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def encode_value(value):
+        """JSON stand-in for row values JSON has no type for (dates, decimals)."""
+        if isinstance(value, datetime):
+            return {'datetime': value.isoformat()}
+        if isinstance(value, date):
+            return {'date': value.isoformat()}
+        if isinstance(value, Decimal):
+            return {'decimal': str(value)}
+        raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+    @staticmethod
+    def decode_value(obj: Dict):
+        """Inverse of encode_value, as a json object_hook."""
+        if 'datetime' in obj:
+            return datetime.fromisoformat(obj['datetime'])
+        if 'date' in obj:
+            return date.fromisoformat(obj['date'])
+        if 'decimal' in obj:
+            return Decimal(obj['decimal'])
+        return obj
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Read index.json, dropping entries whose files have gone."""
+        try:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE), 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        return {key: entry for key, entry in index.items()
+                if os.path.exists(self._entry_path(key))}
+
+    def _save_index(self):
+        atomic_write_json(os.path.join(self.cache_dir, self.INDEX_FILE), self._index)
+
+    def _remove(self, key: str):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Purge expired entries, then the least recently used until under max_bytes."""
+        now = time.time()
+        for key in [k for k, entry in self._index.items() if entry['expires'] < now]:
+            self._remove(key)
+        total = sum(entry['size'] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= self._index[key]['size']
+            self._remove(key)
+
+    def get(self, query: str, params: Optional[List] = None,
+            ttl: Optional[int] = None) -> Optional[Iterator[list]]:
+        """
+        Look up a statement's result.
+
+        Args:
+            query: SQL statement text
+            params: Bound parameters
+            ttl: Maximum entry age in seconds (default: default_ttl)
+
+        Returns:
+            Iterator over the cached fetchmany() batches, or None on a miss
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        key = self.make_key(query, params)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or time.time() - entry['created'] > ttl:
+                self.misses += 1
+                return None
+            # Opened under the lock so a concurrent eviction cannot pull it away
+            f = gzip.open(self._entry_path(key), 'rt', encoding='utf-8')
+            entry['last_used'] = time.time()  # Persisted with the next store
+            self.hits += 1
+        return self._replay(f)
+
+    def _replay(self, f) -> Iterator[list]:
+        with f:
+            for line in f:
+                yield [tuple(row) for row in json.loads(line, object_hook=self.decode_value)]
+
+    def record(self, query: str, params: Optional[List], batches: Iterable[list],
+               ttl: Optional[int] = None) -> Iterator[list]:
+        """
+        Pass batches through unchanged, storing them once they are exhausted.
+
+        Nothing is stored if the iteration fails or is abandoned part way.
+
+        Args:
+            query: SQL statement text
+            params: Bound parameters
+            batches: Live fetchmany() batches
+            ttl: Entry lifetime in seconds (default: default_ttl)
+        """
+        key = self.make_key(query, params)
+        path = self._entry_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+                for rows in batches:
+                    f.write(json.dumps([list(row) for row in rows], default=self.encode_value))
+                    f.write('\n')
+                    yield rows
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            os.replace(temp_path, path)
+            self._index[key] = {'created': now, 'expires': now + ttl, 'last_used': now,
+                                'size': os.path.getsize(path)}
+            self._evict()
+            self._save_index()
+
+    def stats(self) -> Tuple[int, int]:
+        """
+        Returns:
+            Tuple of (hits, misses) since the cache was opened
+        """
+        with self._lock:
+            return self.hits, self.misses
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections."""
+
+    def __init__(self, factory: Callable, max_size: int = 1, initial: Optional[List] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            factory: Callable that opens a new connection
+            max_size: Maximum number of connections checked out at once
+            initial: Already-open connections to seed the pool with
+        """
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._connections = []
+        for conn in initial or []:
+            self._connections.append(conn)
+            self._idle.put(conn)
+
+    def acquire(self):
+        """
+        Check out a connection, opening one if none is idle.
+
+        Blocks while max_size connections are already checked out.
+        """
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            conn = self.factory()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def release(self, conn):
+        """Return a checked-out connection to the pool."""
+        self._idle.put(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and back in."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every connection the pool has opened."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except pyodbc.Error:
+                pass
 
 
 class EZLinksRoundsDB:
     """Query SQL Server database for ezlrounds data."""
 
     def __init__(self, server: str, database: str, username: Optional[str] = None,
-                 password: Optional[str] = None, use_windows_auth: bool = True):
+                 password: Optional[str] = None, use_windows_auth: bool = True,
+                 fetch_batch_size: int = DEFAULT_FETCH_BATCH_SIZE, pool_size: int = 1,
+                 result_cache: Optional[ResultCache] = None,
+                 metrics: Optional[QueryMetrics] = None,
+                 connection_factory: Optional[Callable] = None,
+                 series_mirror: bool = True):
         """
         Initialize database connection.
 
@@ -23,16 +427,41 @@ class EZLinksRoundsDB:
             username: Username (if using SQL auth)
             password: Password (if using SQL auth)
             use_windows_auth: Use Windows authentication (default True)
+            fetch_batch_size: Rows per cursor.fetchmany() call when streaming
+            pool_size: Maximum concurrent connections (one per worker thread)
+            result_cache: Optional ResultCache that repeated statements are served from
+            metrics: Optional QueryMetrics log that every statement's timings go to
+            connection_factory: Optional callable that opens a pyodbc-style
+                                connection, replacing pyodbc.connect (e.g. a
+                                sqlite_backend.SQLiteBackend stand-in)
+            series_mirror: Keep a binary mirror (<csv>.series) of every cache
+                           written, for the analysis to map instead of parsing
         """
         self.server = server
         self.database = database
         self.username = username
         self.password = password
         self.use_windows_auth = use_windows_auth
+        self.fetch_batch_size = fetch_batch_size
+        self.pool_size = pool_size
+        self.result_cache = result_cache
+        self.metrics = metrics
+        self.connection_factory = connection_factory
+        self.series_mirror = series_mirror
         self.connection = None
+        self.pool = None
+        # Executions per distinct statement text (plan cache reuse indicator)
+        self.statement_counts = Counter()
+        self._statement_lock = threading.Lock()
+        # Cursors with a statement in flight, so cancel() can abort them
+        self._active_cursors = set()
+        self._cursor_lock = threading.Lock()
+        self._cancelled = threading.Event()
+        # Caches whose refresh failed or was cancelled this run
+        self.stale_caches = set()
 
-    def connect(self):
-        """Establish database connection."""
+    def _connection_string(self) -> str:
+        """Build the ODBC connection string."""
         if self.use_windows_auth:
             conn_str = (
                 f"DRIVER={{ODBC Driver 18 for SQL Server}};"
@@ -50,9 +479,23 @@ class EZLinksRoundsDB:
                 f"PWD={self.password};"
                 f"TrustServerCertificate=yes;"
             )
+        return conn_str
+
+    def connect(self):
+        """
+        Establish database connection.
+
+        The first connection is opened eagerly to validate the settings; the
+        pool opens up to pool_size - 1 more on demand.
+        """
+        factory = self.connection_factory
+        if factory is None:
+            conn_str = self._connection_string()
+            factory = lambda: pyodbc.connect(conn_str)
 
         try:
-            self.connection = pyodbc.connect(conn_str)
+            self.connection = factory()
+            self.pool = ConnectionPool(factory, self.pool_size, initial=[self.connection])
             print(f"Connected to {self.database} on {self.server}")
             return True
         except pyodbc.Error as e:
@@ -61,40 +504,62 @@ class EZLinksRoundsDB:
 
     def disconnect(self):
         """Close database connection."""
-        if self.connection:
-            self.connection.close()
+        if self.pool:
+            self.pool.close_all()
+            self.pool = None
+            self.connection = None
             print("Disconnected from database")
 
-    def query_rounds_data(self, table_name: str, date_column: str = "playdatekey",
-                         count_column: str = "count", start_date: Optional[str] = None,
-                         end_date: Optional[str] = None, base_query: Optional[str] = None,
-                         filtered_query: Optional[str] = None, order_by: Optional[str] = None) -> List[Dict]:
+    def _ensure_connected(self) -> bool:
+        """Connect on first use."""
+        return self.pool is not None or self.connect()
+
+    def _execute(self, cursor, query: str, params: Optional[List] = None):
+        """Execute a statement, recording its text for statement_stats()."""
+        with self._statement_lock:
+            self.statement_counts[query] += 1
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+
+    def statement_stats(self) -> Tuple[int, int]:
         """
-        Query rounds data from the database.
+        Report statement text reuse for this connection's lifetime.
+
+        Returns:
+            Tuple of (distinct statement texts, total executions)
+        """
+        with self._statement_lock:
+            return len(self.statement_counts), sum(self.statement_counts.values())
+
+    def build_rounds_query(self, table_name: str, date_column: str = "playdatekey",
+                           count_column: str = "count", start_date: Optional[str] = None,
+                           end_date: Optional[str] = None, base_query: Optional[str] = None,
+                           filtered_query: Optional[str] = None, order_by: Optional[str] = None,
+                           date_param_type: str = 'str') -> Tuple[str, List]:
+        """
+        Build the SQL statement used to pull rounds data.
+
+        Date filters are emitted as ? parameter markers rather than literals,
+        so the statement text is the same on every run and SQL Server can
+        reuse its cached plan.
 
         Args:
-            table_name: Name of the table to query
-            date_column: Name of the date column (default: playdatekey)
-            count_column: Name of the count column (default: count)
-            start_date: Optional start date filter (YYYYMMDD format)
-            end_date: Optional end date filter (YYYYMMDD format)
-            base_query: Optional custom SQL query template (from config)
-            filtered_query: Optional custom SQL query with WHERE clause (from config)
-            order_by: Optional ORDER BY clause (from config)
+            See query_rounds_data.
 
         Returns:
-            List of dictionaries with playdatekey and count
+            Tuple of (SQL query string, list of bound parameters)
         """
-        if not self.connection:
-            if not self.connect():
-                return []
-
         # Build WHERE clause if dates provided
         where_clauses = []
+        params = []
         if start_date:
-            where_clauses.append(f"{date_column} >= '{start_date}'")
+            where_clauses.append(f"{date_column} >= ?")
+            params.append(bind_date_param(start_date, date_param_type))
         if end_date:
-            where_clauses.append(f"{date_column} <= '{end_date}'")
+            where_clauses.append(f"{date_column} <= ?")
+            params.append(bind_date_param(end_date, date_param_type))
 
         # Build query
         if where_clauses and filtered_query:
@@ -127,19 +592,236 @@ class EZLinksRoundsDB:
         else:
             query += f" ORDER BY {date_column}"
 
+        return query, params
+
+    def iter_rounds_data(self, table_name: str, date_column: str = "playdatekey",
+                         count_column: str = "count", start_date: Optional[str] = None,
+                         end_date: Optional[str] = None, base_query: Optional[str] = None,
+                         filtered_query: Optional[str] = None, order_by: Optional[str] = None,
+                         batch_size: Optional[int] = None, date_param_type: str = 'str',
+                         cache_ttl: Optional[int] = None,
+                         statement_timeout: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Stream rounds data from the database one fetchmany() batch at a time.
+
+        Rows are yielded as soon as each batch arrives, so callers can write
+        them out without holding the full result set in memory.
+
+        Args:
+            table_name: Name of the table to query
+            date_column: Name of the date column (default: playdatekey)
+            count_column: Name of the count column (default: count)
+            start_date: Optional start date filter (YYYYMMDD format)
+            end_date: Optional end date filter (YYYYMMDD format)
+            base_query: Optional custom SQL query template (from config)
+            filtered_query: Optional custom SQL query with WHERE clause (from config)
+            order_by: Optional ORDER BY clause (from config)
+            batch_size: Rows per fetchmany() call (default: fetch_batch_size)
+            date_param_type: How date filters are bound (see bind_date_param)
+            cache_ttl: Result cache lifetime in seconds (None: cache default, 0: bypass)
+            statement_timeout: Seconds before the warehouse statement is aborted (None: no limit)
+
+        Yields:
+            Dictionaries with playdatekey and count
+
+        Raises:
+            pyodbc.Error: If the query fails (callers decide how to report it)
+        """
+        if not self._ensure_connected():
+            return
+
+        query, params = self.build_rounds_query(
+            table_name, date_column, count_column,
+            start_date=start_date,
+            end_date=end_date,
+            base_query=base_query,
+            filtered_query=filtered_query,
+            order_by=order_by,
+            date_param_type=date_param_type
+        )
+
+        for row in self._iter_rows(query, params, batch_size, cache_ttl, statement_timeout):
+            yield {
+                'playdatekey': str(row[0]),
+                'count': int(row[1])
+            }
+
+    def _iter_rows(self, query: str, params: List, batch_size: Optional[int] = None,
+                   cache_ttl: Optional[int] = None,
+                   statement_timeout: Optional[int] = None) -> Iterator[tuple]:
+        """Execute a statement on a pooled connection and stream its raw rows."""
+        for rows in self._iter_batches(query, params, batch_size, cache_ttl, statement_timeout):
+            yield from rows
+
+    def _iter_batches(self, query: str, params: List, batch_size: Optional[int] = None,
+                      cache_ttl: Optional[int] = None,
+                      statement_timeout: Optional[int] = None) -> Iterator[list]:
+        """
+        Yield a statement's fetchmany() batches.
+
+        Served from the result cache when it holds a fresh entry; otherwise
+        the statement runs on a pooled connection and its result is stored.
+        A TTL of 0 (the cache default unless the query sets one) bypasses
+        the cache.
+        """
+        if self.result_cache is None:
+            ttl = 0
+        else:
+            ttl = self.result_cache.default_ttl if cache_ttl is None else cache_ttl
+        if ttl == 0:
+            yield from self._fetch_batches(query, params, batch_size, statement_timeout)
+            return
+
+        cached = self.result_cache.get(query, params, cache_ttl)
+        if cached is not None:
+            print(f"Using cached result for query: {query}")
+            if params:
+                print(f"Parameters: {params}")
+            yield from cached
+            return
+
+        yield from self.result_cache.record(query, params,
+                                            self._fetch_batches(query, params, batch_size,
+                                                                statement_timeout),
+                                            cache_ttl)
+
+    def _fetch_batches(self, query: str, params: List, batch_size: Optional[int] = None,
+                       statement_timeout: Optional[int] = None) -> Iterator[list]:
+        """Execute a statement on a pooled connection and yield its fetchmany() batches."""
+        batch_size = batch_size or self.fetch_batch_size
+
         print(f"Executing query: {query}")
+        if params:
+            print(f"Parameters: {params}")
 
+        timer = self._timer(query)
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query)
+            with self._statement_cursor(statement_timeout) as cursor:
+                timer.connected()
+                self._execute(cursor, query, params)
+                timer.executed()
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    if self._cancelled.is_set():
+                        raise QueryCancelled("Run cancelled while fetching")
+                    timer.fetched(rows)
+                    yield rows
+        except BaseException as e:
+            timer.status = self._failure_status(e)
+            raise
+        finally:
+            timer.finish()
+
+    def _timer(self, query: str):
+        """Start timing a statement (a no-op timer when metrics are off)."""
+        return self.metrics.timer(query) if self.metrics else NullTimer()
+
+    @staticmethod
+    def _failure_status(error: BaseException) -> str:
+        """Metrics status for a statement that ended with `error`."""
+        if isinstance(error, QueryCancelled):
+            return 'cancelled'
+        if isinstance(error, GeneratorExit):
+            # The caller stopped reading before the last row
+            return 'abandoned'
+        return 'error'
+
+    @contextmanager
+    def _statement_cursor(self, statement_timeout: Optional[int] = None):
+        """
+        Open a cancellable cursor on a pooled connection.
+
+        The connection's query timeout is set for the statement (pyodbc
+        raises OperationalError once it passes), and the cursor is tracked
+        so cancel() can abort it from another thread.
+
+        Raises:
+            QueryCancelled: If the run has been cancelled
+        """
+        if self._cancelled.is_set():
+            raise QueryCancelled("Run cancelled; statement not started")
+        with self.pool.connection() as connection:
+            connection.timeout = statement_timeout or 0
+            cursor = connection.cursor()
+            with self._cursor_lock:
+                self._active_cursors.add(cursor)
+            try:
+                # cancel() may have run before the cursor was registered
+                if self._cancelled.is_set():
+                    raise QueryCancelled("Run cancelled; statement not started")
+                yield cursor
+            finally:
+                with self._cursor_lock:
+                    self._active_cursors.discard(cursor)
+                cursor.close()
+
+    def cancel(self):
+        """
+        Stop warehouse work: abort in-flight statements and refuse new ones.
+
+        Safe to call from another thread (e.g. a run deadline timer).
+        Interrupted pulls raise QueryCancelled, which the update methods
+        report like any other query error, leaving the cache as it was.
+        """
+        self._cancelled.set()
+        with self._cursor_lock:
+            cursors = list(self._active_cursors)
+        for cursor in cursors:
+            try:
+                cursor.cancel()
+            except pyodbc.Error:
+                pass
+        print(f"Cancelled {len(cursors)} in-flight statement(s)")
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancel() has been called."""
+        return self._cancelled.is_set()
+
+    def mark_stale(self, csv_file: str):
+        """Record that a cache could not be brought up to date this run."""
+        with self._cursor_lock:
+            self.stale_caches.add(csv_file)
+
+    def query_rounds_data(self, table_name: str, date_column: str = "playdatekey",
+                         count_column: str = "count", start_date: Optional[str] = None,
+                         end_date: Optional[str] = None, base_query: Optional[str] = None,
+                         filtered_query: Optional[str] = None, order_by: Optional[str] = None,
+                         date_param_type: str = 'str', cache_ttl: Optional[int] = None,
+                         statement_timeout: Optional[int] = None) -> List[Dict]:
+        """
+        Query rounds data from the database.
 
-            results = []
-            for row in cursor:
-                results.append({
-                    'playdatekey': str(row[0]),
-                    'count': int(row[1])
-                })
+        Args:
+            table_name: Name of the table to query
+            date_column: Name of the date column (default: playdatekey)
+            count_column: Name of the count column (default: count)
+            start_date: Optional start date filter (YYYYMMDD format)
+            end_date: Optional end date filter (YYYYMMDD format)
+            base_query: Optional custom SQL query template (from config)
+            filtered_query: Optional custom SQL query with WHERE clause (from config)
+            order_by: Optional ORDER BY clause (from config)
+            date_param_type: How date filters are bound (see bind_date_param)
+            cache_ttl: Result cache lifetime in seconds (None: cache default, 0: bypass)
+            statement_timeout: Seconds before the warehouse statement is aborted (None: no limit)
 
+        Returns:
+            List of dictionaries with playdatekey and count
+        """
+        try:
+            results = list(self.iter_rounds_data(
+                table_name, date_column, count_column,
+                start_date=start_date,
+                end_date=end_date,
+                base_query=base_query,
+                filtered_query=filtered_query,
+                order_by=order_by,
+                date_param_type=date_param_type,
+                cache_ttl=cache_ttl,
+                statement_timeout=statement_timeout
+            ))
             print(f"Retrieved {len(results)} records")
             return results
 
@@ -147,8 +829,55 @@ class EZLinksRoundsDB:
             print(f"Error executing query: {e}")
             return []
 
+    def query_rounds_columns(self, table_name: str, date_column: str = "playdatekey",
+                             count_column: str = "count", start_date: Optional[str] = None,
+                             end_date: Optional[str] = None, base_query: Optional[str] = None,
+                             filtered_query: Optional[str] = None, order_by: Optional[str] = None,
+                             date_param_type: str = 'str',
+                             cache_ttl: Optional[int] = None,
+                             statement_timeout: Optional[int] = None) -> Optional[SeriesColumns]:
+        """
+        Query rounds data into typed arrays instead of per-row dicts.
+
+        Each fetchmany() batch is appended straight onto an array('i') of
+        YYYYMMDD date keys and an array('q') of counts. Use
+        SeriesColumns.as_numpy() for zero-copy NumPy views, and pass the
+        result to export_to_csv() or past_low_anomalies.analyze_csv().
+
+        Args:
+            See query_rounds_data.
+
+        Returns:
+            SeriesColumns, or None if the query failed
+        """
+        if not self._ensure_connected():
+            return None
+
+        query, params = self.build_rounds_query(
+            table_name, date_column, count_column,
+            start_date=start_date,
+            end_date=end_date,
+            base_query=base_query,
+            filtered_query=filtered_query,
+            order_by=order_by,
+            date_param_type=date_param_type
+        )
+
+        series = SeriesColumns()
+        try:
+            for rows in self._iter_batches(query, params, cache_ttl=cache_ttl,
+                                           statement_timeout=statement_timeout):
+                series.extend_rows(rows)
+        except pyodbc.Error as e:
+            print(f"Error executing query: {e}")
+            return None
+
+        print(f"Retrieved {len(series)} records")
+        return series
+
     def get_latest_date(self, table_name: str, date_column: str = "playdatekey",
-                       max_date_query: Optional[str] = None) -> Optional[str]:
+                       max_date_query: Optional[str] = None,
+                       statement_timeout: Optional[int] = None) -> Optional[str]:
         """
         Get the latest date in the database.
 
@@ -156,13 +885,13 @@ class EZLinksRoundsDB:
             table_name: Name of the table to query
             date_column: Name of the date column
             max_date_query: Optional custom SQL query template (from config)
+            statement_timeout: Seconds before the statement is aborted (None: no limit)
 
         Returns:
             Latest date as string (YYYYMMDD format) or None
         """
-        if not self.connection:
-            if not self.connect():
-                return None
+        if not self._ensure_connected():
+            return None
 
         if max_date_query:
             query = max_date_query.format(date_column=date_column, table=table_name)
@@ -170,9 +899,19 @@ class EZLinksRoundsDB:
             query = f"SELECT MAX({date_column}) FROM {table_name}"
 
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query)
-            result = cursor.fetchone()
+            timer = self._timer(query)
+            try:
+                with self._statement_cursor(statement_timeout) as cursor:
+                    timer.connected()
+                    self._execute(cursor, query)
+                    timer.executed()
+                    result = cursor.fetchone()
+                    timer.fetched([result] if result else [])
+            except BaseException as e:
+                timer.status = self._failure_status(e)
+                raise
+            finally:
+                timer.finish()
 
             if result and result[0]:
                 return str(result[0])
@@ -182,37 +921,115 @@ class EZLinksRoundsDB:
             print(f"Error getting latest date: {e}")
             return None
 
-    def export_to_csv(self, data: List[Dict], output_file: str = "ezlrounds.csv"):
+    @staticmethod
+    def _peek(rows: Iterable[Dict]):
+        """
+        Split an iterable into its first row and an iterator over the rest.
+
+        Returns:
+            Tuple of (first row or None, iterator over remaining rows)
+        """
+        rows = iter(rows)
+        return next(rows, None), rows
+
+    def _write_manifest(self, csv_file: str, manifest: Dict, previous: Optional[Dict] = None):
+        """
+        Write a cache's manifest, then its binary mirror if enabled.
+
+        After an append, pass the manifest from before it as `previous` so the
+        mirror only takes the new rows (see cache_files.write_series_mirror).
+        """
+        write_manifest(csv_file, manifest)
+        if self.series_mirror:
+            try:
+                offset = previous['byte_size'] if previous is not None else None
+                write_series_mirror(csv_file, manifest, previous, offset)
+            except (OSError, ValueError) as e:
+                # The analysis falls back to the CSV when the mirror doesn't match
+                print(f"Warning: could not write binary mirror for {csv_file}: {e}")
+
+    def export_to_csv(self, data, output_file: str = "ezlrounds.csv") -> int:
         """
         Export data to CSV file.
 
+        Accepts a list or a streaming iterator of row dicts (see
+        iter_rounds_data), or a SeriesColumns (see query_rounds_columns). Rows are
+        written to a temporary file as they arrive, fsynced, and moved over
+        the existing file only once the stream completes, so neither a failed
+        pull nor a crash leaves a truncated cache behind. Caches with a
+        compressed suffix (see cache_files.open_cache) are encoded as they
+        are written.
+
         Args:
-            data: List of dictionaries with playdatekey and count
+            data: Iterable of dictionaries with playdatekey and count, or SeriesColumns
             output_file: Output CSV filename
-        """
-        if not data:
-            print("No data to export")
-            return
 
+        Returns:
+            Number of records written
+        """
+        temp_file = output_file + ".tmp"
         try:
-            with open(output_file, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=['playdatekey', 'count'])
-                writer.writeheader()
-                writer.writerows(data)
+            if isinstance(data, SeriesColumns):
+                rows = data.iter_rows()
+            else:
+                rows = ((row['playdatekey'], row['count']) for row in data)
+            first, rest = self._peek(rows)
+            if first is None:
+                print("No data to export")
+                return 0
+
+            with open_cache(temp_file, 'w', cache_compression(output_file)) as f:
+                writer = csv.writer(f)
+                writer.writerow(['playdatekey', 'count'])
+                count = 0
+                for row in itertools.chain([first], rest):
+                    writer.writerow(row)
+                    count += 1
+            fsync_file(temp_file)
+            os.replace(temp_file, output_file)
+            sync_directory(output_file)
+            self._write_manifest(output_file, build_manifest(output_file))
 
-            print(f"Exported {len(data)} records to {output_file}")
+            print(f"Exported {count} records to {output_file}")
+            return count
 
+        except pyodbc.Error as e:
+            print(f"Error executing query: {e}")
         except IOError as e:
             print(f"Error writing to file: {e}")
+        except BaseException:
+            # Anything else (a bad row, an interrupt) still propagates, minus the temp file
+            self._discard_export(output_file, temp_file)
+            raise
+
+        self._discard_export(output_file, temp_file)
+        return 0
+
+    def _discard_export(self, output_file: str, temp_file: str):
+        """Mark a cache stale after a failed export and remove its partial temp file."""
+        self.mark_stale(output_file)
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
 
     def update_csv(self, table_name: str, csv_file: str = "ezlrounds.csv",
                    date_column: str = "playdatekey", count_column: str = "count",
                    base_query: Optional[str] = None, filtered_query: Optional[str] = None,
                    order_by: Optional[str] = None, max_date_query: Optional[str] = None,
-                   force_start_date: Optional[str] = None, end_date: Optional[str] = None):
+                   force_start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   date_param_type: str = 'str', trailing_days: int = 0,
+                   statement_timeout: Optional[int] = None):
         """
         Update CSV file with new data from database.
 
+        New rows are streamed from the cursor straight into the CSV writer.
+        The watermark comes from the cache's manifest (see cache_files), so
+        the CSV itself is only scanned when the manifest is missing or stale.
+        Incremental pulls always go to the warehouse, never the result cache.
+
+        With trailing_days set, the last trailing_days before the watermark
+        are re-fetched too and upserted into the cache, so late-arriving or
+        restated counts for recent days are picked up without a full refresh.
+
         Args:
             table_name: Name of the table to query
             csv_file: CSV file to update
@@ -224,78 +1041,359 @@ class EZLinksRoundsDB:
             max_date_query: Optional custom MAX query (from config)
             force_start_date: Optional forced start date (overrides CSV date)
             end_date: Optional end date filter
+            date_param_type: How date filters are bound (see bind_date_param)
+            trailing_days: Days before the latest cached date to re-fetch and upsert
+            statement_timeout: Seconds before the warehouse statement is aborted (None: no limit)
         """
-        # Read existing CSV to find latest date
-        latest_csv_date = None
-        try:
-            with open(csv_file, 'r') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    latest_csv_date = row['playdatekey']
+        manifest, start_date, upsert = self._update_start(csv_file, force_start_date, trailing_days)
+
+        # Stream new data from the database (all data if no start date)
+        rows = self.iter_rounds_data(
+            table_name, date_column, count_column,
+            start_date=start_date,
+            end_date=end_date,
+            base_query=base_query,
+            filtered_query=filtered_query,
+            order_by=order_by,
+            date_param_type=date_param_type,
+            cache_ttl=0,
+            statement_timeout=statement_timeout
+        )
+        self._apply_update(csv_file, manifest, start_date, rows, force_start_date, upsert)
+
+    def _update_start(self, csv_file: str, force_start_date: Optional[str] = None,
+                      trailing_days: int = 0):
+        """
+        Work out where an incremental update of a cache should start.
+
+        The watermark comes from the cache's manifest (see cache_files).
+
+        Returns:
+            Tuple of (manifest or None, start date or None for a full pull,
+            whether fetched rows should be upserted rather than appended)
+        """
+        manifest = load_manifest(csv_file)
+        if manifest:
+            latest_csv_date = manifest['max_date']
             print(f"Latest date in CSV: {latest_csv_date}")
-        except FileNotFoundError:
+        else:
+            latest_csv_date = None
             print(f"CSV file not found, will create new file")
 
         # Determine start date to use
         if force_start_date:
             start_date = force_start_date
             print(f"Using forced start date: {start_date}")
+        elif latest_csv_date and trailing_days > 0:
+            start_date = shift_date_key(latest_csv_date, -trailing_days)
+            print(f"Re-fetching trailing {trailing_days} days from: {start_date}")
+            return manifest, start_date, True
         elif latest_csv_date:
             start_date = latest_csv_date
         else:
             start_date = None
 
-        # Query database for new data
-        if start_date:
-            # Get data after the start date
-            data = self.query_rounds_data(
-                table_name, date_column, count_column,
-                start_date=start_date,
-                end_date=end_date,
-                base_query=base_query,
-                filtered_query=filtered_query,
-                order_by=order_by
-            )
-            # Remove the duplicate date if it exists (only if not forced)
-            if not force_start_date and data and data[0]['playdatekey'] == start_date:
-                data = data[1:]
-        else:
-            # Get all data
-            data = self.query_rounds_data(
-                table_name, date_column, count_column,
-                end_date=end_date,
-                base_query=base_query,
-                filtered_query=filtered_query,
-                order_by=order_by
-            )
+        return manifest, start_date, False
 
-        if not data:
-            print("No new data to update")
+    def _apply_update(self, csv_file: str, manifest: Optional[Dict], start_date: Optional[str],
+                      rows: Iterable[Dict], force_start_date: Optional[str] = None,
+                      upsert: bool = False):
+        """Append (or upsert) streamed rows to a cache, or write a new cache if there is none."""
+        # Append to existing CSV or create new
+        if not (manifest and manifest['max_date'] and not force_start_date):
+            self.export_to_csv(rows, csv_file)
+            return
+
+        if upsert:
+            try:
+                self.upsert_csv_rows(csv_file, manifest, start_date, rows)
+            except pyodbc.Error as e:
+                print(f"Error executing query: {e}")
+                self.mark_stale(csv_file)
+            except IOError as e:
+                print(f"Error updating CSV file: {e}")
+                self.mark_stale(csv_file)
             return
 
-        # Append to existing CSV or create new
         try:
-            if latest_csv_date and not force_start_date:
-                # Append mode
-                with open(csv_file, 'a', newline='') as f:
+            first, rest = self._peek(rows)
+            # Remove the duplicate date if it exists
+            if first is not None and first['playdatekey'] == start_date:
+                first, rest = self._peek(rest)
+
+            if first is None:
+                print("No new data to update")
+                return
+
+            # Rows stream in while appending; a failed pull rolls the append back
+            count = 0
+            with journaled(csv_file, manifest, manifest['byte_size']):
+                with open_cache(csv_file, 'a') as f:
                     writer = csv.DictWriter(f, fieldnames=['playdatekey', 'count'])
-                    writer.writerows(data)
-                print(f"Appended {len(data)} new records to {csv_file}")
-            else:
-                # Create new file
-                self.export_to_csv(data, csv_file)
+                    for row in itertools.chain([first], rest):
+                        writer.writerow(row)
+                        count += 1
+                self._write_manifest(csv_file, extend_manifest(csv_file, manifest,
+                                                               manifest['byte_size']),
+                                     previous=manifest)
+            print(f"Appended {count} new records to {csv_file}")
 
+        except pyodbc.Error as e:
+            print(f"Error executing query: {e}")
+            self.mark_stale(csv_file)
         except IOError as e:
             print(f"Error updating CSV file: {e}")
+            self.mark_stale(csv_file)
+
+    def upsert_csv_rows(self, csv_file: str, manifest: Dict, start_date: str,
+                        rows: Iterable[Dict]) -> Dict[str, List[str]]:
+        """
+        Merge fetched rows into a cache from start_date onwards.
+
+        Rows dated start_date or later are read back from the end of the
+        cache (find_date_offset scans backwards, so only the tail is read),
+        updated or extended with the fetched rows, and rewritten in date
+        order. Cached dates missing from the fetch are kept. The rewrite is
+        journaled (see cache_files.journaled), so a crash part-way through
+        is rolled back rather than leaving a cut-off cache. A compressed
+        cache can't be cut at a byte offset, so it is re-encoded whole
+        instead: its rows are streamed from the old file into a new one,
+        holding only the trailing window in memory, but the time taken
+        grows with the cache's history.
+
+        Args:
+            csv_file: CSV cache file
+            manifest: Current manifest for csv_file
+            start_date: First date covered by `rows`
+            rows: Fetched rows, dated start_date or later
+
+        Returns:
+            Dictionary with 'changed' and 'added' lists of dates
+        """
+        compressed = cache_compression(csv_file) is not None
+        if compressed:
+            cached = {date: count for date, count in self._read_cache_rows(csv_file)
+                      if date >= start_date}
+        else:
+            offset = find_date_offset(csv_file, start_date, manifest['byte_size'])
+            cached = read_rows_from(csv_file, offset)
+
+        merged = dict(cached)
+        changed = []
+        added = []
+        for row in rows:
+            date, count = row['playdatekey'], str(row['count'])
+            if date not in cached:
+                added.append(date)
+            elif cached[date] != count:
+                changed.append(date)
+            merged[date] = count
+
+        if not changed and not added:
+            print("No new data to update")
+            return {'changed': changed, 'added': added}
+
+        if compressed:
+            # export_to_csv writes a temp file, so the old cache can be streamed meanwhile
+            head = ((date, count) for date, count in self._read_cache_rows(csv_file)
+                    if date < start_date)
+            rewritten = itertools.chain(head, sorted(merged.items()))
+            self.export_to_csv(({'playdatekey': date, 'count': count} for date, count in rewritten),
+                               csv_file)
+        else:
+            prefix = truncated_manifest(csv_file, manifest, offset, len(cached))
+            with journaled(csv_file, manifest, offset):
+                with open(csv_file, 'r+', newline='') as f:
+                    f.truncate(offset)
+                    f.seek(offset)
+                    writer = csv.writer(f)
+                    for date in sorted(merged):
+                        writer.writerow([date, merged[date]])
+                self._write_manifest(csv_file, extend_manifest(csv_file, prefix, offset))
+
+        print(f"Upserted {csv_file} from {start_date}: {len(added)} new, {len(changed)} changed")
+        for date in changed:
+            print(f"  Changed {date}: {cached[date]} -> {merged[date]}")
+        return {'changed': changed, 'added': added}
+
+    @staticmethod
+    def _read_cache_rows(csv_file: str) -> Iterator[Tuple[str, str]]:
+        """Stream (date, count) rows from a cache, decoding it if compressed."""
+        with open_cache(csv_file) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if row:
+                    yield row[0], row[1]
+
+    def _spool_fused_rows(self, group: Dict, start_date: Optional[str], end_date: Optional[str],
+                          spool_dir: str, cache_ttl: Optional[int] = None) -> Dict[str, str]:
+        """
+        Run a fused statement once and split its rows per member query.
+
+        The statement returns (fuse_column value, date, count) rows; each
+        member's rows are spooled to its own file in spool_dir so they can
+        be streamed into the member's cache afterwards. Rows are routed by
+        query_loader.fuse_key, so the driver's form of the value (e.g. a
+        padded CHAR or a Decimal) still finds its member.
+
+        Args:
+            cache_ttl: Result cache lifetime in seconds (default: the group's)
+
+        Returns:
+            Dictionary mapping member query name to its spool file
+
+        Raises:
+            pyodbc.Error: If the query fails, or returns rows that match no member
+        """
+        query, params = self.build_rounds_query(
+            "N/A", group['date_column'], group['count_column'],
+            start_date=start_date,
+            end_date=end_date,
+            base_query=group['base_query'],
+            filtered_query=group['filtered_query'],
+            order_by=group['order_by'],
+            date_param_type=group['date_param_type']
+        )
+
+        spools = {}
+        files = {}
+        writers = {}
+        try:
+            for key, member in group['members'].items():
+                spools[member['name']] = os.path.join(spool_dir, f"{member['name']}.csv")
+                files[key] = open(spools[member['name']], 'w', newline='')
+                writers[key] = csv.writer(files[key])
+
+            counts = Counter()
+            unrouted = Counter()
+            integer = group.get('fuse_integer', False)
+            if cache_ttl is None:
+                cache_ttl = group.get('cache_ttl')
+            for row in self._iter_rows(query, params, cache_ttl=cache_ttl,
+                                       statement_timeout=group.get('statement_timeout')):
+                key = fuse_key(row[0], integer)
+                if key in writers:
+                    writers[key].writerow([str(row[1]), int(row[2])])
+                    counts[key] += 1
+                else:
+                    unrouted[repr(row[0])] += 1
+        finally:
+            for f in files.values():
+                f.close()
+
+        if unrouted:
+            # A member would silently miss its rows; fail the group instead
+            values = ', '.join(f"{value} ({n} rows)" for value, n in unrouted.most_common(5))
+            raise pyodbc.Error(f"{sum(unrouted.values())} rows of {group['name']} matched no "
+                               f"{group['fuse_column']} member: {values}")
+
+        for key, member in group['members'].items():
+            print(f"Retrieved {counts[key]} records for {member['name']}")
+        return spools
+
+    @staticmethod
+    def _make_spool_dir(group: Dict) -> str:
+        """Create a temporary spool directory next to the group's caches."""
+        first_csv = next(iter(group['members'].values()))['csv_file']
+        return tempfile.mkdtemp(prefix='fused-', dir=os.path.dirname(first_csv) or None)
+
+    @staticmethod
+    def _read_spool(spool_file: str, start_date: Optional[str] = None) -> Iterator[Dict]:
+        """Stream rows back from a spool file, optionally from start_date on."""
+        with open(spool_file, 'r', newline='') as f:
+            for row in csv.DictReader(f, fieldnames=['playdatekey', 'count']):
+                if start_date is None or row['playdatekey'] >= start_date:
+                    yield row
+
+    def update_fused_csvs(self, group: Dict, force_start_date: Optional[str] = None,
+                          end_date: Optional[str] = None, trailing_days: Optional[int] = None):
+        """
+        Incrementally update every member cache of a fusion group.
+
+        One fused statement is run from the earliest member watermark and
+        its rows are fanned out to each member's CSV (see update_csv).
+
+        Args:
+            group: Fusion group (from query_loader.find_fusion_groups)
+            force_start_date: Optional forced start date (overrides CSV dates)
+            end_date: Optional end date filter
+            trailing_days: Trailing upsert window for every member (default:
+                           each member's own trailing_days)
+        """
+        starts = {}
+        for member in group['members'].values():
+            print(f"{member['name']}:")
+            member_trailing = trailing_days if trailing_days is not None else member.get('trailing_days', 0)
+            starts[member['name']] = self._update_start(member['csv_file'], force_start_date,
+                                                        member_trailing)
+
+        member_starts = [start for _, start, _ in starts.values()]
+        fused_start = None if None in member_starts else min(member_starts)
+
+        spool_dir = self._make_spool_dir(group)
+        try:
+            try:
+                spools = self._spool_fused_rows(group, fused_start, end_date, spool_dir, cache_ttl=0)
+            except pyodbc.Error as e:
+                print(f"Error executing query: {e}")
+                for member in group['members'].values():
+                    self.mark_stale(member['csv_file'])
+                return
+
+            for member in group['members'].values():
+                manifest, start_date, upsert = starts[member['name']]
+                print(f"{member['name']}:")
+                rows = self._read_spool(spools[member['name']], start_date)
+                self._apply_update(member['csv_file'], manifest, start_date, rows,
+                                   force_start_date, upsert)
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+    def refresh_fused_csvs(self, group: Dict, start_date: Optional[str] = None,
+                           end_date: Optional[str] = None):
+        """
+        Fully refresh every member cache of a fusion group with one statement.
+
+        Args:
+            group: Fusion group (from query_loader.find_fusion_groups)
+            start_date: Optional start date filter
+            end_date: Optional end date filter
+        """
+        print("Refreshing fused CSVs from database...")
+        spool_dir = self._make_spool_dir(group)
+        try:
+            try:
+                spools = self._spool_fused_rows(group, start_date, end_date, spool_dir)
+            except pyodbc.Error as e:
+                print(f"Error executing query: {e}")
+                for member in group['members'].values():
+                    self.mark_stale(member['csv_file'])
+                return
+
+            for member in group['members'].values():
+                self.export_to_csv(self._read_spool(spools[member['name']]), member['csv_file'])
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
 
     def refresh_full_csv(self, table_name: str, csv_file: str = "ezlrounds.csv",
                         date_column: str = "playdatekey", count_column: str = "count",
                         base_query: Optional[str] = None, filtered_query: Optional[str] = None,
                         order_by: Optional[str] = None,
-                        start_date: Optional[str] = None, end_date: Optional[str] = None):
+                        start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        date_param_type: str = 'str', max_date_query: Optional[str] = None,
+                        backfill_window: Optional[str] = None, backfill_workers: int = 1,
+                        cache_ttl: Optional[int] = None, statement_timeout: Optional[int] = None,
+                        checksum_query: Optional[str] = None):
         """
         Refresh the entire CSV file with all data from database.
 
+        Rows are streamed into the new file as they are fetched. With
+        backfill_window set, the range is pulled in resumable chunks instead
+        (see backfill_csv). With checksum_query set (and no date range),
+        only the months whose checksum changed are pulled (see
+        refresh_changed_months).
+
         Args:
             table_name: Name of the table to query
             csv_file: CSV file to create/overwrite
@@ -306,18 +1404,268 @@ class EZLinksRoundsDB:
             order_by: Optional ORDER BY clause (from config)
             start_date: Optional start date filter
             end_date: Optional end date filter
+            date_param_type: How date filters are bound (see bind_date_param)
+            max_date_query: Optional custom MAX query (backfill end date default)
+            backfill_window: Optional 'month' or 'week' to backfill in chunks
+            backfill_workers: Concurrent windows when backfilling
+            cache_ttl: Result cache lifetime in seconds (None: cache default, 0: bypass)
+            statement_timeout: Seconds before the warehouse statement is aborted (None: no limit)
+            checksum_query: Optional month checksum query (from config)
         """
+        if checksum_query and not (start_date or end_date or backfill_window):
+            self.refresh_changed_months(
+                csv_file, checksum_query,
+                statement_timeout=statement_timeout,
+                table_name=table_name,
+                date_column=date_column,
+                count_column=count_column,
+                base_query=base_query,
+                filtered_query=filtered_query,
+                order_by=order_by,
+                date_param_type=date_param_type
+            )
+            return
+
+        if backfill_window:
+            if not start_date:
+                print("ERROR: Backfill requires a start date")
+                return
+            if not end_date:
+                end_date = (self.get_latest_date(table_name, date_column, max_date_query,
+                                                 statement_timeout)
+                            or datetime.now().strftime('%Y%m%d'))
+            self.backfill_csv(
+                csv_file, start_date, end_date,
+                window=backfill_window,
+                workers=backfill_workers,
+                table_name=table_name,
+                date_column=date_column,
+                count_column=count_column,
+                base_query=base_query,
+                filtered_query=filtered_query,
+                order_by=order_by,
+                date_param_type=date_param_type,
+                cache_ttl=cache_ttl,
+                statement_timeout=statement_timeout
+            )
+            return
+
         print("Refreshing full CSV from database...")
-        data = self.query_rounds_data(
+        rows = self.iter_rounds_data(
             table_name, date_column, count_column,
             start_date=start_date,
             end_date=end_date,
             base_query=base_query,
             filtered_query=filtered_query,
-            order_by=order_by
+            order_by=order_by,
+            date_param_type=date_param_type,
+            cache_ttl=cache_ttl,
+            statement_timeout=statement_timeout
         )
-        if data:
-            self.export_to_csv(data, csv_file)
+        self.export_to_csv(rows, csv_file)
+
+    def get_month_checksums(self, checksum_query: str, table_name: str = "N/A",
+                            date_column: str = "playdatekey",
+                            statement_timeout: Optional[int] = None) -> Dict[str, int]:
+        """
+        Run a query's checksum_query.
+
+        The statement returns one (month, checksum) row per month, e.g.
+        `SELECT playdatekey / 100, CHECKSUM_AGG(BINARY_CHECKSUM(playdatekey,
+        rounds_total)) FROM (SELECT playdatekey, SUM(NetRoundsTotal) AS
+        rounds_total FROM dbo.FactBooking GROUP BY playdatekey) AS daily
+        GROUP BY playdatekey / 100`. Checksum the per-day totals rather than
+        raw rows: CHECKSUM_AGG is an XOR, so identical rows cancel out. The
+        month may be a YYYYMM number or any date in the month. It is a
+        freshness check, so it is never served from the result cache.
+
+        Returns:
+            Dictionary of YYYYMM month to checksum
+
+        Raises:
+            pyodbc.Error: If the query fails
+        """
+        if not self._ensure_connected():
+            raise pyodbc.Error("Not connected to database")
+        query = checksum_query.format(date_column=date_column, table=table_name)
+        return {month_key(row[0]): None if row[1] is None else int(row[1])
+                for row in self._iter_rows(query, [], cache_ttl=0,
+                                           statement_timeout=statement_timeout)
+                if row[0] is not None}
+
+    def refresh_changed_months(self, csv_file: str, checksum_query: str,
+                               statement_timeout: Optional[int] = None, **query_args) -> bool:
+        """
+        Refresh a cache by re-pulling only the months whose checksum changed.
+
+        The warehouse month checksums are compared with those stored beside
+        the cache (see cache_files.read_checksums). Changed and new months
+        are pulled with one statement per run of consecutive months and
+        merged, in date order, with the unchanged months as the cache is
+        streamed to its replacement; months gone from the warehouse are
+        dropped. Without a cache or stored checksums everything is pulled
+        once.
+
+        Checksums are read before the rows, so a change that lands in
+        between is picked up by the next refresh rather than missed. Rows
+        are always pulled from the warehouse, never the result cache: a
+        cached pull from before a restatement would be saved under the new
+        checksums and never corrected.
+
+        Args:
+            csv_file: CSV cache to refresh
+            checksum_query: Month checksum query (from config)
+            statement_timeout: Seconds before each statement is aborted
+            **query_args: Passed through to iter_rounds_data (table_name,
+                          date_column, base_query, filtered_query, ...);
+                          any cache_ttl is ignored
+
+        Returns:
+            True if the cache was brought up to date
+        """
+        query_args['cache_ttl'] = 0
+        print("Comparing month checksums with the warehouse...")
+        try:
+            current = self.get_month_checksums(checksum_query,
+                                               query_args.get('table_name', "N/A"),
+                                               query_args.get('date_column', "playdatekey"),
+                                               statement_timeout)
+        except pyodbc.Error as e:
+            print(f"Error executing checksum query: {e}")
+            self.mark_stale(csv_file)
+            return False
+
+        stored = read_checksums(csv_file, checksum_query) if os.path.exists(csv_file) else None
+        if stored is None:
+            print("No stored checksums, pulling every month")
+            rows = self.iter_rounds_data(statement_timeout=statement_timeout, **query_args)
+            if not self.export_to_csv(rows, csv_file):
+                return False
+            write_checksums(csv_file, checksum_query, current)
+            return True
+
+        changed = {month for month in set(current) | set(stored)
+                   if current.get(month) != stored.get(month)}
+        if not changed:
+            print(f"All {len(current)} months unchanged, nothing to pull")
+            return True
+        print(f"{len(changed)} of {len(current)} months changed: {', '.join(sorted(changed))}")
+
+        fetched = {}
+        try:
+            for start, end in month_date_ranges(m for m in changed if m in current):
+                for row in self.iter_rounds_data(start_date=start, end_date=end,
+                                                 statement_timeout=statement_timeout,
+                                                 **query_args):
+                    fetched[row['playdatekey']] = row['count']
+        except pyodbc.Error as e:
+            print(f"Error executing query: {e}")
+            self.mark_stale(csv_file)
+            return False
+
+        # The cache is in date order, so the kept months stream straight through,
+        # merged with the re-pulled ones; only the changed months are held in memory
+        kept = ((date, count) for date, count in self._read_cache_rows(csv_file)
+                if month_key(date) not in changed)
+        merged = heapq.merge(kept, sorted(fetched.items()), key=lambda row: row[0])
+        if not self.export_to_csv(({'playdatekey': date, 'count': count} for date, count in merged),
+                                  csv_file):
+            return False
+        write_checksums(csv_file, checksum_query, current)
+        print(f"Re-pulled {len(fetched)} rows across {len(changed)} changed months")
+        return True
+
+    def backfill_csv(self, csv_file: str, start_date: str, end_date: str,
+                     window: str = 'month', workers: int = 1, **query_args) -> bool:
+        """
+        Rebuild a CSV cache by pulling [start_date, end_date] in windows.
+
+        Each window runs as its own statement (up to `workers` at a time,
+        bounded by the connection pool) and is checkpointed to
+        <csv_file>.backfill/ as soon as it completes. If the run is
+        interrupted or a window fails, rerunning with the same arguments
+        only pulls the missing windows. Once every window is present they
+        are merged in date order into the cache and the checkpoint
+        directory is removed.
+
+        Args:
+            csv_file: CSV file to create/overwrite
+            start_date: First date to pull (YYYYMMDD)
+            end_date: Last date to pull (YYYYMMDD)
+            window: 'month' or 'week'
+            workers: Maximum windows in flight at once
+            **query_args: Passed through to iter_rounds_data (table_name,
+                          date_column, base_query, filtered_query, ...)
+
+        Returns:
+            True if every window completed and the cache was rewritten
+        """
+        windows = split_date_range(start_date, end_date, window)
+        checkpoint_dir = csv_file + BACKFILL_DIR_SUFFIX
+        plan_file = os.path.join(checkpoint_dir, 'plan.json')
+        plan = {'start_date': start_date, 'end_date': end_date, 'window': window,
+                'query': {k: v for k, v in sorted(query_args.items())}}
+
+        # Resume only if the checkpoint was made for the same backfill
+        try:
+            with open(plan_file, 'r') as f:
+                resumable = json.load(f) == plan
+        except (OSError, ValueError):
+            resumable = False
+        if not resumable:
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+            os.makedirs(checkpoint_dir)
+            with open(plan_file, 'w') as f:
+                json.dump(plan, f, indent=2)
+
+        def window_file(window_start, window_end):
+            return os.path.join(checkpoint_dir, f"{window_start}_{window_end}.csv")
+
+        pending = [w for w in windows if not os.path.exists(window_file(*w))]
+        print(f"Backfilling {csv_file} by {window}: {len(windows)} windows, "
+              f"{len(windows) - len(pending)} already checkpointed")
+
+        def fetch_window(window_start, window_end):
+            path = window_file(window_start, window_end)
+            count = 0
+            with open(path + '.tmp', 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=['playdatekey', 'count'])
+                for row in self.iter_rounds_data(start_date=window_start, end_date=window_end,
+                                                 **query_args):
+                    writer.writerow(row)
+                    count += 1
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+            return count
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            # Each window runs in the caller's context (keeps its metrics label)
+            futures = {executor.submit(contextvars.copy_context().run, fetch_window, *w): w
+                       for w in pending}
+            for future in as_completed(futures):
+                window_start, window_end = futures[future]
+                try:
+                    print(f"  Window {window_start}-{window_end}: {future.result()} records")
+                except (pyodbc.Error, IOError) as e:
+                    print(f"  Window {window_start}-{window_end} failed: {e}")
+                    failed.append(futures[future])
+
+        if failed:
+            print(f"Backfill incomplete: {len(failed)} of {len(windows)} windows failed. "
+                  f"Rerun to resume from {checkpoint_dir}")
+            self.mark_stale(csv_file)
+            return False
+
+        def merged_rows():
+            for w in windows:
+                with open(window_file(*w), 'r', newline='') as f:
+                    yield from csv.DictReader(f, fieldnames=['playdatekey', 'count'])
+
+        self.export_to_csv(merged_rows(), csv_file)
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        return True
 
 
 def main():
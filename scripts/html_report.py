@@ -10,7 +10,8 @@ from typing import List, Dict
 def generate_html_report(anomalies_by_query: Dict[str, List[Dict]],
                         output_file: str = "reports/anomaly_report.html",
                         report_date: datetime = None,
-                        query_descriptions: Dict[str, str] = None) -> str:
+                        query_descriptions: Dict[str, str] = None,
+                        stale_queries: List[str] = None) -> str:
     """
     Generate a styled HTML report from anomaly analysis results.
 
@@ -19,6 +20,7 @@ def generate_html_report(anomalies_by_query: Dict[str, List[Dict]],
         output_file: Output HTML filename
         report_date: Date the report was generated (default: now)
         query_descriptions: Dictionary mapping query names to descriptions
+        stale_queries: Queries whose caches were not refreshed in the last update
 
     Returns:
         Path to the generated HTML file
@@ -29,6 +31,8 @@ def generate_html_report(anomalies_by_query: Dict[str, List[Dict]],
     if query_descriptions is None:
         query_descriptions = {}
 
+    stale_queries = set(stale_queries or [])
+
     # Calculate summary statistics
     total_anomalies = sum(len(anomalies) for anomalies in anomalies_by_query.values())
     num_queries = len(anomalies_by_query)
@@ -376,6 +380,10 @@ def generate_html_report(anomalies_by_query: Dict[str, List[Dict]],
         severe_count = sum(1 for a in anomalies if a.get('yoy_pct', 0) < -95)
         moderate_count = sum(1 for a in anomalies if -95 <= a.get('yoy_pct', 0) < -85)
         mild_count = len(anomalies) - severe_count - moderate_count
+        stale_badge = ""
+        if query_name in stale_queries:
+            stale_badge = """                        <div class="stat">⚠️ Stale: cache not refreshed in the last update</div>
+"""
 
         html += f"""            <div class="query-section" id="query-{query_name}">
                 <div class="query-header">
@@ -386,7 +394,7 @@ def generate_html_report(anomalies_by_query: Dict[str, List[Dict]],
                         <div class="stat">🔴 {severe_count} severe (&lt;-95%)</div>
                         <div class="stat">🟠 {moderate_count} moderate (-95% to -85%)</div>
                         <div class="stat">🟡 {mild_count} mild (&gt;-85%)</div>
-                    </div>
+{stale_badge}                    </div>
                 </div>
 """
 
@@ -1,15 +1,24 @@
 #!/usr/bin/env python3
 """
 Generate a list of LOW anomalies using year-over-year comparison.
+
+A query can instead set `detector` to 'zscore' to score each day against
+the rolling mean and standard deviation of its own weekday (see
+_zscore_hits).
 """
 
-import csv
 import os
+import io
 import sys
+import time
 import argparse
+import bisect
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from array import array
 from datetime import datetime, timedelta
-from collections import defaultdict
-import statistics
+from collections import OrderedDict, deque
+import math
 
 # Setup paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -17,30 +26,43 @@ ROOT_DIR = os.path.dirname(SCRIPT_DIR)
 sys.path.insert(0, SCRIPT_DIR)  # For query_loader, html_report imports
 os.chdir(ROOT_DIR)              # For relative paths (queries.json, working-dir/)
 
-from query_loader import load_queries
+from query_loader import load_queries, ZSCORE_MIN_HISTORY
+from cache_files import (read_manifest, check_manifest, read_series, load_series_mirror,
+                         month_offset, date_key_to_int, open_series_store,
+                         read_analysis_state, write_analysis_state, series_month_crcs)
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# History needed before min_date: a year back plus find_prior_year_date's
+# +/- 3 day search, with slack for leap years
+PRIOR_YEAR_LOOKBACK_DAYS = 372
+
+# Calendars whose prior-year alignment is kept (see prior_year_index)
+PRIOR_YEAR_INDEX_CACHE_SIZE = 32
+
+# Proleptic Gregorian ordinal of 1970-01-01, NumPy's day zero
+EPOCH_ORDINAL = 719163
 
-def parse_date(date_str):
-    """Parse date string in multiple formats."""
-    # Try YYYYMMDD format first (e.g., '20240101')
-    try:
-        return datetime.strptime(date_str, '%Y%m%d')
-    except ValueError:
-        pass
 
-    # Try YYYY-MM-DD format (e.g., '2024-01-01')
+# Day names by weekday() (2024-01-01 was a Monday), in the current locale
+DAY_NAMES = tuple(datetime(2024, 1, day).strftime('%A') for day in range(1, 8))
+
+
+def parse_date(date_str):
+    """Parse a YYYYMMDD (e.g. '20240101') or YYYY-MM-DD (e.g. '2024-01-01') date string."""
+    fmt = '%Y-%m-%d' if '-' in date_str else '%Y%m%d'
     try:
-        return datetime.strptime(date_str, '%Y-%m-%d')
+        return datetime.strptime(date_str, fmt)
     except ValueError:
-        pass
-
-    # If both fail, raise error
-    raise ValueError(f"Unable to parse date: {date_str}. Expected format: YYYYMMDD or YYYY-MM-DD")
+        raise ValueError(f"Unable to parse date: {date_str}. Expected format: YYYYMMDD or YYYY-MM-DD") from None
 
 
 def get_day_name(date_obj):
     """Get day of week name."""
-    return date_obj.strftime('%A')
+    return DAY_NAMES[date_obj.weekday()]
 
 
 def find_prior_year_date(target_date, data_by_date):
@@ -80,23 +102,50 @@ def find_prior_year_date(target_date, data_by_date):
     return None
 
 
+def date_from_key(key):
+    """Convert an integer YYYYMMDD key to a datetime."""
+    return datetime(key // 10000, key // 100 % 100, key % 100)
+
+
 def analyze_csv(csv_file, query_name, date_column, count_column,
                 threshold_z=-2.5, threshold_min=5000, today=None, query_description="",
-                min_date=None, yoy_threshold_pct=-50):
+                min_date=None, yoy_threshold_pct=-50, series=None, store=None,
+                incremental=False, detector='yoy', zscore_window=52):
     """
-    Analyze a single CSV file for year-over-year anomalies.
+    Analyze a single CSV file for year-over-year or day-of-week anomalies.
+
+    The series is held as typed arrays (see cache_files.SeriesColumns);
+    dicts are only built for the anomalies that are returned, and with
+    NumPy installed the prior-year comparison runs on whole arrays (see
+    _yoy_hits_numpy). When the series store or the cache's binary mirror
+    is up to date, the series is mapped from it instead of parsing the
+    CSV. Only rows from PRIOR_YEAR_LOOKBACK_DAYS before min_date are
+    analyzed; with a current manifest, the CSV is read from the start of
+    that month (see cache_files.month_offset) rather than from the top.
 
     Args:
         csv_file: Path to CSV file
         query_name: Name of the query for reporting
         date_column: Name of the date column
         count_column: Name of the count column
-        threshold_z: Z-score threshold (deprecated, kept for compatibility)
+        threshold_z: Z-score threshold for the 'zscore' detector
         threshold_min: Minimum count threshold (absolute floor)
         today: Current date (for filtering future dates)
         query_description: Description of the query
         min_date: Minimum date to include in analysis (datetime object)
         yoy_threshold_pct: Year-over-year decrease threshold (default: -50%)
+        series: Optional SeriesColumns to analyze instead of reading csv_file
+                (e.g. from EZLinksRoundsDB.query_rounds_columns)
+        store: Optional cache_files.SeriesStore to look query_name up in first
+        incremental: Only re-examine dates that are new or changed since the
+                     last incremental run, using state saved beside csv_file
+                     (see _incremental_hits); the result is the same.
+                     Only the 'yoy' detector keeps state
+        detector: 'yoy' compares each day with the same weekday a year
+                  earlier; 'zscore' scores it against its weekday's
+                  rolling statistics (see _zscore_hits)
+        zscore_window: Same-weekday days of history the 'zscore' detector
+                       keeps (default: 52, a year)
 
     Returns:
         List of anomaly dictionaries
@@ -107,103 +156,499 @@ def analyze_csv(csv_file, query_name, date_column, count_column,
     if min_date is None:
         min_date = datetime(2025, 1, 1)  # Default to 2025-01-01 for YoY comparison
 
+    detection = dict(detector=detector, threshold_z=threshold_z, zscore_window=zscore_window)
+    if series is not None:
+        return _analyze_series(series, csv_file, query_name, threshold_min, today,
+                               query_description, min_date, yoy_threshold_pct,
+                               incremental=incremental and bool(csv_file), **detection)
+
     # Check if CSV file exists
     if not os.path.exists(csv_file):
         print(f"WARNING: CSV file not found: {csv_file}")
         return []
 
-    # Read data into both list and dictionary for easy lookup
-    data = []
-    data_by_date = {}
+    # Consult the cache manifest before parsing the whole file
+    manifest = read_manifest(csv_file)
+    if manifest:
+        reason = check_manifest(csv_file, manifest)
+        if reason:
+            print(f"WARNING: {csv_file} is stale or modified since its manifest was written ({reason})")
+        elif manifest['row_count'] == 0:
+            print(f"WARNING: No data found in {csv_file}")
+            return []
+        elif parse_date(manifest['max_date']) < min_date:
+            print(f"No data on or after {min_date.strftime('%Y-%m-%d')} in {csv_file} "
+                  f"(latest: {manifest['max_date']})")
+            return []
+
+    # Rows older than this can't be current or prior-year dates, or weekday history
+    lookback = PRIOR_YEAR_LOOKBACK_DAYS
+    if detector == 'zscore':
+        lookback = max(lookback, 7 * zscore_window)
+    window_start = date_key_to_int(min_date - timedelta(days=lookback))
+    indexed = bool(manifest) and not reason
+
+    # Use the store or the binary mirror if it matches the checked manifest
+    if indexed and store is not None:
+        series = store.get(query_name, manifest)
+    if indexed and series is None:
+        series = load_series_mirror(csv_file, manifest)
+
+    # Otherwise read dates and counts into typed arrays, seeking past old months
+    if series is None:
+        start = time.perf_counter()
+        try:
+            series = read_series(csv_file,
+                                 offset=month_offset(manifest, window_start) if indexed else 0)
+        except Exception as e:
+            print(f"ERROR reading {csv_file}: {e}")
+            return []
+        elapsed = time.perf_counter() - start
+        rate = f", {len(series) / elapsed:,.0f} rows/s" if elapsed > 0 else ""
+        print(f"Parsed {len(series):,} rows from {csv_file} in {elapsed:.3f}s{rate}")
+    # A cache matching its manifest was written in date order; one without may be hand-edited
+    series = series.since(window_start, ordered=indexed)
+
+    return _analyze_series(series, csv_file, query_name, threshold_min, today,
+                           query_description, min_date, yoy_threshold_pct,
+                           incremental=incremental,
+                           source_crc32=manifest['crc32'] if indexed else None, **detection)
+
+
+def _analyze_series(series, csv_file, query_name, threshold_min, today,
+                    query_description, min_date, yoy_threshold_pct,
+                    incremental=False, source_crc32=None, detector='yoy',
+                    threshold_z=-2.5, zscore_window=52):
+    """Find anomalies in a SeriesColumns (see analyze_csv)."""
+    if not len(series):
+        print(f"WARNING: No data found in {csv_file}")
+        return []
 
+    # (row, prior-year row or None) for each anomaly, in date order
+    find_hits = _yoy_hits_numpy if numpy is not None else _yoy_hits
+    baselines = {}
     try:
-        with open(csv_file, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                date_obj = parse_date(row['playdatekey'])
-                count = int(row['count'])
-                day_name = get_day_name(date_obj)
-                entry = {
-                    'date': date_obj,
-                    'date_str': date_obj.strftime('%Y%m%d'),
-                    'count': count,
-                    'day_name': day_name
-                }
-                data.append(entry)
-                data_by_date[date_obj] = entry
-    except Exception as e:
+        if detector == 'zscore':
+            hits, baselines = _zscore_hits(series, threshold_z, threshold_min, today,
+                                           min_date, zscore_window)
+        elif incremental:
+            hits = _incremental_hits(series, csv_file, source_crc32, find_hits, query_name,
+                                     threshold_min, today, min_date, yoy_threshold_pct)
+        else:
+            hits = find_hits(series, threshold_min, today, min_date, yoy_threshold_pct)
+    except ValueError as e:
         print(f"ERROR reading {csv_file}: {e}")
         return []
 
-    if not data:
-        print(f"WARNING: No data found in {csv_file}")
-        return []
-
-    # Find year-over-year anomalies
+    # Only flagged rows get dicts; date strings come straight from the integer keys
+    dates, counts = series.dates, series.counts
     yoy_anomalies = []
+    for i, prior in hits:
+        key = dates[i]
+        date = date_from_key(key)
+        current_count = counts[i]
+        prior_date = str(dates[prior]) if prior is not None else None
+        prior_count = counts[prior] if prior is not None else 0
+
+        if current_count < threshold_min or detector == 'zscore':
+            # Flagged regardless of the prior year, which is given for context
+            fields = dict(
+                prior_year_date=prior_date or 'N/A',
+                prior_year_count=prior_count,
+                yoy_change=current_count - prior_count if prior_date else 0,
+                yoy_pct=((current_count - prior_count) / prior_count * 100) if (prior_date and prior_count > 0) else 0,
+                reason='Below minimum threshold' if current_count < threshold_min
+                else 'Below day-of-week baseline'
+            )
+            if detector == 'zscore':
+                z_score, mean = baselines.get(i, (None, None))
+                fields.update(z_score=round(z_score, 2) if z_score is not None else None,
+                              baseline_mean=round(mean, 1) if mean is not None else None)
+        else:
+            yoy_change = current_count - prior_count
+            fields = dict(
+                prior_year_date=prior_date,
+                prior_year_count=prior_count,
+                yoy_change=yoy_change,
+                yoy_pct=(yoy_change / prior_count) * 100,
+                reason='Year-over-year decrease'
+            )
 
-    for entry in data:
-        # Skip future dates
-        if entry['date'] >= today:
-            continue
+        yoy_anomalies.append({
+            'date': date,
+            'date_str': str(key),
+            'count': current_count,
+            'day_name': DAY_NAMES[date.weekday()],
+            'query_name': query_name,
+            'query_description': query_description,
+            **fields
+        })
 
-        # Skip dates before minimum date
-        if entry['date'] < min_date:
-            continue
+    return yoy_anomalies
 
-        current_count = entry['count']
-
-        # Check absolute threshold first
-        if current_count < threshold_min:
-            # Find prior year for context, but flag anyway
-            prior_date = find_prior_year_date(entry['date'], data_by_date)
-            prior_count = data_by_date[prior_date]['count'] if prior_date else 0
-
-            yoy_anomalies.append({
-                **entry,
-                'query_name': query_name,
-                'query_description': query_description,
-                'prior_year_date': prior_date.strftime('%Y%m%d') if prior_date else 'N/A',
-                'prior_year_count': prior_count,
-                'yoy_change': current_count - prior_count if prior_date else 0,
-                'yoy_pct': ((current_count - prior_count) / prior_count * 100) if (prior_date and prior_count > 0) else 0,
-                'reason': 'Below minimum threshold'
-            })
-            continue
 
-        # Find prior year's corresponding date
-        prior_date = find_prior_year_date(entry['date'], data_by_date)
+def _incremental_hits(series, csv_file, source_crc32, find_hits, query_name,
+                      threshold_min, today, min_date, yoy_threshold_pct):
+    """
+    Find anomalous rows, re-examining only what changed since the last run.
 
-        if prior_date is None:
-            # No prior year data available
-            continue
+    The state stored beside the cache (see cache_files.read_analysis_state)
+    holds the dates the last run flagged, the day it analyzed up to, and a
+    CRC32 of each month of the series it saw. A date is re-examined if it
+    is on or after that watermark, if its month changed, or if the month of
+    its prior-year partner (364 days earlier) changed. Every other date
+    keeps the last run's verdict. A full run would give the same verdict,
+    since neither its count nor its partner's changed. A different query or
+    thresholds, or a watermark past `today`, means a full run.
+
+    Args:
+        series: SeriesColumns to analyze
+        csv_file: Cache the state is stored beside
+        source_crc32: CRC32 of the cache from its current manifest, or None;
+                      if it matches the state's, the months aren't re-hashed
+        find_hits: _yoy_hits or _yoy_hits_numpy
+
+    Returns:
+        List of (row, prior-year row or None) tuples sorted by date
+    """
+    params = {'query': query_name, 'min_date': min_date.isoformat(),
+              'threshold_min': threshold_min, 'yoy_threshold_pct': yoy_threshold_pct}
+    end_day = _day_ceiling(today)
+    state = read_analysis_state(csv_file)
+    if state and (state.get('params') != params
+                  or datetime.fromisoformat(state['analyzed_until']).toordinal() > end_day):
+        state = None
+
+    if state and source_crc32 is not None and state.get('source_crc32') == source_crc32:
+        months = state['months']  # Cache unchanged since the last run
+    else:
+        months = series_month_crcs(series)
+    if months is None:
+        # Repeated or unordered dates: analyze everything and keep no state
+        return find_hits(series, threshold_min, today, min_date, yoy_threshold_pct)
+
+    if state is None:
+        hits = find_hits(series, threshold_min, today, min_date, yoy_threshold_pct)
+    else:
+        previous = state['months']
+        changed = [] if months is previous else sorted(
+            m for m in set(months) | set(previous) if months.get(m) != previous.get(m))
+        watermark = datetime.fromisoformat(state['analyzed_until']).toordinal()
+        spans = [(watermark, end_day)]
+        for month in changed:
+            year, month_number = int(month[:4]), int(month[4:])
+            first = datetime(year, month_number, 1).toordinal()
+            end = datetime(year + month_number // 12, month_number % 12 + 1, 1).toordinal()
+            spans += [(first, end), (first + 364, end + 364)]
+
+        alignment = prior_year_index(series.dates)
+        rows = _row_ranges(alignment.days, spans)
+        hits = find_hits(series, threshold_min, today, min_date, yoy_threshold_pct, rows=rows)
+
+        # Carry over the last run's verdicts outside those ranges
+        starts = [start for start, _ in rows]
+        for key in state['anomalies']:
+            i = bisect.bisect_left(series.dates, key)
+            if i == len(series) or series.dates[i] != key:
+                continue
+            r = bisect.bisect_right(starts, i) - 1
+            if r < 0 or i >= rows[r][1]:
+                prior = alignment.prior[i]
+                hits.append((i, prior if prior >= 0 else None))
+        hits.sort(key=lambda hit: hit[0])
+
+        examined = sum(end - start for start, end in rows)
+        print(f"Incremental analysis: re-examined {examined:,} of {len(series):,} dates "
+              f"(months changed: {len(changed)})")
+
+    new_state = {
+        'params': params,
+        'analyzed_until': datetime.fromordinal(end_day).date().isoformat(),
+        'source_crc32': source_crc32,
+        'months': months,
+        'anomalies': [series.dates[i] for i, _ in hits],
+    }
+    if state is None or any(state.get(key) != value for key, value in new_state.items()):
+        try:
+            write_analysis_state(csv_file, new_state)
+        except OSError as e:
+            print(f"WARNING: Could not save analysis state for {csv_file}: {e}")
+    return hits
 
-        prior_count = data_by_date[prior_date]['count']
 
-        if prior_count == 0:
+def _row_ranges(days, spans):
+    """
+    Convert (first, end) day ordinal spans to merged (start, end) row ranges.
+
+    Args:
+        days: Strictly increasing day ordinals of the rows
+        spans: Half-open day spans, in any order and possibly overlapping
+    """
+    rows = []
+    for first, end in sorted(spans):
+        start, stop = bisect.bisect_left(days, first), bisect.bisect_left(days, end)
+        if start >= stop:
             continue
+        if rows and start <= rows[-1][1]:
+            rows[-1] = (rows[-1][0], max(rows[-1][1], stop))
+        else:
+            rows.append((start, stop))
+    return rows
 
-        # Calculate year-over-year change
-        yoy_change = current_count - prior_count
-        yoy_pct = (yoy_change / prior_count) * 100
-
-        # Flag if decrease exceeds threshold
-        if yoy_pct <= yoy_threshold_pct:
-            yoy_anomalies.append({
-                **entry,
-                'query_name': query_name,
-                'query_description': query_description,
-                'prior_year_date': prior_date.strftime('%Y%m%d'),
-                'prior_year_count': prior_count,
-                'yoy_change': yoy_change,
-                'yoy_pct': yoy_pct,
-                'reason': 'Year-over-year decrease'
-            })
-
-    # Sort by date
-    yoy_anomalies.sort(key=lambda x: x['date'])
 
-    return yoy_anomalies
+def _yoy_hits(series, threshold_min, today, min_date, yoy_threshold_pct, rows=None):
+    """
+    Find anomalous rows one date at a time.
+
+    Args:
+        rows: Optional (start, end) row ranges to examine (default: all rows)
+
+    Returns:
+        List of (row, prior-year row or None) tuples sorted by date
+
+    Raises:
+        ValueError: If a date key is not a valid date
+    """
+    alignment = prior_year_index(series.dates)
+    days, priors = alignment.days, alignment.prior
+    counts = series.counts
+    first_day, end_day = _day_ceiling(min_date), _day_ceiling(today)
+
+    hits = []
+    for start, end in rows if rows is not None else [(0, len(days))]:
+        for i in range(start, end):
+            # Skip future dates and dates before the minimum date
+            day = days[i]
+            if day >= end_day or day < first_day:
+                continue
+
+            prior = priors[i] if priors[i] >= 0 else None
+
+            # Check absolute threshold first; flag even without a prior year
+            if counts[i] < threshold_min:
+                hits.append((i, prior))
+                continue
+
+            if prior is None or counts[prior] == 0:
+                continue
+
+            # Flag if the decrease exceeds the threshold
+            yoy_pct = ((counts[i] - counts[prior]) / counts[prior]) * 100
+            if yoy_pct <= yoy_threshold_pct:
+                hits.append((i, prior))
+
+    hits.sort(key=lambda hit: days[hit[0]])
+    return hits
+
+
+def _yoy_hits_numpy(series, threshold_min, today, min_date, yoy_threshold_pct, rows=None):
+    """
+    Find anomalous rows with whole-array NumPy operations.
+
+    Gives the same rows as _yoy_hits (rows as there).
+
+    Returns:
+        List of (row, prior-year row or None) tuples sorted by date
+
+    Raises:
+        ValueError: If a date key is not a valid date
+    """
+    alignment = prior_year_index(series.dates)
+    days = numpy.frombuffer(alignment.days, dtype=numpy.int32)
+    prior = numpy.frombuffer(alignment.prior, dtype=numpy.int32)
+    counts = series.as_numpy()[1]
+
+    found = prior >= 0
+    prior_counts = numpy.where(found, counts[numpy.maximum(prior, 0)], 0)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        yoy_pct = (counts - prior_counts) / prior_counts * 100
+    dropped = found & (prior_counts != 0) & (yoy_pct <= yoy_threshold_pct)
+    in_range = (days >= _day_ceiling(min_date)) & (days < _day_ceiling(today))
+    if rows is not None:
+        selected = numpy.zeros(len(days), dtype=bool)
+        for start, end in rows:
+            selected[start:end] = True
+        in_range &= selected
+
+    rows = numpy.nonzero(in_range & ((counts < threshold_min) | dropped))[0]
+    rows = rows[numpy.argsort(days[rows], kind='stable')]
+    return [(i, p if p >= 0 else None) for i, p in zip(rows.tolist(), prior[rows].tolist())]
+
+
+def _zscore_hits(series, threshold_z, threshold_min, today, min_date, window):
+    """
+    Find rows far below their weekday's rolling mean, in one pass.
+
+    Each weekday keeps its last `window` counts along with a running mean
+    and sum of squared deviations (Welford's method). A count is added as
+    the pass reaches it and the oldest is removed once the window is full,
+    so every update is O(1) and the pass is linear in the series. A day is
+    scored against its weekday's earlier days only, and needs
+    ZSCORE_MIN_HISTORY of them with some spread. Days below threshold_min
+    are flagged whether or not they can be scored. A repeated date counts
+    once, with its last row, as in prior-year matching.
+
+    Returns:
+        Tuple of (list of (row, prior-year row or None) tuples sorted by
+        date, dictionary of flagged row to (z-score or None, weekday mean
+        or None))
+
+    Raises:
+        ValueError: If a date key is not a valid date
+    """
+    alignment = prior_year_index(series.dates)
+    days, priors = alignment.days, alignment.prior
+    counts = series.counts
+    first_day, end_day = _day_ceiling(min_date), _day_ceiling(today)
+
+    order = range(len(days))
+    if not all(a < b for a, b in zip(days, days[1:])):
+        # Last row for each day, as a dict of dates would keep
+        row_by_day = {day: i for i, day in enumerate(days)}
+        order = sorted(row_by_day.values(), key=days.__getitem__)
+
+    # Per weekday: the counts in the window, and their mean and squared deviations
+    recent = [deque() for _ in range(7)]
+    means = [0.0] * 7
+    squares = [0.0] * 7
+
+    hits, baselines = [], {}
+    for i in order:
+        day, count = days[i], counts[i]
+        weekday = day % 7
+        window_counts = recent[weekday]
+        n = len(window_counts)
+
+        if first_day <= day < end_day:
+            # Integer counts with any spread have squared deviations of at
+            # least 1/2; less is rounding left behind by removals
+            z_score = None
+            if n >= ZSCORE_MIN_HISTORY and squares[weekday] > 0.25:
+                stdev = math.sqrt(squares[weekday] / (n - 1))
+                z_score = (count - means[weekday]) / stdev
+            if count < threshold_min or (z_score is not None and z_score < threshold_z):
+                prior = priors[i]
+                hits.append((i, prior if prior >= 0 else None))
+                baselines[i] = (z_score, means[weekday] if n else None)
+
+        # Slide the window: drop the oldest count, then add this one
+        mean, square = means[weekday], squares[weekday]
+        if n == window:
+            oldest = window_counts.popleft()
+            n -= 1
+            if n:
+                delta = oldest - mean
+                mean -= delta / n
+                square = max(square - delta * (oldest - mean), 0.0)
+            else:
+                mean = square = 0.0
+        window_counts.append(count)
+        n += 1
+        delta = count - mean
+        mean += delta / n
+        square += delta * (count - mean)
+        means[weekday], squares[weekday] = mean, square
+
+    return hits, baselines
+
+
+def _day_ceiling(value):
+    """Ordinal of the first whole day on or after a datetime."""
+    return value.toordinal() + (value.time() != datetime.min.time())
+
+
+class PriorYearIndex:
+    """
+    Prior-year alignment of a calendar of YYYYMMDD date keys.
+
+    days holds each row's proleptic Gregorian ordinal and prior the row of
+    its prior-year counterpart (-1 if that date is not in the calendar),
+    both as array('i').
+    """
+
+    __slots__ = ('days', 'prior')
+
+    def __init__(self, days, prior):
+        self.days = days
+        self.prior = prior
+
+    def __len__(self):
+        return len(self.days)
+
+
+# Alignment indexes by calendar, most recently used last
+_prior_year_indexes = OrderedDict()
+
+
+def prior_year_index(dates):
+    """
+    Map each date of a calendar to its prior-year counterpart's row.
+
+    The counterpart is find_prior_year_date's: the same weekday within 3
+    days of the same date a year earlier. That is always the day 364 days
+    before, except for Feb 29, which has none. The index is cached by the
+    calendar's contents, so queries sharing a calendar (e.g. the per-course
+    caches pulled together) align it once and the lookup per date is a
+    single array access.
+
+    Args:
+        dates: Sequence of YYYYMMDD keys (array('i') or a memoryview of one)
+
+    Returns:
+        PriorYearIndex
+
+    Raises:
+        ValueError: If a date key is not a valid date
+    """
+    calendar = memoryview(dates).cast('B').tobytes()
+    index = _prior_year_indexes.get(calendar)
+    if index is not None:
+        _prior_year_indexes.move_to_end(calendar)
+        return index
+
+    if numpy is not None:
+        index = _build_prior_year_index_numpy(numpy.frombuffer(calendar, dtype=numpy.int32))
+    else:
+        index = _build_prior_year_index(dates)
+
+    _prior_year_indexes[calendar] = index
+    if len(_prior_year_indexes) > PRIOR_YEAR_INDEX_CACHE_SIZE:
+        _prior_year_indexes.popitem(last=False)
+    return index
+
+
+def _build_prior_year_index(dates):
+    """Build a PriorYearIndex one date at a time (see prior_year_index)."""
+    days = array('i', (date_from_key(key).toordinal() for key in dates))
+    # Last row for each day, as a dict of dates would keep
+    row_by_day = {day: i for i, day in enumerate(days)}
+    prior = array('i', (
+        -1 if key % 10000 == 229 or key < 20000 else row_by_day.get(day - 364, -1)
+        for key, day in zip(dates, days)))
+    return PriorYearIndex(days, prior)
+
+
+def _build_prior_year_index_numpy(keys):
+    """Build a PriorYearIndex with NumPy (see prior_year_index)."""
+    years, months, days = keys // 10000, keys // 100 % 100, keys % 100
+    month_starts = (years - 1970).astype('M8[Y]') + (months - 1).astype('m8[M]')
+    day_numbers = month_starts.astype('M8[D]') + (days - 1).astype('m8[D]')
+    invalid = ((years < 1) | (years > 9999) | (months < 1) | (months > 12) | (days < 1)
+               | (day_numbers >= (month_starts + 1).astype('M8[D]')))
+    if invalid.any():
+        raise ValueError(f"Invalid date key: {keys[invalid.argmax()]}")
+    ordinals = (day_numbers.astype(numpy.int64) + EPOCH_ORDINAL).astype(numpy.int32)
+
+    # Last row for each day, 364 days back
+    order = numpy.argsort(ordinals, kind='stable')
+    ordered = ordinals[order]
+    targets = ordinals - 364
+    pos = numpy.searchsorted(ordered, targets, side='right') - 1
+    clipped = numpy.maximum(pos, 0)
+    found = ((pos >= 0) & (ordered[clipped] == targets)
+             & ~((months == 2) & (days == 29)) & (years > 1))
+    prior = numpy.where(found, order[clipped], -1).astype(numpy.int32)
+    return PriorYearIndex(array('i', ordinals.tobytes()), array('i', prior.tobytes()))
 
 
 def print_anomalies(anomalies, query_name, query_description):
@@ -239,7 +684,120 @@ def print_anomalies(anomalies, query_name, query_description):
         print(f"\n{year}-{month} ({len(items)} anomalies):")
         for item in items:
             prior_info = f"vs {item.get('prior_year_count', 0):,}" if item.get('prior_year_count') else ""
-            print(f"  {item['date_str']} ({item['day_name']:<9}): {item['count']:>8,} {prior_info} ({item.get('yoy_pct', 0):+.1f}%)")
+            z_info = f" z={item['z_score']:.1f}" if item.get('z_score') is not None else ""
+            print(f"  {item['date_str']} ({item['day_name']:<9}): {item['count']:>8,} {prior_info} ({item.get('yoy_pct', 0):+.1f}%){z_info}")
+
+
+def analyze_query(query, today, min_date, stale=False, store=None, incremental=False):
+    """
+    Analyze one queries.json query and print its section of the report.
+
+    Args:
+        query: Query definition (see query_loader.load_queries)
+        today: Current date (for filtering future dates)
+        min_date: Minimum date to include in analysis
+        stale: Whether the query's cache was not refreshed in the last update
+        store: Optional cache_files.SeriesStore (see analyze_csv)
+        incremental: Reuse the last run's analysis state (see analyze_csv)
+
+    Returns:
+        List of anomaly dictionaries
+    """
+    print(f"\n{'='*80}")
+    print(f"ANALYZING: {query['name']}")
+    print(f"Description: {query['description']}")
+    print(f"CSV: {query['csv_file']}")
+    if query.get('detector', 'yoy') == 'zscore':
+        print(f"Thresholds: z-score < {query['anomaly_threshold_z']} against the last "
+              f"{query.get('zscore_window', 52)} same weekdays, count < {query['anomaly_threshold_min']}")
+    else:
+        print(f"Thresholds: year-over-year decrease, count < {query['anomaly_threshold_min']}")
+    if stale:
+        manifest = read_manifest(query['csv_file'])
+        through = manifest['max_date'] if manifest else 'unknown'
+        print(f"STALE: cache was not refreshed in the last update (data through {through})")
+    print(f"{'='*80}\n")
+
+    anomalies = analyze_csv(
+        query['csv_file'],
+        query['name'],
+        query['date_column'],
+        query['count_column'],
+        query.get('anomaly_threshold_z', -2.5),
+        query.get('anomaly_threshold_min', 5000),
+        today,
+        query.get('description', query['name']),
+        min_date,  # Pass minimum date filter
+        store=store,
+        incremental=incremental,
+        detector=query.get('detector', 'yoy'),
+        zscore_window=query.get('zscore_window', 52)
+    )
+
+    # Print anomalies for this query
+    print_anomalies(anomalies, query['name'], query['description'])
+    return anomalies
+
+
+# Series store mapped by each analysis worker process
+_worker_store = None
+
+
+def _open_worker_store():
+    """Process pool initializer: map the series store once per worker."""
+    global _worker_store
+    _worker_store = open_series_store()
+
+
+def _analyze_query_captured(query, today, min_date, stale, incremental):
+    """Run analyze_query in a worker process; returns (printed output, anomalies)."""
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        anomalies = analyze_query(query, today, min_date, stale, store=_worker_store,
+                                  incremental=incremental)
+    return buffer.getvalue(), anomalies
+
+
+def analyze_queries(queries, today, min_date, stale=(), workers=1, incremental=False):
+    """
+    Analyze every query, printing each one's section in queries.json order.
+
+    With workers > 1 the queries are analyzed in a process pool. Each
+    worker's output is buffered and printed as one block once that query
+    (and every query before it) has finished, so the console output and
+    the results are the same as a sequential run.
+
+    Args:
+        queries: Query definitions
+        today: Current date (for filtering future dates)
+        min_date: Minimum date to include in analysis
+        stale: Names of queries whose caches were not refreshed
+        workers: Number of worker processes (1 analyzes in this process)
+        incremental: Reuse each query's last analysis state (see analyze_csv)
+
+    Returns:
+        List of each query's anomalies, in query order
+    """
+    workers = min(workers, len(queries))
+    if workers <= 1:
+        # Every series in one mapping (written by update_and_analyze.py)
+        store = open_series_store()
+        return [analyze_query(query, today, min_date, query['name'] in stale, store=store,
+                              incremental=incremental)
+                for query in queries]
+
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_worker_store) as executor:
+        futures = [executor.submit(_analyze_query_captured, query, today, min_date,
+                                   query['name'] in stale, incremental)
+                   for query in queries]
+        for future in futures:
+            output, anomalies = future.result()
+            sys.stdout.write(output)
+            sys.stdout.flush()
+            results.append(anomalies)
+    return results
 
 
 def main():
@@ -261,6 +819,15 @@ Examples:
 
   # Filter for specific date range
   python3 past_low_anomalies.py --min-date 2025-01-01
+
+  # Flag a query whose cache could not be refreshed
+  python3 past_low_anomalies.py --stale golfnow_rounds
+
+  # Analyze queries on 4 processes
+  python3 past_low_anomalies.py --workers 4
+
+  # Only re-examine dates new or changed since the last incremental run
+  python3 past_low_anomalies.py --incremental
         """
     )
     parser.add_argument('--html', action='store_true',
@@ -269,8 +836,18 @@ Examples:
                        help='HTML output filename (default: reports/anomaly_report.html)')
     parser.add_argument('--min-date', type=str, default='2025-01-01',
                        help='Minimum date to include (YYYY-MM-DD format, default: 2025-01-01 for YoY comparison)')
+    parser.add_argument('--stale', action='append', default=[], metavar='NAME',
+                       help='Query whose cache was not refreshed in the last update (can be repeated)')
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                       help='Analyze up to N queries at once in separate processes (default: 1)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Only re-examine dates new or changed since the last incremental run '
+                            '(faster without NumPy; see README)')
 
     args = parser.parse_args()
+    if args.workers < 1:
+        print("ERROR: --workers must be at least 1")
+        return 1
 
     # Today's date
     TODAY = datetime(2026, 2, 2)
@@ -292,36 +869,16 @@ Examples:
     print(f"Date range: {MIN_DATE.strftime('%Y-%m-%d')} to {TODAY.strftime('%Y-%m-%d')}")
     print()
 
+    query_descriptions = {query['name']: query.get('description', query['name'])
+                          for query in queries}
+
     all_anomalies = []
     anomalies_by_query = {}
-    query_descriptions = {}
 
     # Process each query
-    for query in queries:
-        query_descriptions[query['name']] = query.get('description', query['name'])
-
-        print(f"\n{'='*80}")
-        print(f"ANALYZING: {query['name']}")
-        print(f"Description: {query['description']}")
-        print(f"CSV: {query['csv_file']}")
-        print(f"Thresholds: z-score < {query['anomaly_threshold_z']}, count < {query['anomaly_threshold_min']}")
-        print(f"{'='*80}\n")
-
-        anomalies = analyze_csv(
-            query['csv_file'],
-            query['name'],
-            query['date_column'],
-            query['count_column'],
-            query.get('anomaly_threshold_z', -2.5),
-            query.get('anomaly_threshold_min', 5000),
-            TODAY,
-            query.get('description', query['name']),
-            MIN_DATE  # Pass minimum date filter
-        )
-
-        # Print anomalies for this query
-        print_anomalies(anomalies, query['name'], query['description'])
-
+    results = analyze_queries(queries, TODAY, MIN_DATE, args.stale, args.workers,
+                              incremental=args.incremental)
+    for query, anomalies in zip(queries, results):
         all_anomalies.extend(anomalies)
         anomalies_by_query[query['name']] = anomalies
 
@@ -337,6 +894,8 @@ Examples:
     print(f"\nAnomalies by query:")
     for query_name, count in query_counts.items():
         print(f"  {query_name}: {count}")
+    if args.stale:
+        print(f"\nStale caches (not refreshed in the last update): {', '.join(args.stale)}")
 
     print(f"{'='*80}")
 
@@ -353,7 +912,8 @@ Examples:
             output_file = generate_html_report(
                 anomalies_by_query,
                 args.output,
-                query_descriptions=query_descriptions
+                query_descriptions=query_descriptions,
+                stale_queries=args.stale
             )
             print(f"\n✓ HTML report generated: {output_file}")
         except Exception as e:
@@ -5,7 +5,22 @@ Load and validate queries from JSON configuration file.
 
 import json
 import os
-from typing import List, Dict
+import re
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from typing import List, Dict, Optional
+
+from cache_files import COMPRESSION_SUFFIXES
+
+# Accepted values for a query's date_param_type (see db_query.bind_date_param)
+DATE_PARAM_TYPES = ('str', 'int', 'date')
+
+# Accepted values for a query's detector (see past_low_anomalies.analyze_csv)
+DETECTORS = ('yoy', 'zscore')
+
+# Same-weekday days of history a day needs before it is z-scored, and so
+# the smallest useful zscore_window
+ZSCORE_MIN_HISTORY = 8
 
 
 def load_queries(json_path: str = "queries.json") -> List[Dict]:
@@ -65,10 +80,70 @@ def load_queries(json_path: str = "queries.json") -> List[Dict]:
             'filtered_query': query.get('filtered_query'),
             'max_date_query': query.get('max_date_query'),
             'order_by': query.get('order_by'),
+            'date_param_type': query.get('date_param_type', 'str'),
+            'trailing_days': query.get('trailing_days', 0),
+            'cache_ttl': query.get('cache_ttl'),
+            'statement_timeout': query.get('statement_timeout'),
+            'checksum_query': query.get('checksum_query'),
+            'compression': query.get('compression'),
+            'detector': query.get('detector', 'yoy'),
+            'zscore_window': query.get('zscore_window', 52),
             'anomaly_threshold_z': query.get('anomaly_threshold_z', -2.5),
             'anomaly_threshold_min': query.get('anomaly_threshold_min', 5000)
         }
 
+        if validated_query['date_param_type'] not in DATE_PARAM_TYPES:
+            raise ValueError(
+                f"Query '{query['name']}' has invalid date_param_type: "
+                f"{validated_query['date_param_type']} (expected one of {', '.join(DATE_PARAM_TYPES)})"
+            )
+
+        if validated_query['detector'] not in DETECTORS:
+            raise ValueError(
+                f"Query '{query['name']}' has invalid detector: "
+                f"{validated_query['detector']} (expected one of {', '.join(DETECTORS)})"
+            )
+
+        zscore_window = validated_query['zscore_window']
+        if not isinstance(zscore_window, int) or zscore_window < ZSCORE_MIN_HISTORY:
+            raise ValueError(
+                f"Query '{query['name']}' has invalid zscore_window: "
+                f"{zscore_window} (expected an integer of at least {ZSCORE_MIN_HISTORY})"
+            )
+
+        if not isinstance(validated_query['trailing_days'], int) or validated_query['trailing_days'] < 0:
+            raise ValueError(
+                f"Query '{query['name']}' has invalid trailing_days: "
+                f"{validated_query['trailing_days']} (expected a non-negative integer)"
+            )
+
+        cache_ttl = validated_query['cache_ttl']
+        if cache_ttl is not None and (not isinstance(cache_ttl, int) or cache_ttl < 0):
+            raise ValueError(
+                f"Query '{query['name']}' has invalid cache_ttl: "
+                f"{cache_ttl} (expected a non-negative number of seconds)"
+            )
+
+        statement_timeout = validated_query['statement_timeout']
+        if statement_timeout is not None and (not isinstance(statement_timeout, int)
+                                              or statement_timeout <= 0):
+            raise ValueError(
+                f"Query '{query['name']}' has invalid statement_timeout: "
+                f"{statement_timeout} (expected a positive number of seconds)"
+            )
+
+        # A compressed cache is stored under the codec's suffix
+        compression = validated_query['compression']
+        if compression is not None:
+            if compression not in COMPRESSION_SUFFIXES:
+                raise ValueError(
+                    f"Query '{query['name']}' has invalid compression: "
+                    f"{compression} (expected one of {', '.join(COMPRESSION_SUFFIXES)})"
+                )
+            suffix = COMPRESSION_SUFFIXES[compression]
+            if not validated_query['csv_file'].endswith(suffix):
+                validated_query['csv_file'] += suffix
+
         # Ensure CSV parent directory exists
         csv_dir = os.path.dirname(validated_query['csv_file'])
         if csv_dir and not os.path.exists(csv_dir):
@@ -80,6 +155,202 @@ def load_queries(json_path: str = "queries.json") -> List[Dict]:
     return validated_queries
 
 
+# `column = literal` predicates that may distinguish otherwise identical queries
+_EQUALITY_PREDICATE = re.compile(r"([\w.]+)\s*=\s*(\d+|'[^']*')(?![\w.'])")
+
+
+def fuse_key(value, integer: bool):
+    """
+    Normalize a fuse column value for routing a fused statement's rows.
+
+    Drivers don't return the value in the literal's textual form, so both
+    sides are compared normalized. Integer groups compare numerically: 1,
+    '01' and Decimal('1.0') all match the literal 1. String groups compare
+    the text without surrounding spaces and ignoring case, as CHAR columns
+    come back padded and the warehouse collation is case-insensitive.
+
+    Args:
+        value: Fuse column value from a row, or a literal's unquoted text
+        integer: Whether the group's literals are integers
+
+    Returns:
+        The member key, or None if the value can't match any member
+    """
+    if value is None:
+        return None
+    if integer:
+        try:
+            number = Decimal(str(value).strip())
+        except InvalidOperation:
+            return None
+        return int(number) if number.is_finite() and number == number.to_integral_value() else None
+    return str(value).strip().casefold()
+
+
+def _literal_key(literal: str):
+    """Member key of a fuse literal's SQL text (see fuse_key)."""
+    if literal.startswith("'"):
+        return fuse_key(literal[1:-1], integer=False)
+    return fuse_key(literal, integer=True)
+
+
+def _expand_template(template: str, query: Dict) -> str:
+    """Fill in the column placeholders, leaving {table} and {where_clause}."""
+    return template.format(
+        date_column=query['date_column'],
+        count_column=query['count_column'],
+        table='{table}',
+        where_clause='{where_clause}'
+    )
+
+
+def _fusion_candidates(query: Dict) -> List[tuple]:
+    """
+    Return the ways a query could take part in a fused statement.
+
+    A query is fusable if its base_query and filtered_query are both
+    `SELECT <date_column>, ... GROUP BY <date_column>` and share a single
+    `column = literal` predicate. Each candidate is (key, column, literal):
+    queries with the same key differ only in that literal.
+    """
+    if not query.get('base_query') or not query.get('filtered_query'):
+        return []
+
+    date_column = query['date_column']
+    templates = [_expand_template(query['base_query'], query),
+                 _expand_template(query['filtered_query'], query)]
+    shape = re.compile(r'^\s*SELECT\s+(?!DISTINCT\b|TOP\b)[\s\S]*\bGROUP\s+BY\s+'
+                       + re.escape(date_column) + r'\s*$', re.IGNORECASE)
+    if not all(shape.match(t) for t in templates):
+        return []
+
+    candidates = []
+    for match in _EQUALITY_PREDICATE.finditer(templates[1]):
+        predicate, column, literal = match.group(0), match.group(1), match.group(2)
+        if not all(t.count(predicate) == 1 for t in templates):
+            continue
+        skeletons = tuple(t.replace(predicate, f"{column} = {{fuse_value}}") for t in templates)
+        key = (skeletons, column, date_column, query['count_column'],
+               query.get('order_by'), query.get('date_param_type', 'str'))
+        candidates.append((key, column, literal))
+    return candidates
+
+
+def _fused_template(skeleton: str, column: str, date_column: str, literals: List[str]) -> str:
+    """Build the grouped statement that returns every member's rows at once."""
+    fused = skeleton.replace(f"{column} = {{fuse_value}}", f"{column} IN ({', '.join(literals)})")
+    fused = re.sub(r'^\s*SELECT\s+', f"SELECT {column}, ", fused, count=1, flags=re.IGNORECASE)
+    fused = re.sub(r'\bGROUP\s+BY\s+' + re.escape(date_column) + r'\s*$',
+                   f"GROUP BY {column}, {date_column}", fused, flags=re.IGNORECASE)
+    return fused
+
+
+def _group_cache_ttl(queries) -> Optional[int]:
+    """Shortest result cache TTL among a group's members (None if none set one)."""
+    ttls = [q['cache_ttl'] for q in queries if q.get('cache_ttl') is not None]
+    return min(ttls) if ttls else None
+
+
+def _group_statement_timeout(queries) -> Optional[int]:
+    """
+    Statement timeout for a fused statement.
+
+    The fused statement does every member's work, so it gets the longest
+    member timeout, and no timeout if any member has none.
+    """
+    timeouts = [q.get('statement_timeout') for q in queries]
+    return None if None in timeouts else max(timeouts)
+
+
+def find_fusion_groups(queries: List[Dict]) -> List[Dict]:
+    """
+    Find queries that can be answered by one grouped statement.
+
+    For example, two FactBooking queries that differ only in
+    `sourcesystemkey = 34` vs `sourcesystemkey = 1` become one statement
+    with `sourcesystemkey IN (34, 1)` grouped by sourcesystemkey and date.
+
+    Args:
+        queries: Validated query dictionaries (from load_queries)
+
+    Returns:
+        List of fusion group dictionaries with keys name, description,
+        fused (True), fuse_column, fuse_integer, members (fuse_key of the
+        literal -> query), date_column, count_column, base_query,
+        filtered_query, order_by, date_param_type, cache_ttl and
+        statement_timeout
+    """
+    by_key = OrderedDict()
+    for query in queries:
+        for key, column, literal in _fusion_candidates(query):
+            by_key.setdefault(key, []).append((literal, query))
+
+    groups = []
+    assigned = set()
+    # Prefer the predicate that fuses the most queries
+    for key, entries in sorted(by_key.items(), key=lambda item: -len(item[1])):
+        entries = [(lit, q) for lit, q in entries if q['name'] not in assigned]
+        literals = [lit for lit, _ in entries]
+        keys = [_literal_key(lit) for lit in literals]
+        # Rows are routed by key, so keys must be distinct and of one kind
+        integer = not literals[0].startswith("'") if literals else False
+        if (len(entries) < 2 or len(set(keys)) != len(keys)
+                or any(lit.startswith("'") == integer for lit in literals)):
+            continue
+
+        (base_skeleton, filtered_skeleton), column, date_column = key[0], key[1], key[2]
+        first = entries[0][1]
+        groups.append({
+            'name': '+'.join(q['name'] for _, q in entries),
+            'description': f"Fused on {column}: " + ', '.join(q['name'] for _, q in entries),
+            'fused': True,
+            'fuse_column': column,
+            'fuse_integer': integer,
+            'members': OrderedDict((key, q) for key, (_, q) in zip(keys, entries)),
+            'date_column': date_column,
+            'count_column': first['count_column'],
+            'base_query': _fused_template(base_skeleton, column, date_column, literals),
+            'filtered_query': _fused_template(filtered_skeleton, column, date_column, literals),
+            'order_by': first.get('order_by'),
+            'date_param_type': first.get('date_param_type', 'str'),
+            'cache_ttl': _group_cache_ttl(q for _, q in entries),
+            'statement_timeout': _group_statement_timeout(q for _, q in entries),
+        })
+        assigned.update(q['name'] for _, q in entries)
+
+    return groups
+
+
+def fuse_queries(queries: List[Dict]) -> List[Dict]:
+    """
+    Replace fusable queries with their fusion group.
+
+    Each group takes the position of its first member; other queries are
+    returned unchanged, in their original order.
+
+    Args:
+        queries: Validated query dictionaries (from load_queries)
+
+    Returns:
+        List of query and fusion group dictionaries
+    """
+    group_of = {}
+    for group in find_fusion_groups(queries):
+        for member in group['members'].values():
+            group_of[member['name']] = group
+
+    work = []
+    seen = set()
+    for query in queries:
+        group = group_of.get(query['name'])
+        if group is None:
+            work.append(query)
+        elif group['name'] not in seen:
+            seen.add(group['name'])
+            work.append(group)
+    return work
+
+
 def main():
     """Test query loading."""
     try:
@@ -90,6 +361,8 @@ def main():
             print(f"    CSV: {query['csv_file']}")
             print(f"    Columns: {query['date_column']}, {query['count_column']}")
             print(f"    Thresholds: z={query['anomaly_threshold_z']}, min={query['anomaly_threshold_min']}")
+        for group in find_fusion_groups(queries):
+            print(f"  Fusable on {group['fuse_column']}: {', '.join(m['name'] for m in group['members'].values())}")
     except Exception as e:
         print(f"Error loading queries: {e}")
         return 1
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Timing records for warehouse statements.
+
+Every statement EZLinksRoundsDB sends to SQL Server is timed in phases
+(connection checkout, execute, time to first row, fetch) and appended as
+one JSON line to a metrics file, so run-over-run regressions can be spotted
+with nothing more than the file itself. Records are labelled with the
+queries.json query being refreshed (see labelled()).
+"""
+
+import contextvars
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+# Flag a query whose warehouse time is this many times its usual run
+SLOWDOWN_FACTOR = 3.0
+
+# Previous runs a query's time is compared against
+HISTORY_RUNS = 10
+
+# Query name the current thread or task is working on
+_query_label = contextvars.ContextVar('query_label', default=None)
+
+
+@contextmanager
+def labelled(name: str):
+    """Attribute statements run inside the block to query `name`."""
+    token = _query_label.set(name)
+    try:
+        yield
+    finally:
+        _query_label.reset(token)
+
+
+def estimate_row_bytes(rows: List) -> float:
+    """Average text size of a batch of rows, as a cheap stand-in for wire bytes."""
+    if not rows:
+        return 0.0
+    return sum(len(str(value)) for row in rows for value in row) / len(rows)
+
+
+class StatementTimer:
+    """
+    Phase timings for one warehouse statement (see QueryMetrics.timer).
+
+    Rows are streamed to the caller between fetchmany() calls, so fetch
+    time includes whatever the caller does with each batch.
+    """
+
+    def __init__(self, metrics: 'QueryMetrics', sql: str):
+        self.metrics = metrics
+        self.sql = sql
+        self.rows = 0
+        self.bytes = 0
+        self.status = 'ok'
+        self._start = time.perf_counter()
+        self._connected = self._executed = self._first_row = None
+
+    def connected(self):
+        """Mark the connection as checked out of the pool."""
+        self._connected = time.perf_counter()
+
+    def executed(self):
+        """Mark cursor.execute() as returned."""
+        self._executed = time.perf_counter()
+
+    def fetched(self, rows: List):
+        """Count a fetched batch of rows."""
+        if self._first_row is None:
+            self._first_row = time.perf_counter()
+            self._row_bytes = estimate_row_bytes(rows)
+        self.rows += len(rows)
+        self.bytes = int(self.rows * self._row_bytes)
+
+    def finish(self) -> Dict:
+        """Write the record and return it."""
+        end = time.perf_counter()
+        connected = self._connected or end
+        executed = self._executed or end
+        first_row = self._first_row or end
+        reading = end - executed
+        record = OrderedDict([
+            ('connect_s', round(connected - self._start, 4)),
+            ('execute_s', round(executed - connected, 4)),
+            ('first_row_s', round(first_row - executed, 4)),
+            ('fetch_s', round(end - first_row, 4)),
+            ('total_s', round(end - self._start, 4)),
+            ('rows', self.rows),
+            ('rows_per_s', round(self.rows / reading, 1) if reading > 0 else None),
+            ('bytes', self.bytes),
+            ('status', self.status),
+        ])
+        self.metrics.record(self.sql, record)
+        return record
+
+
+class NullTimer:
+    """Stand-in for StatementTimer when metrics are disabled."""
+
+    status = 'ok'
+
+    def connected(self):
+        pass
+
+    def executed(self):
+        pass
+
+    def fetched(self, rows: List):
+        pass
+
+    def finish(self):
+        pass
+
+
+class QueryMetrics:
+    """Append-only JSONL log of warehouse statement timings."""
+
+    def __init__(self, path: str):
+        """
+        Initialize the log.
+
+        Args:
+            path: JSONL file to append to (created if missing)
+        """
+        self.path = path
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = []
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def timer(self, sql: str) -> StatementTimer:
+        """Start timing a statement; call finish() on the result when done."""
+        return StatementTimer(self, sql)
+
+    def record(self, sql: str, timings: Dict):
+        """Append one statement's record to the log."""
+        record = OrderedDict([
+            ('ts', datetime.now().isoformat(timespec='seconds')),
+            ('run_id', self.run_id),
+            ('query', _query_label.get()),
+            ('sql', ' '.join(sql.split())),
+        ])
+        record.update(timings)
+        line = json.dumps(record)
+        with self._lock:
+            self.records.append(record)
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+    def history(self) -> Dict[str, List[float]]:
+        """
+        Total warehouse seconds per query for each earlier run in the log.
+
+        Returns:
+            Dictionary mapping query name to per-run totals, oldest first
+        """
+        runs = OrderedDict()
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('run_id') == self.run_id:
+                        continue
+                    key = (record.get('query'), record.get('run_id'))
+                    runs[key] = runs.get(key, 0.0) + record.get('total_s', 0.0)
+        except OSError:
+            pass
+
+        history = {}
+        for (query, _), total in runs.items():
+            history.setdefault(query, []).append(total)
+        return history
+
+    def summary(self) -> List[Dict]:
+        """
+        Per-query totals for this run, compared with earlier runs.
+
+        Returns:
+            List of dictionaries with query, statements, rows, seconds,
+            rows_per_s, usual_s (median of recent runs, or None) and slower
+            (True if seconds exceeds usual_s by SLOWDOWN_FACTOR)
+        """
+        with self._lock:
+            records = list(self.records)
+
+        totals = OrderedDict()
+        for record in records:
+            entry = totals.setdefault(record['query'], {'statements': 0, 'rows': 0,
+                                                        'seconds': 0.0, 'reading': 0.0})
+            entry['statements'] += 1
+            entry['rows'] += record['rows']
+            entry['seconds'] += record['total_s']
+            entry['reading'] += record['first_row_s'] + record['fetch_s']
+
+        history = self.history()
+        summary = []
+        for query, entry in totals.items():
+            previous = history.get(query, [])[-HISTORY_RUNS:]
+            usual = statistics.median(previous) if previous else None
+            summary.append({
+                'query': query,
+                'statements': entry['statements'],
+                'rows': entry['rows'],
+                'seconds': round(entry['seconds'], 3),
+                'rows_per_s': round(entry['rows'] / entry['reading'], 1) if entry['reading'] > 0 else None,
+                'usual_s': round(usual, 3) if usual is not None else None,
+                'slower': bool(usual and entry['seconds'] > usual * SLOWDOWN_FACTOR),
+            })
+        return summary
+
+    def print_summary(self):
+        """Print the per-query summary table."""
+        summary = self.summary()
+        if not summary:
+            return
+        print(f"Warehouse time by query (log: {self.path}):")
+        for entry in summary:
+            usual = f"{entry['usual_s']:.1f}s usual" if entry['usual_s'] is not None else "no history"
+            rate = f"{entry['rows_per_s']:.0f} rows/s" if entry['rows_per_s'] else "-"
+            flag = f"  <-- {SLOWDOWN_FACTOR:g}x+ slower than usual" if entry['slower'] else ""
+            print(f"  {entry['query'] or '(unlabelled)'}: {entry['seconds']:.1f}s ({usual}), "
+                  f"{entry['statements']} statements, {entry['rows']} rows, {rate}{flag}")
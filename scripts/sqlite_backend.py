@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Local SQLite stand-in for the SQL Server warehouse.
+
+Seeds a SQLite file with synthetic FactBooking and DimCustomer tables shaped
+like the warehouse ones, and provides a connection factory for
+EZLinksRoundsDB that runs the same queries.json templates against it, with
+optional injected latency and failures. This lets the fetch, caching and
+parallelism code be exercised without SQL Server or ODBC Driver 18.
+
+Queries are passed through almost unchanged: the `dbo.` schema prefix is
+dropped, and BINARY_CHECKSUM / CHECKSUM_AGG are provided as SQLite
+functions so checksum_query templates work too.
+"""
+
+import argparse
+import math
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import pyodbc
+
+# Source systems seeded into the synthetic tables (EZ Links, GolfNow)
+SOURCE_SYSTEMS = {34: 1.0, 1: 2.5}
+
+# SQLite VM instructions between timeout/cancel checks
+PROGRESS_INTERVAL = 1000
+
+_SCHEMA_PREFIX = re.compile(r'\bdbo\.', re.IGNORECASE)
+
+# Bind DATE parameters (date_param_type 'date') as ISO strings
+sqlite3.register_adapter(date, date.isoformat)
+
+
+def binary_checksum(*values) -> int:
+    """Stand-in for T-SQL BINARY_CHECKSUM: a signed 32-bit hash of the values."""
+    crc = zlib.crc32(repr(values).encode('utf-8'))
+    return crc - (1 << 32) if crc >= (1 << 31) else crc
+
+
+class ChecksumAgg:
+    """Stand-in for T-SQL CHECKSUM_AGG: XOR of the values."""
+
+    def __init__(self):
+        self.value = 0
+
+    def step(self, value):
+        if value is not None:
+            self.value ^= int(value)
+
+    def finalize(self):
+        return self.value
+
+
+def seed_database(path: str, start_date: str = '20150101', end_date: Optional[str] = None,
+                  scale: float = 1.0, outage_rate: float = 0.002, seed: int = 0):
+    """
+    Create (or replace) a synthetic warehouse in a SQLite file.
+
+    FactBooking gets roughly 40 * scale booking rows per day per source
+    system, with weekly and yearly seasonality and growth; DimCustomer gets
+    new customers per day on the same shape. A few random "outage" days
+    drop to a small fraction of normal volume so the anomaly analysis has
+    something to find.
+
+    Args:
+        path: SQLite database file
+        start_date: First day (YYYYMMDD)
+        end_date: Last day (YYYYMMDD, default: yesterday)
+        scale: Multiplier on rows per day
+        outage_rate: Fraction of days seeded as outages
+        seed: Random seed (the same arguments always produce the same data)
+
+    Returns:
+        Tuple of (FactBooking rows, DimCustomer rows)
+    """
+    rng = random.Random(seed)
+    first = datetime.strptime(start_date, '%Y%m%d').date()
+    last = (datetime.strptime(end_date, '%Y%m%d').date() if end_date
+            else date.today() - timedelta(days=1))
+
+    db = sqlite3.connect(path)
+    try:
+        db.executescript("""
+            DROP TABLE IF EXISTS FactBooking;
+            DROP TABLE IF EXISTS DimCustomer;
+            CREATE TABLE FactBooking (
+                bookingKey INTEGER PRIMARY KEY,
+                playdatekey INTEGER NOT NULL,
+                sourcesystemkey INTEGER NOT NULL,
+                NetRoundsTotal INTEGER NOT NULL
+            );
+            CREATE TABLE DimCustomer (
+                customerKey INTEGER PRIMARY KEY,
+                sourcesystemkey INTEGER NOT NULL,
+                CustomerCreatedDate TEXT NOT NULL
+            );
+        """)
+
+        bookings = customers = 0
+        day = first
+        while day <= last:
+            # Weekends busier, summer busier, ~8% growth a year
+            weekly = 1.4 if day.weekday() >= 5 else 1.0
+            yearly = 1.0 + 0.3 * math.sin(2 * math.pi * (day.timetuple().tm_yday - 80) / 365.25)
+            growth = 1.08 ** ((day - first).days / 365.25)
+            outage = 0.05 if rng.random() < outage_rate else 1.0
+            volume = scale * weekly * yearly * growth * outage
+            playdatekey = int(day.strftime('%Y%m%d'))
+
+            for source, weight in SOURCE_SYSTEMS.items():
+                n = max(0, int(rng.gauss(40 * volume * weight, 4 * math.sqrt(volume * weight + 1))))
+                db.executemany(
+                    "INSERT INTO FactBooking (playdatekey, sourcesystemkey, NetRoundsTotal) VALUES (?, ?, ?)",
+                    [(playdatekey, source, rng.randint(1, 4)) for _ in range(n)])
+                bookings += n
+
+                n = max(0, int(rng.gauss(6 * volume * weight, math.sqrt(6 * volume * weight + 1))))
+                db.executemany(
+                    "INSERT INTO DimCustomer (sourcesystemkey, CustomerCreatedDate) VALUES (?, ?)",
+                    [(source, day.isoformat())] * n)
+                customers += n
+
+            day += timedelta(days=1)
+
+        db.executescript("""
+            CREATE INDEX ix_factbooking_source_date ON FactBooking (sourcesystemkey, playdatekey);
+            CREATE INDEX ix_dimcustomer_source_date ON DimCustomer (sourcesystemkey, CustomerCreatedDate);
+        """)
+        db.commit()
+    finally:
+        db.close()
+
+    return bookings, customers
+
+
+class SQLiteCursor:
+    """pyodbc-style cursor over a SQLiteConnection."""
+
+    def __init__(self, connection: 'SQLiteConnection'):
+        self.connection = connection
+        self._cursor = connection._db.cursor()
+
+    def execute(self, query: str, params=None):
+        """Run a statement; errors are raised as pyodbc.Error."""
+        backend = self.connection.backend
+        backend.inject(backend.latency)
+        self.connection._start_statement()
+        with self.connection._translate_errors():
+            self._cursor.execute(_SCHEMA_PREFIX.sub('', query), list(params or []))
+        return self
+
+    def fetchmany(self, size: int):
+        self.connection.backend.inject(self.connection.backend.fetch_latency, fail=False)
+        with self.connection._translate_errors():
+            return self._cursor.fetchmany(size)
+
+    def fetchone(self):
+        with self.connection._translate_errors():
+            return self._cursor.fetchone()
+
+    def cancel(self):
+        """Abort the running statement (callable from another thread)."""
+        self.connection._db.interrupt()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    pyodbc-style connection to the stand-in database.
+
+    Like pyodbc, setting `timeout` (seconds, 0 for none) bounds each
+    statement; a statement past it is aborted and raises pyodbc.Error.
+    """
+
+    def __init__(self, backend: 'SQLiteBackend'):
+        self.backend = backend
+        self.timeout = 0
+        self._deadline = None
+        self._db = sqlite3.connect(backend.path, check_same_thread=False)
+        self._db.create_function('BINARY_CHECKSUM', -1, binary_checksum)
+        self._db.create_aggregate('CHECKSUM_AGG', 1, ChecksumAgg)
+        self._db.set_progress_handler(self._past_deadline, PROGRESS_INTERVAL)
+
+    def _start_statement(self):
+        self._deadline = time.monotonic() + self.timeout if self.timeout else None
+
+    def _past_deadline(self) -> int:
+        # Non-zero aborts the running statement
+        return int(self._deadline is not None and time.monotonic() > self._deadline)
+
+    @contextmanager
+    def _translate_errors(self):
+        """Re-raise sqlite3 errors as pyodbc.Error, reporting timeouts like pyodbc does."""
+        try:
+            yield
+        except sqlite3.Error as e:
+            if self._deadline is not None and time.monotonic() > self._deadline:
+                raise pyodbc.Error('HYT00', f'[HYT00] Query timeout expired ({e})') from e
+            raise pyodbc.Error('HY000', f'[SQLite] {e}') from e
+
+    def cursor(self) -> SQLiteCursor:
+        return SQLiteCursor(self)
+
+    def close(self):
+        self._db.close()
+
+
+class SQLiteBackend:
+    """
+    Connection factory for EZLinksRoundsDB backed by a seeded SQLite file.
+
+    Example:
+        backend = SQLiteBackend('working-dir/standin.db', latency=0.05)
+        db = EZLinksRoundsDB('sqlite', backend.path, connection_factory=backend)
+    """
+
+    def __init__(self, path: str, connect_latency: float = 0.0, latency: float = 0.0,
+                 fetch_latency: float = 0.0, failure_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        """
+        Initialize the backend.
+
+        Args:
+            path: SQLite database file (see seed_database)
+            connect_latency: Seconds added to every new connection
+            latency: Seconds added to every statement execute
+            fetch_latency: Seconds added to every fetchmany() round trip
+            failure_rate: Probability (0-1) that a connect or execute fails
+            seed: Random seed for the injected failures
+        """
+        self.path = path
+        self.connect_latency = connect_latency
+        self.latency = latency
+        self.fetch_latency = fetch_latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def inject(self, delay: float, fail: bool = True):
+        """Sleep for an injected delay, then maybe raise an injected failure."""
+        if delay:
+            time.sleep(delay)
+        if fail and self.failure_rate:
+            with self._lock:
+                failed = self._rng.random() < self.failure_rate
+            if failed:
+                raise pyodbc.Error('08S01', '[08S01] Injected communication link failure')
+
+    def __call__(self) -> SQLiteConnection:
+        """Open a new connection (the EZLinksRoundsDB connection_factory hook)."""
+        self.inject(self.connect_latency)
+        return SQLiteConnection(self)
+
+
+def main():
+    """Seed a stand-in database."""
+    parser = argparse.ArgumentParser(
+        description='Create a synthetic SQLite stand-in for the SQL Server warehouse')
+    parser.add_argument('path', help='SQLite file to create (replaced if it exists)')
+    parser.add_argument('--start-date', default='20150101', metavar='YYYYMMDD',
+                        help='First day of data (default: 20150101)')
+    parser.add_argument('--end-date', metavar='YYYYMMDD',
+                        help='Last day of data (default: yesterday)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplier on rows per day (default: 1.0, about 140 FactBooking rows/day)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    start = time.time()
+    bookings, customers = seed_database(args.path, args.start_date, args.end_date,
+                                        scale=args.scale, seed=args.seed)
+    print(f"Seeded {args.path}: {bookings} FactBooking rows, {customers} DimCustomer rows "
+          f"in {time.time() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,13 @@ Update data from database and run anomaly analysis across multiple queries.
 
 import sys
 import os
+import io
 import argparse
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 # Setup paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -14,8 +20,437 @@ sys.path.insert(0, SCRIPT_DIR)  # For db_query, query_loader imports
 sys.path.insert(0, ROOT_DIR)    # For config import
 os.chdir(ROOT_DIR)              # For relative paths (queries.json, working-dir/)
 
-from db_query import EZLinksRoundsDB
-from query_loader import load_queries
+from db_query import EZLinksRoundsDB, ResultCache, BACKFILL_WINDOWS
+from async_db_query import AsyncEZLinksRoundsDB
+from cache_files import (SERIES_STORE_FILE, date_key_to_int, load_manifest, recover_cache,
+                         write_series_store)
+from query_loader import load_queries, fuse_queries
+from query_metrics import QueryMetrics, labelled
+
+# Upper bound on concurrent warehouse queries, whatever --parallel asks for
+MAX_PARALLEL_QUERIES = 8
+
+# Where warehouse results are cached between runs (see db_query.ResultCache)
+RESULT_CACHE_DIR = 'working-dir/.query-cache'
+
+# Append-only log of warehouse statement timings (see query_metrics)
+METRICS_FILE = 'working-dir/query_metrics.jsonl'
+
+
+class ThreadOutput(io.TextIOBase):
+    """
+    sys.stdout stand-in that buffers output per worker thread or asyncio task.
+
+    Code inside capture() writes to its own buffer; everything else goes
+    straight to the wrapped stream. This keeps each query's log in one block.
+    The buffer lives in a context variable, so it follows an asyncio task
+    into the driver threads AsyncEZLinksRoundsDB.run() hands work to.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._buffer = contextvars.ContextVar('output_buffer', default=None)
+
+    def write(self, text):
+        buffer = self._buffer.get()
+        if buffer is None:
+            return self.stream.write(text)
+        return buffer.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    @contextmanager
+    def capture(self):
+        """Buffer this thread's (or task's) output; yields the buffer."""
+        buffer = io.StringIO()
+        token = self._buffer.set(buffer)
+        try:
+            yield buffer
+        finally:
+            self._buffer.reset(token)
+
+
+def refresh_query(db: EZLinksRoundsDB, query: dict,
+                  start_date: str = None, end_date: str = None,
+                  force_refresh: bool = False,
+                  backfill_window: str = None, backfill_workers: int = 1,
+                  trailing_days: int = None, use_checksums: bool = False):
+    """
+    Refresh the CSV cache for a single query or fusion group.
+
+    Args:
+        db: Database connection wrapper
+        query: Query definition from queries.json, or a fusion group
+               (see query_loader.fuse_queries)
+        start_date: Optional start date filter (YYYYMMDD format)
+        end_date: Optional end date filter (YYYYMMDD format)
+        force_refresh: Force full refresh instead of incremental update
+        backfill_window: Optional 'month' or 'week' to run the full refresh as a
+                         chunked, resumable backfill
+        backfill_workers: Concurrent windows per backfill
+        trailing_days: Override the query's trailing upsert window (days)
+        use_checksums: Let full refreshes of queries with a checksum_query
+                       pull only the months that changed
+    """
+    if db.cancelled:
+        print("Skipped: run deadline reached")
+        mark_query_stale(db, query)
+        return
+
+    members = checksum_members(query, force_refresh, start_date, end_date, backfill_window,
+                               use_checksums)
+    if members:
+        # A checksum refresh pulls a few months per member, cheaper than the fused full scan
+        for member in members:
+            print(f"{member['name']}:")
+            db.refresh_full_csv(**refresh_csv_args(member))
+        return
+
+    if query.get('fused'):
+        if force_refresh:
+            db.refresh_fused_csvs(query, start_date=start_date, end_date=end_date)
+        else:
+            db.update_fused_csvs(query, force_start_date=start_date, end_date=end_date,
+                                 trailing_days=trailing_days)
+    elif force_refresh:
+        # Full refresh mode - replace entire CSV
+        db.refresh_full_csv(**refresh_csv_args(query, start_date, end_date,
+                                               backfill_window, backfill_workers,
+                                               use_checksums))
+    else:
+        # Incremental update mode - append new records
+        db.update_csv(**update_csv_args(query, start_date, end_date, trailing_days))
+
+
+def checksum_members(query: dict, force_refresh: bool, start_date: str = None,
+                     end_date: str = None, backfill_window: str = None,
+                     use_checksums: bool = False) -> list:
+    """
+    Members of a fusion group to refresh one by one using month checksums.
+
+    Returns:
+        The group's members if this is a plain full refresh and every member
+        has a checksum_query, otherwise an empty list
+    """
+    if not (query.get('fused') and force_refresh and use_checksums):
+        return []
+    if start_date or end_date or backfill_window:
+        return []
+    members = list(query['members'].values())
+    return members if all(m.get('checksum_query') for m in members) else []
+
+
+def refresh_csv_args(query: dict, start_date: str = None, end_date: str = None,
+                     backfill_window: str = None, backfill_workers: int = 1,
+                     use_checksums: bool = False) -> dict:
+    """Keyword arguments for EZLinksRoundsDB.refresh_full_csv for a query."""
+    return dict(
+        table_name="N/A",  # Not used when base_query is provided
+        csv_file=query['csv_file'],
+        date_column=query['date_column'],
+        count_column=query['count_column'],
+        base_query=query.get('base_query'),
+        filtered_query=query.get('filtered_query'),
+        order_by=query.get('order_by'),
+        start_date=start_date,
+        end_date=end_date,
+        date_param_type=query.get('date_param_type', 'str'),
+        max_date_query=query.get('max_date_query'),
+        backfill_window=backfill_window,
+        backfill_workers=backfill_workers,
+        cache_ttl=query.get('cache_ttl'),
+        statement_timeout=query.get('statement_timeout'),
+        checksum_query=query.get('checksum_query') if use_checksums else None
+    )
+
+
+def update_csv_args(query: dict, start_date: str = None, end_date: str = None,
+                    trailing_days: int = None) -> dict:
+    """Keyword arguments for EZLinksRoundsDB.update_csv for a query."""
+    return dict(
+        table_name="N/A",  # Not used when base_query is provided
+        csv_file=query['csv_file'],
+        date_column=query['date_column'],
+        count_column=query['count_column'],
+        base_query=query.get('base_query'),
+        filtered_query=query.get('filtered_query'),
+        order_by=query.get('order_by'),
+        max_date_query=query.get('max_date_query'),
+        force_start_date=start_date,
+        end_date=end_date,
+        date_param_type=query.get('date_param_type', 'str'),
+        trailing_days=(trailing_days if trailing_days is not None
+                       else query.get('trailing_days', 0)),
+        statement_timeout=query.get('statement_timeout')
+    )
+
+
+def query_csv_files(query: dict) -> list:
+    """CSV caches written by a query, or by every member of a fusion group."""
+    if query.get('fused'):
+        return [member['csv_file'] for member in query['members'].values()]
+    return [query['csv_file']]
+
+
+def recover_caches(queries: list):
+    """Finish or roll back cache writes a previous run left interrupted."""
+    for query in queries:
+        recovered = recover_cache(query['csv_file'])
+        if recovered:
+            print(f"Recovered {query['csv_file']}: {recovered}")
+
+
+def pack_series_store(queries: list):
+    """Pack every query's cache into the consolidated series store for the analysis."""
+    try:
+        packed = write_series_store(SERIES_STORE_FILE,
+                                    {query['name']: query['csv_file'] for query in queries})
+    except (OSError, ValueError) as e:
+        # The analysis reads the per-query caches instead
+        print(f"Warning: could not write {SERIES_STORE_FILE}: {e}")
+        return
+    print(f"Packed {len(packed)} series ({sum(packed.values())} rows) into {SERIES_STORE_FILE}")
+
+
+def mark_query_stale(db: EZLinksRoundsDB, query: dict):
+    """Record that a query's caches were not brought up to date this run."""
+    for csv_file in query_csv_files(query):
+        db.mark_stale(csv_file)
+
+
+def stale_query_names(db: EZLinksRoundsDB, work: list) -> list:
+    """Names of the queries (fusion group members included) whose caches are stale."""
+    names = []
+    for query in work:
+        members = query['members'].values() if query.get('fused') else [query]
+        names.extend(m['name'] for m in members if m['csv_file'] in db.stale_caches)
+    return names
+
+
+def start_deadline(db: EZLinksRoundsDB, minutes: float) -> threading.Timer:
+    """Cancel all warehouse work once the run has taken `minutes`."""
+    def expire():
+        print(f"\nRun deadline of {minutes:g} minutes reached; cancelling warehouse queries")
+        db.cancel()
+
+    timer = threading.Timer(minutes * 60, expire)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def report_stale(db: EZLinksRoundsDB, work: list) -> list:
+    """Print and return the queries whose caches are stale after the refresh."""
+    stale = stale_query_names(db, work)
+    if stale:
+        print(f"STALE (cache not refreshed this run): {', '.join(stale)}")
+    return stale
+
+
+def report_update(db: EZLinksRoundsDB, work: list, failed: list = ()) -> list:
+    """
+    Print the outcome of the refresh and return the queries left stale.
+
+    Success is only reported when every query finished; a run cut short by
+    the deadline, or with failed or timed-out queries, lists those instead.
+    """
+    if failed:
+        print(f"CSV files updated; failed or timed out: {', '.join(failed)}")
+    elif stale_query_names(db, work):
+        print("CSV files updated; some queries did not finish"
+              + (" before the run deadline" if db.cancelled else ""))
+    else:
+        print("CSV files updated successfully!")
+    return report_stale(db, work)
+
+
+def refresh_queries_parallel(db: EZLinksRoundsDB, queries: list, workers: int, **kwargs):
+    """
+    Refresh several queries concurrently on a thread pool.
+
+    Each query's output is buffered and printed as one block, in queries.json
+    order, once that query (and every query before it) has finished.
+
+    Args:
+        db: Database connection wrapper (its pool should allow `workers` connections)
+        queries: Query definitions to refresh
+        workers: Number of worker threads
+        **kwargs: Passed through to refresh_query
+    """
+    output = ThreadOutput(sys.stdout)
+
+    def run(i, query):
+        with output.capture() as buffer, labelled(query['name']):
+            print(f"\n[{i}/{len(queries)}] Processing query: {query['name']}")
+            print("-" * 80)
+            try:
+                refresh_query(db, query, **kwargs)
+            except Exception as e:
+                print(f"ERROR: Query {query['name']} failed: {e}")
+                mark_query_stale(db, query)
+        return buffer.getvalue()
+
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run, i, query) for i, query in enumerate(queries, 1)]
+            for future in futures:
+                output.stream.write(future.result())
+                output.stream.flush()
+    finally:
+        sys.stdout = output.stream
+
+
+async def refresh_query_async(adb: AsyncEZLinksRoundsDB, query: dict,
+                              start_date: str = None, end_date: str = None,
+                              force_refresh: bool = False,
+                              backfill_window: str = None, backfill_workers: int = 1,
+                              trailing_days: int = None, use_checksums: bool = False):
+    """
+    Async refresh_query.
+
+    For a plain incremental update, the query's max_date_query probe and the
+    cache manifest are read concurrently, and the pull is skipped when the
+    warehouse has nothing newer than the cache.
+    """
+    if adb.db.cancelled:
+        print("Skipped: run deadline reached")
+        mark_query_stale(adb.db, query)
+        return
+
+    members = checksum_members(query, force_refresh, start_date, end_date, backfill_window,
+                               use_checksums)
+    if members:
+        for member in members:
+            print(f"{member['name']}:")
+            await adb.refresh_full_csv(**refresh_csv_args(member))
+        return
+
+    if query.get('fused'):
+        if force_refresh:
+            await adb.refresh_fused_csvs(query, start_date=start_date, end_date=end_date)
+        else:
+            await adb.update_fused_csvs(query, force_start_date=start_date, end_date=end_date,
+                                        trailing_days=trailing_days)
+        return
+
+    if force_refresh:
+        await adb.refresh_full_csv(**refresh_csv_args(query, start_date, end_date,
+                                                      backfill_window, backfill_workers,
+                                                      use_checksums))
+        return
+
+    args = update_csv_args(query, start_date, end_date, trailing_days)
+    if not args['force_start_date'] and not args['trailing_days'] and query.get('max_date_query'):
+        latest, manifest = await asyncio.gather(
+            adb.get_latest_date("N/A", query['date_column'], query['max_date_query'],
+                                query.get('statement_timeout')),
+            adb.run(load_manifest, query['csv_file'])
+        )
+        if (latest and manifest and manifest['max_date']
+                and date_key_to_int(latest) <= date_key_to_int(manifest['max_date'])):
+            print(f"Up to date: warehouse latest {latest}, cached through {manifest['max_date']}")
+            return
+
+    await adb.update_csv(**args)
+
+
+async def refresh_queries_async(adb: AsyncEZLinksRoundsDB, queries: list,
+                                query_timeout: float = None, **kwargs) -> list:
+    """
+    Refresh all queries concurrently on the event loop.
+
+    Each query runs as its own task with an optional timeout; output is
+    buffered per task and printed in queries.json order.
+
+    A timed-out query stops being awaited and is marked stale, but its
+    blocking driver call is not interrupted and keeps its connection until
+    it returns (bounded by the query's statement_timeout).
+
+    Args:
+        adb: Connected async database wrapper
+        queries: Query definitions (or fusion groups) to refresh
+        query_timeout: Optional per-query timeout in seconds
+        **kwargs: Passed through to refresh_query_async
+
+    Returns:
+        Names of queries that timed out or failed
+    """
+    output = ThreadOutput(sys.stdout)
+    failed = []
+
+    async def run(i, query):
+        with output.capture() as buffer, labelled(query['name']):
+            print(f"\n[{i}/{len(queries)}] Processing query: {query['name']}")
+            print("-" * 80)
+            try:
+                await asyncio.wait_for(refresh_query_async(adb, query, **kwargs), query_timeout)
+            except asyncio.TimeoutError:
+                print(f"ERROR: Query {query['name']} timed out after {query_timeout}s")
+                failed.append(query['name'])
+                mark_query_stale(adb.db, query)
+            except Exception as e:
+                print(f"ERROR: Query {query['name']} failed: {e}")
+                failed.append(query['name'])
+                mark_query_stale(adb.db, query)
+        return buffer.getvalue()
+
+    sys.stdout = output
+    try:
+        tasks = [asyncio.ensure_future(run(i, query)) for i, query in enumerate(queries, 1)]
+        for task in tasks:
+            output.stream.write(await task)
+            output.stream.flush()
+    finally:
+        sys.stdout = output.stream
+
+    return failed
+
+
+async def update_databases_async(server: str, database: str, use_windows_auth: bool,
+                                 username: str, password: str, work: list, workers: int,
+                                 query_timeout: float = None, result_cache: ResultCache = None,
+                                 deadline: float = None, metrics: QueryMetrics = None,
+                                 connection_factory=None, **refresh_args):
+    """
+    Connect, refresh every query concurrently, and disconnect (async mode).
+
+    Returns:
+        Names of the queries left stale, or None if the connection failed
+    """
+    adb = AsyncEZLinksRoundsDB(server, database, username, password, use_windows_auth,
+                               max_workers=workers, result_cache=result_cache,
+                               metrics=metrics, connection_factory=connection_factory)
+    if not await adb.connect():
+        print("Failed to connect to database")
+        return None
+
+    timer = start_deadline(adb.db, deadline) if deadline else None
+    try:
+        failed = await refresh_queries_async(adb, work, query_timeout, **refresh_args)
+
+        print("\n" + "=" * 80)
+        stale = report_update(adb.db, work, failed)
+        print_run_stats(adb.db)
+        print("=" * 80)
+    finally:
+        if timer:
+            timer.cancel()
+        await adb.disconnect()
+
+    return stale
+
+
+def print_run_stats(db: EZLinksRoundsDB):
+    """Print statement reuse, result cache counters and warehouse timings for the run."""
+    distinct, executions = db.statement_stats()
+    print(f"SQL statements: {distinct} distinct texts across {executions} executions")
+    if db.result_cache is not None:
+        hits, misses = db.result_cache.stats()
+        print(f"Result cache: {hits} hits, {misses} misses")
+    if db.metrics is not None:
+        db.metrics.print_summary()
 
 
 def update_and_analyze(server: str, database: str,
@@ -23,7 +458,18 @@ def update_and_analyze(server: str, database: str,
                       username: str = None, password: str = None,
                       start_date: str = None, end_date: str = None,
                       force_refresh: bool = False,
-                      query_names: list = None):
+                      query_names: list = None,
+                      parallel: int = 1,
+                      backfill_window: str = None,
+                      backfill_workers: int = 4,
+                      fuse: bool = True,
+                      trailing_days: int = None,
+                      use_async: bool = False,
+                      query_timeout: float = None,
+                      use_cache: bool = True,
+                      deadline: float = None,
+                      use_checksums: bool = False,
+                      connection_factory=None):
     """
     Pull latest data from database for all queries and run anomaly analysis.
 
@@ -37,6 +483,24 @@ def update_and_analyze(server: str, database: str,
         end_date: Optional end date filter (YYYYMMDD format)
         force_refresh: Force full refresh instead of incremental update
         query_names: Optional list of query names to process (default: all queries)
+        parallel: Number of queries to refresh concurrently (capped at MAX_PARALLEL_QUERIES)
+        backfill_window: Optional 'month' or 'week'; full refreshes are pulled in
+                         resumable windows (implies force_refresh)
+        backfill_workers: Concurrent windows per backfill
+        fuse: Run queries that differ only in one predicate as a single
+              grouped statement (see query_loader.find_fusion_groups)
+        trailing_days: Override every query's trailing upsert window (days)
+        use_async: Refresh every query (and its max_date_query probe) concurrently
+                   on an asyncio event loop
+        query_timeout: Per-query timeout in seconds (async mode only)
+        use_cache: Serve repeated statements from the on-disk result cache
+        deadline: Minutes after which warehouse pulls are cancelled; queries
+                  not refreshed by then are analyzed from their existing
+                  caches and reported as stale
+        use_checksums: On --refresh, pull only the months whose checksum_query
+                       result changed (for queries that define one)
+        connection_factory: Optional replacement for pyodbc.connect (e.g. a
+                            sqlite_backend.SQLiteBackend stand-in)
     """
     # Load queries from JSON
     try:
@@ -72,68 +536,110 @@ def update_and_analyze(server: str, database: str,
         print(f"\nDate filter: start_date >= {start_date}")
     if end_date:
         print(f"Date filter: end_date <= {end_date}")
-    if force_refresh:
+    if backfill_window:
+        force_refresh = True
+        print(f"\nMode: BACKFILL by {backfill_window} ({backfill_workers} windows at a time, resumable)")
+    elif force_refresh:
         print("\nMode: FULL REFRESH (will replace existing CSVs)")
     else:
         print("\nMode: INCREMENTAL UPDATE (will append new records)")
+
+    # Backfills pull each query in its own windows, so they are never fused
+    work = fuse_queries(queries) if fuse and not backfill_window else queries
+    for item in work:
+        if item.get('fused'):
+            print(f"Fused: {item['description']}")
+    if use_async and (parallel or 1) <= 1:
+        # Async mode schedules everything at once unless --parallel caps it
+        parallel = MAX_PARALLEL_QUERIES
+    workers = max(1, min(parallel or 1, MAX_PARALLEL_QUERIES, len(work)))
+    if use_async:
+        print(f"Async: up to {workers} concurrent queries"
+              + (f", {query_timeout}s timeout each" if query_timeout else ""))
+    elif workers > 1:
+        print(f"Parallel: {workers} concurrent queries")
     print()
 
-    # Connect to database once
-    db = EZLinksRoundsDB(server, database, username, password, use_windows_auth)
+    # Before anything reads a cache, undo writes cut short by a crash
+    recover_caches(queries)
+
+    # Connect to database once (pool holds one connection per worker)
+    pool_size = workers
+    if backfill_window:
+        pool_size = max(workers, min(backfill_workers, MAX_PARALLEL_QUERIES))
+
+    refresh_args = dict(start_date=start_date, end_date=end_date,
+                        force_refresh=force_refresh,
+                        backfill_window=backfill_window,
+                        backfill_workers=backfill_workers,
+                        trailing_days=trailing_days,
+                        use_checksums=use_checksums)
+
+    result_cache = ResultCache(RESULT_CACHE_DIR) if use_cache else None
+    metrics = QueryMetrics(METRICS_FILE)
+
+    if use_async:
+        stale = asyncio.run(update_databases_async(
+            server, database, use_windows_auth, username, password,
+            work, pool_size, query_timeout, result_cache, deadline, metrics,
+            connection_factory, **refresh_args))
+        if stale is None:
+            return False
+        pack_series_store(all_queries)
+        return run_anomaly_analysis(stale)
+
+    db = EZLinksRoundsDB(server, database, username, password, use_windows_auth,
+                         pool_size=pool_size, result_cache=result_cache, metrics=metrics,
+                         connection_factory=connection_factory)
 
+    timer = None
     try:
         if not db.connect():
             print("Failed to connect to database")
             return False
 
-        # Process each query
-        for i, query in enumerate(queries, 1):
-            print(f"\n[{i}/{len(queries)}] Processing query: {query['name']}")
-            print("-" * 80)
-
-            if force_refresh:
-                # Full refresh mode - replace entire CSV
-                db.refresh_full_csv(
-                    table_name="N/A",  # Not used when base_query is provided
-                    csv_file=query['csv_file'],
-                    date_column=query['date_column'],
-                    count_column=query['count_column'],
-                    base_query=query.get('base_query'),
-                    filtered_query=query.get('filtered_query'),
-                    order_by=query.get('order_by'),
-                    start_date=start_date,
-                    end_date=end_date
-                )
-            else:
-                # Incremental update mode - append new records
-                db.update_csv(
-                    table_name="N/A",  # Not used when base_query is provided
-                    csv_file=query['csv_file'],
-                    date_column=query['date_column'],
-                    count_column=query['count_column'],
-                    base_query=query.get('base_query'),
-                    filtered_query=query.get('filtered_query'),
-                    order_by=query.get('order_by'),
-                    max_date_query=query.get('max_date_query'),
-                    force_start_date=start_date,
-                    end_date=end_date
-                )
+        timer = start_deadline(db, deadline) if deadline else None
+        if workers > 1:
+            refresh_queries_parallel(db, work, workers, **refresh_args)
+        else:
+            # Process each query
+            for i, query in enumerate(work, 1):
+                print(f"\n[{i}/{len(work)}] Processing query: {query['name']}")
+                print("-" * 80)
+                with labelled(query['name']):
+                    refresh_query(db, query, **refresh_args)
 
         print("\n" + "=" * 80)
-        print("CSV files updated successfully!")
+        stale = report_update(db, work)
+        print_run_stats(db)
         print("=" * 80)
 
     finally:
+        if timer:
+            timer.cancel()
         db.disconnect()
 
+    pack_series_store(all_queries)
+    return run_anomaly_analysis(stale)
+
+
+def run_anomaly_analysis(stale_queries: list = ()) -> bool:
+    """
+    Run past_low_anomalies.py over the caches and print its report.
+
+    Args:
+        stale_queries: Queries whose caches were not refreshed, flagged in the report
+    """
     print("\n" + "=" * 80)
     print("RUNNING ANOMALY ANALYSIS")
     print("=" * 80)
 
     # Run the anomaly analysis (from past_low_anomalies.py)
     import subprocess
-    result = subprocess.run(['python3', os.path.join(SCRIPT_DIR, 'past_low_anomalies.py')],
-                          capture_output=True, text=True)
+    command = ['python3', os.path.join(SCRIPT_DIR, 'past_low_anomalies.py')]
+    for name in stale_queries:
+        command += ['--stale', name]
+    result = subprocess.run(command, capture_output=True, text=True)
     print(result.stdout)
 
     if result.returncode != 0:
@@ -168,6 +674,28 @@ Examples:
 
   # Full refresh with date filter
   python3 update_and_analyze.py --start-date 20240101 --refresh
+
+  # Refresh all queries concurrently with a 10 minute timeout each
+  python3 update_and_analyze.py --async --query-timeout 600
+
+  # Stop pulling after 45 minutes and analyze whatever is cached
+  python3 update_and_analyze.py --deadline 45
+
+  # Refresh, re-pulling only months whose warehouse checksum changed
+  python3 update_and_analyze.py --refresh --checksums
+
+  # Pick up late-arriving data for the last 14 days
+  python3 update_and_analyze.py --trailing-days 14
+
+  # Refresh up to 4 queries at a time
+  python3 update_and_analyze.py --parallel 4
+
+  # Run against a local SQLite stand-in with 50ms of latency per statement
+  python3 sqlite_backend.py ../working-dir/standin.db
+  python3 update_and_analyze.py --sqlite working-dir/standin.db --sqlite-latency 0.05
+
+  # Rebuild caches month by month (rerun the same command to resume)
+  python3 update_and_analyze.py --start-date 20150101 --backfill month
         """
     )
     parser.add_argument('--query', action='append', dest='queries', metavar='NAME',
@@ -178,23 +706,71 @@ Examples:
                        help='End date filter (e.g., 20241231)')
     parser.add_argument('--refresh', action='store_true',
                        help='Force full refresh (replace CSV instead of append)')
+    parser.add_argument('--parallel', type=int, default=1, metavar='N',
+                       help=f'Refresh up to N queries concurrently (default: 1, max: {MAX_PARALLEL_QUERIES})')
+    parser.add_argument('--trailing-days', type=int, metavar='N',
+                       help="Re-fetch and upsert the last N cached days (overrides each query's trailing_days)")
+    parser.add_argument('--async', action='store_true', dest='use_async',
+                       help='Refresh all queries and their max-date probes concurrently with asyncio')
+    parser.add_argument('--query-timeout', type=float, metavar='SECONDS',
+                       help='Per-query timeout in async mode')
+    parser.add_argument('--deadline', type=float, metavar='MINUTES',
+                       help='Cancel warehouse pulls after MINUTES and analyze the existing caches')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Always query the warehouse instead of reusing cached results')
+    parser.add_argument('--checksums', action='store_true',
+                       help='Make --refresh pull only the months whose checksum_query result changed')
+    parser.add_argument('--no-fuse', action='store_true',
+                       help='Run every query separately, even when several could share one statement')
+    parser.add_argument('--backfill', choices=BACKFILL_WINDOWS, metavar='WINDOW',
+                       help='Full refresh in resumable month/week windows (requires --start-date)')
+    parser.add_argument('--backfill-workers', type=int, default=4, metavar='N',
+                       help='Concurrent windows per backfill (default: 4)')
+
+    parser.add_argument('--sqlite', metavar='PATH',
+                       help='Use a local SQLite stand-in (see sqlite_backend.py) instead of SQL Server')
+    parser.add_argument('--sqlite-latency', type=float, default=0.0, metavar='SECONDS',
+                       help='Injected latency per statement with --sqlite')
+    parser.add_argument('--sqlite-fetch-latency', type=float, default=0.0, metavar='SECONDS',
+                       help='Injected latency per fetch round trip with --sqlite')
+    parser.add_argument('--sqlite-failure-rate', type=float, default=0.0, metavar='P',
+                       help='Probability (0-1) that a connect or statement fails with --sqlite')
 
     args = parser.parse_args()
 
+    if args.backfill and not args.start_date:
+        parser.error('--backfill requires --start-date')
+
+    connection_factory = None
+    if args.sqlite:
+        if not os.path.exists(args.sqlite):
+            parser.error(f"{args.sqlite} not found (create it with scripts/sqlite_backend.py)")
+        from sqlite_backend import SQLiteBackend
+        connection_factory = SQLiteBackend(args.sqlite,
+                                           latency=args.sqlite_latency,
+                                           fetch_latency=args.sqlite_fetch_latency,
+                                           failure_rate=args.sqlite_failure_rate)
+
     # Try to load config file
     try:
-        import config
-        SERVER = config.SERVER
-        DATABASE = config.DATABASE
-        USE_WINDOWS_AUTH = config.USE_WINDOWS_AUTH
-        USERNAME = getattr(config, 'USERNAME', None)
-        PASSWORD = getattr(config, 'PASSWORD', None)
-
-        print(f"Loaded configuration:")
-        print(f"  Server: {SERVER}")
-        print(f"  Database: {DATABASE}")
-        print(f"  Auth: {'Windows' if USE_WINDOWS_AUTH else 'SQL Server'}")
-        print()
+        if args.sqlite:
+            SERVER, DATABASE = 'sqlite', args.sqlite
+            USE_WINDOWS_AUTH, USERNAME, PASSWORD = False, None, None
+            print(f"Using SQLite stand-in: {args.sqlite}")
+            print()
+        else:
+            import config
+            SERVER = config.SERVER
+            DATABASE = config.DATABASE
+            USE_WINDOWS_AUTH = config.USE_WINDOWS_AUTH
+            USERNAME = getattr(config, 'USERNAME', None)
+            PASSWORD = getattr(config, 'PASSWORD', None)
+
+            print(f"Loaded configuration:")
+            print(f"  Server: {SERVER}")
+            print(f"  Database: {DATABASE}")
+            print(f"  Auth: {'Windows' if USE_WINDOWS_AUTH else 'SQL Server'}")
+            print()
 
         success = update_and_analyze(
             SERVER, DATABASE,
@@ -204,7 +780,18 @@ Examples:
             start_date=args.start_date,
             end_date=args.end_date,
             force_refresh=args.refresh,
-            query_names=args.queries
+            query_names=args.queries,
+            parallel=args.parallel,
+            backfill_window=args.backfill,
+            backfill_workers=args.backfill_workers,
+            fuse=not args.no_fuse,
+            trailing_days=args.trailing_days,
+            use_async=args.use_async,
+            query_timeout=args.query_timeout,
+            use_cache=not args.no_cache,
+            deadline=args.deadline,
+            use_checksums=args.checksums,
+            connection_factory=connection_factory
         )
 
     except ImportError:
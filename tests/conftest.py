@@ -5,10 +5,16 @@ import pytest
 from unittest.mock import MagicMock, patch
 from datetime import datetime
 from fastapi.testclient import TestClient
+import os
 import sys
 
 # Mock pyodbc at module level to prevent import errors
 sys.modules['pyodbc'] = MagicMock()
+# Give the mock a real exception class so `except pyodbc.Error` works
+sys.modules['pyodbc'].Error = type('Error', (Exception,), {})
+
+# Make the standalone scripts (db_query, query_loader, ...) importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
 
 
 @pytest.fixture
@@ -0,0 +1,620 @@
+"""
+Tests for cache file helpers (manifests and sidecars)
+"""
+import os
+
+import pytest
+
+
+def write_cache(path, rows):
+    """Write a CSV cache with the standard header"""
+    path.write_text('playdatekey,count\n' + ''.join(f'{d},{c}\n' for d, c in rows))
+
+
+class TestManifest:
+    """Tests for the per-cache watermark manifest"""
+
+    def test_build_manifest_records_range_and_counts(self, tmp_path):
+        """Test manifest captures min/max date, row count and size"""
+        from cache_files import build_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6), ('20240103', 7)])
+
+        manifest = build_manifest(str(csv_file))
+
+        assert manifest['min_date'] == '20240101'
+        assert manifest['max_date'] == '20240103'
+        assert manifest['row_count'] == 3
+        assert manifest['byte_size'] == csv_file.stat().st_size
+
+    def test_extend_manifest_matches_full_rebuild(self, tmp_path):
+        """Test an appended manifest equals one built from scratch"""
+        from cache_files import build_manifest, extend_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5)])
+        manifest = build_manifest(str(csv_file))
+
+        with open(csv_file, 'a') as f:
+            f.write('20240102,6\n20240103,7\n')
+
+        assert extend_manifest(str(csv_file), manifest, manifest['byte_size']) == \
+            build_manifest(str(csv_file))
+
+    @pytest.mark.parametrize('chunk', [1, 3, 7])
+    def test_manifest_does_not_depend_on_read_chunks(self, tmp_path, monkeypatch, chunk):
+        """Test lines split across chunk boundaries are scanned and checksummed once"""
+        import cache_files
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240131', 5), ('20240201', 61), ('20240302', 7)])
+        expected = cache_files.build_manifest(str(csv_file))
+        with open(csv_file, 'a') as f:
+            f.write('20240303,8\n20240401,9')
+        extended = cache_files.build_manifest(str(csv_file))
+
+        monkeypatch.setattr(cache_files, 'MANIFEST_CHUNK', chunk)
+        csv_file.write_text(csv_file.read_text()[:expected['byte_size']])
+        assert cache_files.build_manifest(str(csv_file)) == expected
+        with open(csv_file, 'a') as f:
+            f.write('20240303,8\n20240401,9')
+        assert cache_files.extend_manifest(str(csv_file), expected, expected['byte_size']) == extended
+        assert extended['month_offsets'] == {'202401': 18, '202402': 29, '202403': 41, '202404': 63}
+
+    def test_check_manifest_detects_modified_cache(self, tmp_path):
+        """Test size and tail checks catch out-of-band edits"""
+        from cache_files import build_manifest, check_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+        manifest = build_manifest(str(csv_file))
+        assert check_manifest(str(csv_file), manifest) is None
+
+        write_cache(csv_file, [('20240101', 5), ('20240109', 6)])
+        assert check_manifest(str(csv_file), manifest) is not None
+
+    def test_verify_manifest_detects_checksum_mismatch(self, tmp_path):
+        """Test same-size corruption is caught by the checksum"""
+        from cache_files import build_manifest, check_manifest, verify_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+        manifest = build_manifest(str(csv_file))
+
+        write_cache(csv_file, [('20240101', 9), ('20240102', 6)])
+
+        assert check_manifest(str(csv_file), manifest) is None
+        assert verify_manifest(str(csv_file), manifest) == 'checksum mismatch'
+
+    def test_verify_manifest_reads_in_chunks(self, tmp_path, monkeypatch):
+        """Test the checksum is computed over chunks, not one whole-file read"""
+        import zlib
+        import cache_files
+        from cache_files import build_manifest, verify_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+        manifest = build_manifest(str(csv_file))
+        monkeypatch.setattr(cache_files, 'MANIFEST_CHUNK', 7)
+        sizes = []
+        crc32 = zlib.crc32
+        monkeypatch.setattr(zlib, 'crc32', lambda data, *args: sizes.append(len(data))
+                            or crc32(data, *args))
+
+        assert verify_manifest(str(csv_file), manifest) is None
+        assert max(sizes) == 7 and sum(sizes) == manifest['byte_size']
+
+    def test_load_manifest_rebuilds_stale_manifest(self, tmp_path):
+        """Test a stale manifest is rebuilt and rewritten"""
+        from cache_files import build_manifest, load_manifest, read_manifest, write_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5)])
+        write_manifest(str(csv_file), build_manifest(str(csv_file)))
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+
+        manifest = load_manifest(str(csv_file))
+
+        assert manifest['max_date'] == '20240102'
+        assert read_manifest(str(csv_file)) == manifest
+
+
+class TestTailAccess:
+    """Tests for reading and rewriting the tail of a cache"""
+
+    @pytest.mark.parametrize('block', [16, 65536])
+    def test_find_date_offset(self, tmp_path, monkeypatch, block):
+        """Test the backward scan finds the first row on or after a date"""
+        import cache_files
+        monkeypatch.setattr(cache_files, 'REVERSE_SCAN_BLOCK', block)
+        csv_file = tmp_path / 'rounds.csv'
+        rows = [(f'202401{d:02d}', d) for d in range(1, 31)]
+        write_cache(csv_file, rows)
+        text = csv_file.read_bytes()
+
+        offset = cache_files.find_date_offset(str(csv_file), '20240125')
+        assert text[offset:].startswith(b'20240125,25')
+
+        assert cache_files.find_date_offset(str(csv_file), '20240101') == text.index(b'20240101')
+        assert cache_files.find_date_offset(str(csv_file), '20240201') == len(text)
+
+    def test_truncated_manifest_extends_to_full_manifest(self, tmp_path):
+        """Test prefix manifest + extend equals a rebuild after a tail rewrite"""
+        from cache_files import (build_manifest, extend_manifest, find_date_offset,
+                                 read_rows_from, truncated_manifest)
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6), ('20240103', 7)])
+        manifest = build_manifest(str(csv_file))
+
+        offset = find_date_offset(str(csv_file), '20240102')
+        tail = read_rows_from(str(csv_file), offset)
+        prefix = truncated_manifest(str(csv_file), manifest, offset, len(tail))
+        with open(csv_file, 'r+') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write('20240102,60\n20240103,7\n')
+
+        assert tail == {'20240102': '6', '20240103': '7'}
+        assert extend_manifest(str(csv_file), prefix, offset) == build_manifest(str(csv_file))
+
+
+class TestSeriesColumns:
+    """Tests for array-backed daily series"""
+
+    def test_extend_rows_from_int_keys(self):
+        """Test integer date keys and counts land in typed arrays"""
+        from cache_files import SeriesColumns
+        series = SeriesColumns()
+        series.extend_rows([(20240101, 5), (20240102, 6)])
+
+        assert series.dates.typecode == 'i'
+        assert series.counts.typecode == 'q'
+        assert list(series.iter_rows()) == [('20240101', 5), ('20240102', 6)]
+
+    def test_extend_rows_from_date_objects_keeps_dashed_format(self):
+        """Test DATE column values round-trip as YYYY-MM-DD"""
+        from datetime import date
+        from cache_files import SeriesColumns
+        series = SeriesColumns()
+        series.extend_rows([(date(2024, 1, 1), 5)])
+
+        assert list(series.dates) == [20240101]
+        assert list(series.iter_rows()) == [('2024-01-01', 5)]
+
+    def test_read_series(self, tmp_path):
+        """Test a CSV cache loads into arrays"""
+        from cache_files import read_series
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('2024-01-01', 5), ('2024-01-02', 6)])
+
+        series = read_series(str(csv_file))
+
+        assert list(series.dates) == [20240101, 20240102]
+        assert list(series.counts) == [5, 6]
+        assert series.dashed is True
+
+    def test_read_series_handles_rows_off_the_fast_path(self, tmp_path, monkeypatch):
+        """Test quoted, blank and mixed-format rows parse as csv would"""
+        import cache_files
+        from cache_files import read_series
+        monkeypatch.setattr(cache_files, 'PARSE_BLOCK_CHARS', 16)
+        csv_file = tmp_path / 'rounds.csv'
+        csv_file.write_text('playdatekey,count\r\n20240101,5\r\n20240102,6\r\n'
+                            '2024-01-03,7\r\n\r\n"20240104",8\r\n20240105,9')
+
+        series = read_series(str(csv_file))
+
+        assert list(series.dates) == [20240101, 20240102, 20240103, 20240104, 20240105]
+        assert list(series.counts) == [5, 6, 7, 8, 9]
+        assert series.dashed is False
+
+    def test_read_series_rejects_bad_count(self, tmp_path):
+        """Test a value the fast path can't parse still raises ValueError"""
+        from cache_files import read_series
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 'n/a')])
+
+        with pytest.raises(ValueError):
+            read_series(str(csv_file))
+
+    def test_as_numpy_is_zero_copy(self):
+        """Test NumPy views share memory with the arrays"""
+        pytest.importorskip('numpy')
+        from cache_files import SeriesColumns
+        series = SeriesColumns()
+        series.extend_rows([(20240101, 5)])
+
+        dates, counts = series.as_numpy()
+        series.counts[0] = 7
+
+        assert dates.tolist() == [20240101]
+        assert counts[0] == 7
+
+
+class TestSeriesMirror:
+    """Tests for the memory-mapped binary series format"""
+
+    def test_round_trip_is_mapped(self, tmp_path):
+        """Test a written series reads back as views over the file"""
+        from cache_files import SeriesColumns, read_binary_series, write_binary_series
+        series = SeriesColumns()
+        series.extend_rows([('2024-01-01', 5), ('2024-01-02', 2 ** 40)])
+        path = str(tmp_path / 'r.series')
+
+        write_binary_series(path, series, 123, 456)
+        loaded, size, crc = read_binary_series(path)
+
+        assert isinstance(loaded.dates, memoryview)
+        assert list(loaded.dates) == [20240101, 20240102]
+        assert list(loaded.counts) == [5, 2 ** 40]
+        assert loaded.dashed is True
+        assert (size, crc) == (123, 456)
+
+    def test_mirror_must_match_manifest(self, tmp_path):
+        """Test a mirror built from an older CSV is ignored"""
+        from cache_files import build_manifest, load_series_mirror, write_series_mirror
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5)])
+        write_series_mirror(str(csv_file), build_manifest(str(csv_file)))
+
+        assert list(load_series_mirror(str(csv_file), build_manifest(str(csv_file))).counts) == [5]
+
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+        assert load_series_mirror(str(csv_file), build_manifest(str(csv_file))) is None
+
+    def test_binary_to_csv(self, tmp_path):
+        """Test the converter rebuilds an identical CSV and manifest"""
+        from cache_files import (binary_to_csv, build_manifest, read_manifest,
+                                 series_path, write_series_mirror)
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('2024-01-01', 5), ('2024-01-02', 6)])
+        original = csv_file.read_text()
+        write_series_mirror(str(csv_file), build_manifest(str(csv_file)))
+        csv_file.unlink()
+
+        assert binary_to_csv(series_path(str(csv_file)), str(csv_file)) == 2
+        assert csv_file.read_text() == original
+        assert read_manifest(str(csv_file)) == build_manifest(str(csv_file))
+
+    def test_append_is_written_in_place(self, tmp_path, monkeypatch):
+        """Test an append parses only the new rows and keeps the mirror file"""
+        import cache_files
+        from cache_files import (build_manifest, extend_manifest, load_series_mirror,
+                                 series_path, write_series_mirror)
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+        before = build_manifest(str(csv_file))
+        write_series_mirror(str(csv_file), before)
+        mirror_size = os.path.getsize(series_path(str(csv_file)))
+
+        with open(csv_file, 'a') as f:
+            f.write('20240103,7\n')
+        after = extend_manifest(str(csv_file), before, before['byte_size'])
+        offsets = []
+        read_series = cache_files.read_series
+        monkeypatch.setattr(cache_files, 'read_series',
+                            lambda *args, **kwargs: offsets.append(kwargs.get('offset', 0))
+                            or read_series(*args, **kwargs))
+        write_series_mirror(str(csv_file), after, before, before['byte_size'])
+
+        assert offsets == [before['byte_size']]
+        assert os.path.getsize(series_path(str(csv_file))) == mirror_size
+        series = load_series_mirror(str(csv_file), after)
+        assert list(series.dates) == [20240101, 20240102, 20240103]
+        assert list(series.counts) == [5, 6, 7]
+
+    def test_stale_mirror_is_rebuilt_on_append(self, tmp_path):
+        """Test an append to a mirror that no longer matches rebuilds it"""
+        from cache_files import (build_manifest, extend_manifest, load_series_mirror,
+                                 write_series_mirror)
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5)])
+        write_series_mirror(str(csv_file), build_manifest(str(csv_file)))
+        write_cache(csv_file, [('20240101', 9), ('20240102', 6)])
+        before = build_manifest(str(csv_file))
+
+        with open(csv_file, 'a') as f:
+            f.write('20240103,7\n')
+        after = extend_manifest(str(csv_file), before, before['byte_size'])
+        write_series_mirror(str(csv_file), after, before, before['byte_size'])
+
+        assert list(load_series_mirror(str(csv_file), after).counts) == [9, 6, 7]
+
+    def test_binary_to_csv_keeps_column_names(self, tmp_path):
+        """Test the converter writes the header the mirror was built from"""
+        from cache_files import binary_to_csv, build_manifest, series_path, write_series_mirror
+        csv_file = tmp_path / 'rounds.csv'
+        csv_file.write_text('day,rounds\n20240101,5\n')
+        write_series_mirror(str(csv_file), build_manifest(str(csv_file)))
+        csv_file.unlink()
+
+        binary_to_csv(series_path(str(csv_file)), str(csv_file))
+
+        assert csv_file.read_text() == 'day,rounds\n20240101,5\n'
+
+    def test_truncated_file_is_rejected(self, tmp_path):
+        """Test a short file raises ValueError instead of mapping garbage"""
+        from cache_files import SeriesColumns, read_binary_series, write_binary_series
+        path = tmp_path / 'r.series'
+        series = SeriesColumns()
+        series.extend_rows([(20240101, 5)])
+        write_binary_series(str(path), series)
+        path.write_bytes(path.read_bytes()[:-4])
+
+        with pytest.raises(ValueError):
+            read_binary_series(str(path))
+
+
+class TestJournal:
+    """Tests for crash-safe in-place cache writes"""
+
+    def test_exception_rolls_back_append(self, tmp_path):
+        """Test a failure inside the journaled block restores cache and manifest"""
+        from cache_files import build_manifest, journaled, read_manifest, write_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+        manifest = build_manifest(str(csv_file))
+        write_manifest(str(csv_file), manifest)
+        original = csv_file.read_text()
+
+        with pytest.raises(RuntimeError):
+            with journaled(str(csv_file), manifest, manifest['byte_size']):
+                with open(csv_file, 'a') as f:
+                    f.write('20240103,7\n2024')
+                raise RuntimeError('pull failed')
+
+        assert csv_file.read_text() == original
+        assert read_manifest(str(csv_file)) == manifest
+        assert not (tmp_path / 'rounds.csv.journal').exists()
+
+    def test_recover_rolls_back_uncommitted_rewrite(self, tmp_path):
+        """Test a tail rewrite cut off by a crash is undone on the next run"""
+        from cache_files import (build_manifest, find_date_offset, journaled, read_manifest,
+                                 recover_cache, write_manifest)
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6), ('20240103', 7)])
+        manifest = build_manifest(str(csv_file))
+        write_manifest(str(csv_file), manifest)
+        original = csv_file.read_text()
+        offset = find_date_offset(str(csv_file), '20240102')
+
+        # Enter the block and "crash" after truncating, without exiting it
+        write = journaled(str(csv_file), manifest, offset)
+        write.__enter__()
+        with open(csv_file, 'r+') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write('20240102,9\n')
+
+        assert 'rolled back' in recover_cache(str(csv_file))
+        assert csv_file.read_text() == original
+        assert read_manifest(str(csv_file)) == manifest
+        assert recover_cache(str(csv_file)) is None
+
+    def test_recover_keeps_committed_write(self, tmp_path):
+        """Test a journal with its commit marker only brings the manifest up to date"""
+        from cache_files import JOURNAL_COMMIT, build_manifest, read_manifest, recover_cache
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+        (tmp_path / 'rounds.csv.journal').write_text(
+            '{"offset": 0, "tail": "", "manifest": null}\n' + JOURNAL_COMMIT + '\n')
+
+        assert recover_cache(str(csv_file)) == 'completed committed write'
+        assert read_manifest(str(csv_file)) == build_manifest(str(csv_file))
+        assert not (tmp_path / 'rounds.csv.journal').exists()
+
+    def test_recover_removes_partial_temp_files(self, tmp_path):
+        """Test temp files from an interrupted rewrite are discarded"""
+        from cache_files import recover_cache
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5)])
+        (tmp_path / 'rounds.csv.tmp').write_text('playdatekey,count\n2024')
+        (tmp_path / 'rounds.csv.journal').write_text('{"offset": 1')
+
+        recovered = recover_cache(str(csv_file))
+
+        assert 'removed partial rounds.csv.tmp' in recovered
+        assert 'discarded incomplete journal' in recovered
+        assert csv_file.read_text() == 'playdatekey,count\n20240101,5\n'
+
+
+class TestMonthIndex:
+    """Tests for the month offset index kept in the manifest"""
+
+    def test_offsets_point_at_first_row_of_each_month(self, tmp_path):
+        """Test each month maps to the byte where its first row starts"""
+        from cache_files import build_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240130', 1), ('20240131', 2), ('20240201', 3), ('20240301', 4)])
+        data = csv_file.read_bytes()
+
+        offsets = build_manifest(str(csv_file))['month_offsets']
+
+        assert sorted(offsets) == ['202401', '202402', '202403']
+        assert data[offsets['202402']:].startswith(b'20240201,3')
+        assert data[offsets['202401']:].startswith(b'20240130,1')
+
+    def test_read_series_from_month_offset(self, tmp_path):
+        """Test a range read starts at the month containing the date"""
+        from cache_files import build_manifest, month_offset, read_series
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('2024-01-31', 2), ('2024-02-01', 3), ('2024-02-15', 4),
+                               ('2024-03-01', 5)])
+        manifest = build_manifest(str(csv_file))
+
+        series = read_series(str(csv_file), offset=month_offset(manifest, '2024-02-10'))
+
+        assert list(series.dates) == [20240201, 20240215, 20240301]
+        assert series.dashed is True
+        assert list(series.since(20240210).dates) == [20240215, 20240301]
+        assert month_offset(manifest, 20250101) == manifest['byte_size']
+
+    @pytest.mark.parametrize('use_numpy', [True, False])
+    def test_since_unordered_checks_every_row(self, monkeypatch, use_numpy):
+        """Test an unsorted series keeps every later row, in file order"""
+        import cache_files
+        from cache_files import SeriesColumns
+        if use_numpy:
+            pytest.importorskip('numpy')
+        else:
+            monkeypatch.setattr(cache_files, 'numpy', None)
+        series = SeriesColumns()
+        series.extend_rows([(20250105, 1), (20230101, 2), (20250110, 3)])
+
+        later = series.since(20240101, ordered=False)
+
+        assert list(later.dates) == [20250105, 20250110]
+        assert list(later.counts) == [1, 3]
+
+
+class TestSeriesStore:
+    """Tests for the consolidated multi-series store"""
+
+    def test_pack_and_load_subset(self, tmp_path):
+        """Test every cache lands in one file and any subset maps back"""
+        from cache_files import open_series_store, write_series_store
+        first, second = tmp_path / 'a.csv', tmp_path / 'b.csv'
+        write_cache(first, [('20240101', 5), ('20240102', 6), ('20240103', 7)])
+        write_cache(second, [('2024-01-01', 2 ** 40)])
+        path = str(tmp_path / 'series.store')
+
+        packed = write_series_store(path, {'a': str(first), 'b': str(second),
+                                           'missing': str(tmp_path / 'none.csv')})
+        store = open_series_store(path)
+
+        assert packed == {'a': 3, 'b': 1}
+        assert store.names() == ['a', 'b']
+        loaded = store.load(['b', 'missing'])
+        assert list(loaded) == ['b']
+        assert list(loaded['b'].counts) == [2 ** 40]
+        assert loaded['b'].dashed is True
+        assert list(store.get('a').dates) == [20240101, 20240102, 20240103]
+
+    def test_get_ignores_series_packed_from_older_cache(self, tmp_path):
+        """Test a series whose CSV changed since packing is treated as missing"""
+        from cache_files import build_manifest, open_series_store, write_series_store
+        csv_file = tmp_path / 'a.csv'
+        write_cache(csv_file, [('20240101', 5)])
+        path = str(tmp_path / 'series.store')
+        write_series_store(path, {'a': str(csv_file)})
+
+        assert open_series_store(path).get('a', build_manifest(str(csv_file))) is not None
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+        assert open_series_store(path).get('a', build_manifest(str(csv_file))) is None
+
+    def test_corrupt_store_is_ignored(self, tmp_path, capsys):
+        """Test a truncated store is reported and skipped rather than misread"""
+        from cache_files import open_series_store, write_series_store
+        csv_file = tmp_path / 'a.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+        path = tmp_path / 'series.store'
+        write_series_store(str(path), {'a': str(csv_file)})
+        path.write_bytes(path.read_bytes()[:-8])
+
+        assert open_series_store(str(path)) is None
+        assert 'truncated' in capsys.readouterr().out
+        assert open_series_store(str(tmp_path / 'absent.store')) is None
+
+
+class TestCompressedCaches:
+    """Tests for gzip/lzma/zlib compressed caches"""
+
+    @pytest.mark.parametrize('compression,suffix', [('gzip', '.gz'), ('lzma', '.xz'), ('zlib', '.zz')])
+    def test_append_adds_member_and_manifest_tracks_it(self, tmp_path, compression, suffix):
+        """Test appending to a compressed cache keeps all rows and an exact manifest"""
+        from cache_files import (build_manifest, cache_compression, check_manifest,
+                                 extend_manifest, open_cache, read_series)
+        csv_file = str(tmp_path / ('rounds.csv' + suffix))
+        assert cache_compression(csv_file) == compression
+        with open_cache(csv_file, 'w') as f:
+            f.write('playdatekey,count\r\n20240101,5\r\n20240102,6\r\n')
+        manifest = build_manifest(csv_file)
+        offset = manifest['byte_size']
+
+        with open_cache(csv_file, 'a') as f:
+            f.write('20240103,7\r\n')
+
+        extended = extend_manifest(csv_file, manifest, offset)
+        assert extended == build_manifest(csv_file)
+        assert extended['row_count'] == 3
+        assert extended['max_date'] == '20240103'
+        assert extended['compression'] == compression
+        assert check_manifest(csv_file, extended) is None
+        series = read_series(csv_file, 'playdatekey', 'count')
+        assert list(series.iter_rows()) == [('20240101', 5), ('20240102', 6), ('20240103', 7)]
+
+    @pytest.mark.parametrize('suffix', ['.gz', '.xz', '.zz'])
+    def test_manifest_is_decoded_as_a_stream(self, tmp_path, monkeypatch, suffix):
+        """Test members split across read chunks decode the same, and a cut-off member raises"""
+        import cache_files
+        csv_file = str(tmp_path / ('rounds.csv' + suffix))
+        with cache_files.open_cache(csv_file, 'w') as f:
+            f.write('playdatekey,count\r\n' + ''.join(f'2024{d:04d},{d}\r\n' for d in range(101, 131)))
+        with cache_files.open_cache(csv_file, 'a') as f:
+            f.write('20240201,1\r\n')
+        expected = cache_files.build_manifest(csv_file)
+
+        monkeypatch.setattr(cache_files, 'MANIFEST_CHUNK', 7)
+        assert cache_files.build_manifest(csv_file) == expected
+        assert expected['row_count'] == 31
+
+        with open(csv_file, 'rb+') as f:
+            f.truncate(expected['byte_size'] - 4)
+        with pytest.raises(EOFError):
+            cache_files.build_manifest(csv_file)
+
+    def test_truncated_zlib_stream_raises(self, tmp_path):
+        """Test a cut-off zlib cache is an error rather than silently short"""
+        from cache_files import open_cache
+        csv_file = tmp_path / 'rounds.csv.zz'
+        with open_cache(str(csv_file), 'w') as f:
+            f.write('playdatekey,count\r\n' + ''.join(f'2024{d:04d},{d}\r\n' for d in range(1, 500)))
+        csv_file.write_bytes(csv_file.read_bytes()[:-10])
+
+        with pytest.raises(EOFError):
+            with open_cache(str(csv_file)) as f:
+                f.read()
+
+    def test_convert_cache_round_trip(self, tmp_path):
+        """Test converting to a codec and back reproduces the plain cache"""
+        from cache_files import convert_cache, read_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        write_cache(csv_file, [('20240101', 5), ('20240102', 6)])
+        original = csv_file.read_bytes()
+
+        packed = convert_cache(str(csv_file), 'lzma')
+        assert packed == str(csv_file) + '.xz'
+        assert read_manifest(packed)['row_count'] == 2
+        csv_file.unlink()
+        assert convert_cache(packed, None) == str(csv_file)
+        assert csv_file.read_bytes() == original
+
+
+class TestAnalysisState:
+    """Tests for the saved analysis state and month checksums"""
+
+    def test_month_crcs_change_only_for_edited_month(self, tmp_path):
+        """Test a restated day changes its month's checksum and no other"""
+        from cache_files import read_series, series_month_crcs
+        csv_file = tmp_path / 'rounds.csv'
+        rows = [('20240131', 5), ('20240201', 6), ('20240202', 7), ('20240301', 8)]
+        write_cache(csv_file, rows)
+        before = series_month_crcs(read_series(str(csv_file)))
+
+        rows[2] = ('20240202', 70)
+        write_cache(csv_file, rows)
+        after = series_month_crcs(read_series(str(csv_file)))
+
+        assert sorted(before) == ['202401', '202402', '202403']
+        assert [m for m in before if before[m] != after[m]] == ['202402']
+
+        write_cache(csv_file, rows + [('20240301', 9)])
+        assert series_month_crcs(read_series(str(csv_file))) is None
+
+    def test_state_round_trip_and_version_check(self, tmp_path):
+        """Test the state reads back, and other versions are ignored"""
+        import json
+        from cache_files import analysis_path, read_analysis_state, write_analysis_state
+        csv_file = str(tmp_path / 'rounds.csv')
+        assert read_analysis_state(csv_file) is None
+
+        write_analysis_state(csv_file, {'anomalies': ['20240102']})
+        assert read_analysis_state(csv_file)['anomalies'] == ['20240102']
+
+        with open(analysis_path(csv_file), 'w') as f:
+            json.dump({'version': -1, 'anomalies': []}, f)
+        assert read_analysis_state(csv_file) is None
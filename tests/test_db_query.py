@@ -0,0 +1,799 @@
+"""
+Tests for the EZLinksRoundsDB query layer
+"""
+import csv
+import pytest
+from unittest.mock import MagicMock
+
+
+def make_cursor(rows):
+    """Create a mock cursor whose fetchmany() pages through rows"""
+    cursor = MagicMock()
+    remaining = list(rows)
+
+    def fetchmany(size):
+        batch = remaining[:size]
+        del remaining[:size]
+        return batch
+
+    cursor.fetchmany.side_effect = fetchmany
+    return cursor
+
+
+def make_db(rows, **kwargs):
+    """Create an EZLinksRoundsDB wired to a mock connection"""
+    from db_query import EZLinksRoundsDB, ConnectionPool
+    db = EZLinksRoundsDB('server', 'database', **kwargs)
+    cursor = make_cursor(rows)
+    db.connection = MagicMock()
+    db.connection.cursor.return_value = cursor
+    db.pool = ConnectionPool(lambda: db.connection, 1, initial=[db.connection])
+    return db, cursor
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        return [(row['playdatekey'], int(row['count'])) for row in csv.DictReader(f)]
+
+
+class TestStreamingFetch:
+    """Tests for fetchmany-based streaming"""
+
+    def test_iter_rounds_data_uses_fetchmany_batches(self):
+        """Test rows are pulled in fetch_batch_size batches"""
+        rows = [(20240100 + d, d * 10) for d in range(1, 8)]
+        db, cursor = make_db(rows, fetch_batch_size=3)
+
+        result = list(db.iter_rounds_data('t'))
+
+        assert [r['playdatekey'] for r in result] == [str(r[0]) for r in rows]
+        assert all(call.args == (3,) for call in cursor.fetchmany.call_args_list)
+        # 3 full batches (3+3+1) plus the empty batch that ends the stream
+        assert cursor.fetchmany.call_count == 4
+
+    def test_query_rounds_data_returns_list(self):
+        """Test the list API still materializes every row"""
+        db, _ = make_db([(20240101, 5), (20240102, 6)])
+
+        assert db.query_rounds_data('t') == [
+            {'playdatekey': '20240101', 'count': 5},
+            {'playdatekey': '20240102', 'count': 6},
+        ]
+
+    def test_refresh_full_csv_streams_into_file(self, tmp_path):
+        """Test full refresh writes every streamed row"""
+        csv_file = str(tmp_path / 'rounds.csv')
+        db, _ = make_db([(20240101, 5), (20240102, 6)], fetch_batch_size=1)
+
+        db.refresh_full_csv('t', csv_file=csv_file)
+
+        assert read_csv(csv_file) == [('20240101', 5), ('20240102', 6)]
+
+    def test_failed_refresh_keeps_existing_cache(self, tmp_path):
+        """Test a query error mid-stream does not truncate the cache"""
+        import pyodbc
+        csv_file = tmp_path / 'rounds.csv'
+        csv_file.write_text('playdatekey,count\n20240101,5\n')
+        db, cursor = make_db([])
+        cursor.fetchmany.side_effect = [[(20240101, 7)], pyodbc.Error('timeout')]
+
+        db.refresh_full_csv('t', csv_file=str(csv_file))
+
+        assert read_csv(str(csv_file)) == [('20240101', 5)]
+        assert not (tmp_path / 'rounds.csv.tmp').exists()
+
+    def test_unexpected_error_removes_temp_file(self, tmp_path):
+        """Test any other exception mid-stream propagates without leaving the temp file"""
+        from db_query import EZLinksRoundsDB
+        csv_file = tmp_path / 'rounds.csv'
+        csv_file.write_text('playdatekey,count\n20240101,5\n')
+        db = EZLinksRoundsDB('server', 'database')
+
+        def rows():
+            yield {'playdatekey': '20240101', 'count': 7}
+            raise ValueError('bad row')
+
+        with pytest.raises(ValueError):
+            db.export_to_csv(rows(), str(csv_file))
+
+        assert read_csv(str(csv_file)) == [('20240101', 5)]
+        assert not (tmp_path / 'rounds.csv.tmp').exists()
+        assert db.stale_caches == {str(csv_file)}
+
+    def test_update_csv_appends_and_skips_duplicate_date(self, tmp_path):
+        """Test incremental update drops the already-cached first date"""
+        csv_file = tmp_path / 'rounds.csv'
+        csv_file.write_text('playdatekey,count\n20240101,5\n')
+        db, _ = make_db([(20240101, 5), (20240102, 6)])
+
+        db.update_csv('t', csv_file=str(csv_file))
+
+        assert read_csv(str(csv_file)) == [('20240101', 5), ('20240102', 6)]
+
+    def test_update_csv_keeps_manifest_current(self, tmp_path):
+        """Test appends extend the manifest instead of leaving it stale"""
+        from cache_files import build_manifest, read_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        csv_file.write_text('playdatekey,count\n20240101,5\n')
+        db, _ = make_db([(20240101, 5), (20240102, 6)])
+
+        db.update_csv('t', csv_file=str(csv_file))
+
+        assert read_manifest(str(csv_file)) == build_manifest(str(csv_file))
+
+    def test_failed_append_is_rolled_back(self, tmp_path):
+        """Test a query error mid-append restores the cache and its manifest"""
+        import pyodbc
+        from cache_files import build_manifest, read_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        csv_file.write_text('playdatekey,count\n20240101,5\n')
+        db, cursor = make_db([])
+        cursor.fetchmany.side_effect = [[(20240101, 5), (20240102, 6)], pyodbc.Error('reset')]
+
+        db.update_csv('t', csv_file=str(csv_file))
+
+        assert read_csv(str(csv_file)) == [('20240101', 5)]
+        assert read_manifest(str(csv_file)) == build_manifest(str(csv_file))
+        assert not (tmp_path / 'rounds.csv.journal').exists()
+        assert str(csv_file) in db.stale_caches
+
+    def test_update_csv_refreshes_binary_mirror(self, tmp_path):
+        """Test appends rewrite the binary mirror to match the CSV"""
+        from cache_files import load_series_mirror, read_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        csv_file.write_text('playdatekey,count\n20240101,5\n')
+        db, _ = make_db([(20240101, 5), (20240102, 6)])
+
+        db.update_csv('t', csv_file=str(csv_file))
+
+        series = load_series_mirror(str(csv_file), read_manifest(str(csv_file)))
+        assert list(series.dates) == [20240101, 20240102]
+        assert list(series.counts) == [5, 6]
+
+
+class TestConnectionPool:
+    """Tests for the bounded connection pool"""
+
+    def test_pool_reuses_idle_connections(self):
+        """Test released connections are handed out again"""
+        from db_query import ConnectionPool
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        pool = ConnectionPool(factory, max_size=2)
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        assert first is second
+        assert factory.call_count == 1
+
+    def test_pool_caps_open_connections(self):
+        """Test acquire blocks once max_size connections are checked out"""
+        import threading
+        from db_query import ConnectionPool
+        pool = ConnectionPool(MagicMock, max_size=2)
+        held = [pool.acquire(), pool.acquire()]
+
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: (pool.acquire(), acquired.set()))
+        thread.start()
+        assert not acquired.wait(0.1)
+
+        pool.release(held[0])
+        assert acquired.wait(1)
+        thread.join()
+
+    def test_close_all_closes_every_connection(self):
+        """Test disconnect closes connections opened by the pool"""
+        from db_query import ConnectionPool
+        pool = ConnectionPool(MagicMock, max_size=2)
+        conns = [pool.acquire(), pool.acquire()]
+
+        pool.close_all()
+
+        for conn in conns:
+            conn.close.assert_called_once()
+
+
+class TestParameterizedQueries:
+    """Tests for ?-parameter date filters"""
+
+    def test_date_filters_are_bound_not_interpolated(self):
+        """Test the WHERE clause uses markers and typed parameters"""
+        from db_query import EZLinksRoundsDB
+        db = EZLinksRoundsDB('server', 'database')
+
+        query, params = db.build_rounds_query(
+            'N/A', 'playdatekey', 'rounds_total',
+            start_date='20240101', end_date='20241231',
+            filtered_query="SELECT {date_column} FROM t WHERE {where_clause} GROUP BY {date_column}",
+            date_param_type='int'
+        )
+
+        assert query == ("SELECT playdatekey FROM t WHERE playdatekey >= ? AND playdatekey <= ? "
+                         "GROUP BY playdatekey ORDER BY playdatekey")
+        assert params == [20240101, 20241231]
+
+    def test_statement_text_is_stable_across_dates(self):
+        """Test different date ranges reuse one statement text"""
+        db, cursor = make_db([])
+
+        db.query_rounds_data('t', start_date='20240101')
+        db.query_rounds_data('t', start_date='20250101')
+
+        assert db.statement_stats() == (1, 2)
+        assert cursor.execute.call_args_list[1].args[1] == ['20250101']
+
+    @pytest.mark.parametrize('param_type,expected', [
+        ('str', '20240131'),
+        ('int', 20240131),
+    ])
+    def test_bind_date_param(self, param_type, expected):
+        """Test date strings convert to the configured parameter type"""
+        from db_query import bind_date_param
+        assert bind_date_param('20240131', param_type) == expected
+
+    def test_bind_date_param_as_date(self):
+        """Test both date formats bind to datetime.date"""
+        from datetime import date
+        from db_query import bind_date_param
+        assert bind_date_param('2024-01-31', 'date') == date(2024, 1, 31)
+        assert bind_date_param('20240131', 'date') == date(2024, 1, 31)
+
+
+def make_range_db(rows, fail_windows=()):
+    """Create an EZLinksRoundsDB whose mock cursor honours date parameters"""
+    import pyodbc
+    from db_query import EZLinksRoundsDB, ConnectionPool
+    db = EZLinksRoundsDB('server', 'database')
+    executed = []
+
+    def cursor_factory():
+        cursor = MagicMock()
+        remaining = []
+
+        def execute(query, params=()):
+            executed.append(tuple(params))
+            if tuple(params) in fail_windows:
+                raise pyodbc.Error('connection reset')
+            start, end = params
+            remaining[:] = [r for r in rows if start <= str(r[0]) <= end]
+
+        def fetchmany(size):
+            batch = remaining[:size]
+            del remaining[:size]
+            return batch
+
+        cursor.execute.side_effect = execute
+        cursor.fetchmany.side_effect = fetchmany
+        return cursor
+
+    db.connection = MagicMock()
+    db.connection.cursor.side_effect = cursor_factory
+    db.pool = ConnectionPool(lambda: db.connection, 1, initial=[db.connection])
+    return db, executed
+
+
+class TestBackfill:
+    """Tests for chunked, resumable backfills"""
+
+    def test_split_date_range_by_month(self):
+        """Test month windows follow calendar months and clip to the range"""
+        from db_query import split_date_range
+        assert split_date_range('20240115', '20240310', 'month') == [
+            ('20240115', '20240131'),
+            ('20240201', '20240229'),
+            ('20240301', '20240310'),
+        ]
+
+    def test_split_date_range_by_week(self):
+        """Test week windows run Monday to Sunday"""
+        from db_query import split_date_range
+        assert split_date_range('2024-01-03', '2024-01-16', 'week') == [
+            ('20240103', '20240107'),
+            ('20240108', '20240114'),
+            ('20240115', '20240116'),
+        ]
+
+    def test_backfill_resumes_after_failed_window(self, tmp_path):
+        """Test a rerun only pulls windows that were not checkpointed"""
+        from datetime import date, timedelta
+        days = [date(2024, 1, 1) + timedelta(days=i) for i in range(90)]
+        rows = [(int(d.strftime('%Y%m%d')), i) for i, d in enumerate(days)]
+        csv_file = str(tmp_path / 'rounds.csv')
+
+        db, executed = make_range_db(rows, fail_windows={('20240201', '20240229')})
+        assert db.backfill_csv(csv_file, '20240101', '20240330', 'month', table_name='t') is False
+        assert not (tmp_path / 'rounds.csv').exists()
+
+        db, executed = make_range_db(rows)
+        assert db.backfill_csv(csv_file, '20240101', '20240330', 'month', table_name='t') is True
+
+        assert executed == [('20240201', '20240229')]
+        assert read_csv(csv_file) == [(str(d), c) for d, c in rows]
+        assert not (tmp_path / 'rounds.csv.backfill').exists()
+
+    def test_backfill_discards_checkpoint_for_different_range(self, tmp_path):
+        """Test checkpoints from another backfill plan are not reused"""
+        rows = [(20240101, 1), (20240201, 2)]
+        csv_file = str(tmp_path / 'rounds.csv')
+        checkpoint = tmp_path / 'rounds.csv.backfill'
+        checkpoint.mkdir()
+        (checkpoint / 'plan.json').write_text('{"window": "week"}')
+        (checkpoint / '20240101_20240131.csv').write_text('20240101,999\n')
+
+        db, _ = make_range_db(rows)
+        db.backfill_csv(csv_file, '20240101', '20240229', 'month', table_name='t')
+
+        assert read_csv(csv_file) == [('20240101', 1), ('20240201', 2)]
+
+
+class TestFusedQueries:
+    """Tests for running fused queries once and fanning rows out"""
+
+    def make_group(self, tmp_path):
+        from collections import OrderedDict
+        return {
+            'name': 'ezl+gn',
+            'fused': True,
+            'fuse_column': 'k',
+            'fuse_integer': True,
+            'members': OrderedDict([
+                (34, {'name': 'ezl', 'csv_file': str(tmp_path / 'ezl.csv')}),
+                (1, {'name': 'gn', 'csv_file': str(tmp_path / 'gn.csv')}),
+            ]),
+            'date_column': 'playdatekey',
+            'count_column': 'rounds_total',
+            'base_query': 'SELECT k, playdatekey, n FROM t GROUP BY k, playdatekey',
+            'filtered_query': 'SELECT k, playdatekey, n FROM t WHERE {where_clause} GROUP BY k, playdatekey',
+            'order_by': None,
+            'date_param_type': 'str',
+        }
+
+    def test_refresh_fused_csvs_fans_rows_out(self, tmp_path):
+        """Test one statement fills every member cache"""
+        rows = [(34, 20240101, 5), (1, 20240101, 50), (34, 20240102, 6), (1, 20240102, 60)]
+        db, cursor = make_db(rows)
+
+        db.refresh_fused_csvs(self.make_group(tmp_path))
+
+        assert cursor.execute.call_count == 1
+        assert read_csv(str(tmp_path / 'ezl.csv')) == [('20240101', 5), ('20240102', 6)]
+        assert read_csv(str(tmp_path / 'gn.csv')) == [('20240101', 50), ('20240102', 60)]
+
+    def test_driver_forms_of_the_value_are_routed(self, tmp_path):
+        """Test rows route by value, not by the literal's text"""
+        from decimal import Decimal
+        rows = [(Decimal('34'), 20240101, 5), ('01', 20240101, 50), (34.0, 20240102, 6)]
+        db, _ = make_db(rows)
+
+        db.refresh_fused_csvs(self.make_group(tmp_path))
+
+        assert read_csv(str(tmp_path / 'ezl.csv')) == [('20240101', 5), ('20240102', 6)]
+        assert read_csv(str(tmp_path / 'gn.csv')) == [('20240101', 50)]
+
+    def test_unrouted_rows_fail_the_group(self, tmp_path, capsys):
+        """Test a row matching no member marks every member stale instead of vanishing"""
+        rows = [(34, 20240101, 5), (1, 20240101, 50), (7, 20240101, 70)]
+        db, _ = make_db(rows)
+
+        db.refresh_fused_csvs(self.make_group(tmp_path))
+
+        assert 'matched no k member: 7 (1 rows)' in capsys.readouterr().out
+        assert not (tmp_path / 'ezl.csv').exists()
+        assert db.stale_caches == {str(tmp_path / 'ezl.csv'), str(tmp_path / 'gn.csv')}
+
+    def test_update_fused_csvs_respects_each_watermark(self, tmp_path):
+        """Test each member only appends rows after its own latest date"""
+        (tmp_path / 'ezl.csv').write_text('playdatekey,count\n20240101,5\n20240102,6\n')
+        (tmp_path / 'gn.csv').write_text('playdatekey,count\n20240101,50\n')
+        rows = [(34, 20240101, 5), (1, 20240101, 50), (34, 20240102, 6),
+                (1, 20240102, 60), (34, 20240103, 7), (1, 20240103, 70)]
+        db, cursor = make_db(rows)
+
+        db.update_fused_csvs(self.make_group(tmp_path))
+
+        # Fused pull starts from the earliest member watermark
+        assert cursor.execute.call_args.args[1] == ['20240101']
+        assert read_csv(str(tmp_path / 'ezl.csv')) == [('20240101', 5), ('20240102', 6), ('20240103', 7)]
+        assert read_csv(str(tmp_path / 'gn.csv')) == [('20240101', 50), ('20240102', 60), ('20240103', 70)]
+
+
+class TestTrailingUpsert:
+    """Tests for the trailing-window upsert mode"""
+
+    def test_trailing_window_upserts_late_data(self, tmp_path, capsys):
+        """Test restated recent counts are corrected and reported"""
+        from cache_files import build_manifest, read_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        csv_file.write_text('playdatekey,count\n20240101,5\n20240102,6\n20240103,7\n')
+        db, cursor = make_db([(20240102, 60), (20240103, 7), (20240104, 8)])
+
+        db.update_csv('t', csv_file=str(csv_file), trailing_days=2)
+
+        assert cursor.execute.call_args.args[1] == ['20240101']
+        assert read_csv(str(csv_file)) == [('20240101', 5), ('20240102', 60),
+                                           ('20240103', 7), ('20240104', 8)]
+        assert read_manifest(str(csv_file)) == build_manifest(str(csv_file))
+        out = capsys.readouterr().out
+        assert '1 new, 1 changed' in out
+        assert 'Changed 20240102: 6 -> 60' in out
+
+    def test_upsert_keeps_cached_dates_missing_from_fetch(self, tmp_path):
+        """Test upsert never deletes cached rows"""
+        from cache_files import build_manifest
+        csv_file = tmp_path / 'rounds.csv'
+        csv_file.write_text('playdatekey,count\n20240101,5\n20240102,6\n')
+        db, _ = make_db([])
+
+        report = db.upsert_csv_rows(str(csv_file), build_manifest(str(csv_file)), '20240101',
+                                    [{'playdatekey': '20240103', 'count': 7}])
+
+        assert report == {'changed': [], 'added': ['20240103']}
+        assert read_csv(str(csv_file)) == [('20240101', 5), ('20240102', 6), ('20240103', 7)]
+
+    def test_compressed_cache_is_appended_and_upserted(self, tmp_path):
+        """Test update_csv appends and upserts through a gzip cache"""
+        from cache_files import build_manifest, open_cache, read_manifest
+        csv_file = str(tmp_path / 'rounds.csv.gz')
+        with open_cache(csv_file, 'w') as f:
+            f.write('playdatekey,count\r\n20240101,5\r\n20240102,6\r\n')
+        db, _ = make_db([(20240103, 7)])
+        db.update_csv('t', csv_file=csv_file)
+
+        db, _ = make_db([(20240102, 60), (20240103, 7), (20240104, 8)])
+        db.update_csv('t', csv_file=csv_file, trailing_days=2)
+
+        with open_cache(csv_file) as f:
+            assert f.read() == ('playdatekey,count\r\n20240101,5\r\n20240102,60\r\n'
+                                '20240103,7\r\n20240104,8\r\n')
+        assert read_manifest(csv_file) == build_manifest(csv_file)
+
+    def test_shift_date_key_keeps_format(self):
+        """Test trailing start dates keep the cache's date format"""
+        from db_query import shift_date_key
+        assert shift_date_key('20240301', -14) == '20240216'
+        assert shift_date_key('2024-03-01', -1) == '2024-02-29'
+
+
+class TestColumnarFetch:
+    """Tests for the array-backed fetch path"""
+
+    def test_query_rounds_columns_fills_arrays(self):
+        """Test fetchmany batches are appended to typed arrays"""
+        db, _ = make_db([(20240101, 5), (20240102, 6), (20240103, 7)], fetch_batch_size=2)
+
+        series = db.query_rounds_columns('t')
+
+        assert list(series.dates) == [20240101, 20240102, 20240103]
+        assert list(series.counts) == [5, 6, 7]
+
+    def test_export_to_csv_accepts_columns(self, tmp_path):
+        """Test the CSV writer consumes arrays directly"""
+        from cache_files import SeriesColumns
+        db, _ = make_db([])
+        series = SeriesColumns()
+        series.extend_rows([(20240101, 5), (20240102, 6)])
+
+        assert db.export_to_csv(series, str(tmp_path / 'rounds.csv')) == 2
+        assert read_csv(str(tmp_path / 'rounds.csv')) == [('20240101', 5), ('20240102', 6)]
+
+
+class TestResultCache:
+    """Tests for the disk-backed statement result cache"""
+
+    def make_cached_db(self, tmp_path, rows, **cache_args):
+        from db_query import ResultCache
+        cache_args.setdefault('default_ttl', 3600)
+        cache = ResultCache(str(tmp_path / 'cache'), **cache_args)
+        db, cursor = make_db(rows, result_cache=cache)
+        return db, cursor, cache
+
+    def test_repeated_statement_is_served_from_cache(self, tmp_path):
+        """Test a second identical pull replays the stored rows without executing"""
+        rows = [(20240101, 5), (20240102, 6)]
+        db, cursor, cache = self.make_cached_db(tmp_path, rows)
+
+        first = db.query_rounds_data('t', start_date='20240101')
+        second = db.query_rounds_data('t', start_date='20240101')
+
+        assert first == second and len(first) == 2
+        assert cursor.execute.call_count == 1
+        assert cache.stats() == (1, 1)
+
+    def test_key_includes_parameters_and_ignores_formatting(self):
+        """Test parameters (and their types) change the key but whitespace does not"""
+        from db_query import ResultCache, normalize_sql
+
+        key = ResultCache.make_key('SELECT a\n  FROM t WHERE d >= ?', [20240101])
+        assert key == ResultCache.make_key('SELECT a FROM t WHERE d >= ?', [20240101])
+        assert key != ResultCache.make_key('SELECT a FROM t WHERE d >= ?', ['20240101'])
+        assert key != ResultCache.make_key('SELECT a FROM t WHERE d >= ?', [20240102])
+        assert normalize_sql("SELECT  'a  b'   FROM t") == "SELECT 'a  b' FROM t"
+
+    def test_expired_entry_is_refetched(self, tmp_path):
+        """Test entries older than the query's TTL are misses"""
+        db, cursor, cache = self.make_cached_db(tmp_path, [(20240101, 5)])
+        db.query_rounds_data('t')
+        for entry in cache._index.values():
+            entry['created'] -= 120
+
+        db.query_rounds_data('t', cache_ttl=60)
+
+        assert cursor.execute.call_count == 2
+        assert cache.stats() == (0, 2)
+
+    def test_zero_ttl_bypasses_cache(self, tmp_path):
+        """Test cache_ttl=0 neither reads nor writes the cache"""
+        db, cursor, cache = self.make_cached_db(tmp_path, [(20240101, 5)])
+
+        db.query_rounds_data('t', cache_ttl=0)
+
+        assert cache.stats() == (0, 0)
+        assert cache._index == {}
+
+    def test_cache_is_opt_in_by_default(self, tmp_path):
+        """Test the default TTL neither reads nor writes the cache unless a query sets one"""
+        from db_query import DEFAULT_CACHE_TTL
+        db, cursor, cache = self.make_cached_db(tmp_path, [(20240101, 5)],
+                                                default_ttl=DEFAULT_CACHE_TTL)
+
+        db.query_rounds_data('t')
+        db.query_rounds_data('t')
+
+        assert cursor.execute.call_count == 2
+        assert cache._index == {}
+
+    def test_entries_are_plain_data(self, tmp_path):
+        """Test dates and decimals round-trip through JSON entries and pickles are never read"""
+        import gzip
+        import pickle
+        from datetime import date
+        from decimal import Decimal
+        rows = [(date(2024, 1, 1), Decimal('5.50'), 'x')]
+        db, cursor, cache = self.make_cached_db(tmp_path, rows)
+
+        list(db._iter_rows('SELECT d, c, s FROM t', []))
+        replayed = list(db._iter_rows('SELECT d, c, s FROM t', []))
+
+        assert replayed == rows
+        assert cache.stats() == (1, 1)
+        entry = next((tmp_path / 'cache').glob('*.jsonl.gz'))
+        assert gzip.open(entry, 'rt').read().startswith('[[{"date": "2024-01-01"}')
+
+        # A pickle planted under the old entry name is deleted unread
+        planted = tmp_path / 'cache' / 'planted.pkl.gz'
+        with gzip.open(planted, 'wb') as f:
+            pickle.dump([], f)
+        type(cache)(str(tmp_path / 'cache'))
+        assert not planted.exists()
+
+    def test_hit_does_not_rewrite_index(self, tmp_path):
+        """Test the index is written when entries are stored, not on every hit"""
+        db, cursor, cache = self.make_cached_db(tmp_path, [(20240101, 5)])
+        db.query_rounds_data('t')
+        index = tmp_path / 'cache' / 'index.json'
+        written = index.read_text()
+        index.unlink()
+
+        db.query_rounds_data('t')
+
+        assert cache.stats() == (1, 1)
+        assert not index.exists()
+        assert 'last_used' in written
+
+    def test_incremental_update_bypasses_cache(self, tmp_path):
+        """Test update_csv always pulls from the warehouse, even with a TTL set"""
+        db, cursor, cache = self.make_cached_db(tmp_path, [(20240101, 5)])
+        csv_file = str(tmp_path / 'rounds.csv')
+
+        db.update_csv('t', csv_file)
+
+        assert cache.stats() == (0, 0)
+        assert cache._index == {}
+
+    def test_least_recently_used_entries_are_evicted(self, tmp_path):
+        """Test the cache stays under max_bytes by dropping the least recently used entry"""
+        db, cursor, cache = self.make_cached_db(tmp_path, [])
+        keys = {}
+        for day in ('20240101', '20240102'):
+            db.query_rounds_data('t', start_date=day)
+            keys[day] = cache.make_key(*db.build_rounds_query('t', start_date=day))
+        db.query_rounds_data('t', start_date='20240101')  # touch the first entry
+
+        cache.max_bytes = sum(entry['size'] for entry in cache._index.values())
+        db.query_rounds_data('t', start_date='20240103')
+
+        assert keys['20240101'] in cache._index
+        assert keys['20240102'] not in cache._index
+
+    def test_abandoned_fetch_is_not_stored(self, tmp_path):
+        """Test a partially consumed stream leaves no entry behind"""
+        db, cursor, cache = self.make_cached_db(tmp_path, [(20240101, 5), (20240102, 6)])
+
+        rows = db.iter_rounds_data('t', batch_size=1)
+        next(rows)
+        rows.close()
+
+        assert cache._index == {}
+        assert list((tmp_path / 'cache').glob('*.tmp')) == []
+
+
+class TestCancellation:
+    """Tests for statement timeouts, cancellation and stale caches"""
+
+    def test_statement_timeout_is_set_per_statement(self):
+        """Test the query's timeout is applied to the connection, and cleared after"""
+        db, _ = make_db([(20240101, 5)])
+
+        db.query_rounds_data('t', statement_timeout=30)
+        assert db.connection.timeout == 30
+
+        db.query_rounds_data('t')
+        assert db.connection.timeout == 0
+
+    def test_cancel_aborts_in_flight_cursor_and_refuses_new_statements(self):
+        """Test cancel() reaches the running cursor and later pulls fail fast"""
+        from db_query import QueryCancelled
+        db, cursor = make_db([(20240100 + d, d) for d in range(1, 10)], fetch_batch_size=2)
+
+        rows = db.iter_rounds_data('t')
+        next(rows)
+        db.cancel()
+
+        cursor.cancel.assert_called_once()
+        with pytest.raises(QueryCancelled):
+            list(rows)
+        with pytest.raises(QueryCancelled):
+            list(db.iter_rounds_data('t'))
+        assert db._active_cursors == set()
+
+    def test_failed_refresh_marks_cache_stale(self, tmp_path):
+        """Test a cancelled refresh keeps the old cache and records it as stale"""
+        db, _ = make_db([(20240101, 5)])
+        csv_file = str(tmp_path / 'rounds.csv')
+        db.refresh_full_csv('t', csv_file)
+        db.cancel()
+
+        db.refresh_full_csv('t', csv_file)
+
+        assert read_csv(csv_file) == [('20240101', 5)]
+        assert db.stale_caches == {csv_file}
+
+
+class TestMonthChecksums:
+    """Tests for checksum-driven refreshes that re-pull only changed months"""
+
+    CHECKSUM_QUERY = "SELECT playdatekey / 100, CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM t GROUP BY playdatekey / 100"
+
+    def make_warehouse_db(self, warehouse, **kwargs):
+        """EZLinksRoundsDB over a mock warehouse {date: count} that answers checksum queries"""
+        from db_query import EZLinksRoundsDB, ConnectionPool
+        db = EZLinksRoundsDB('server', 'database', **kwargs)
+        executed = []
+
+        def cursor_factory():
+            cursor = MagicMock()
+            remaining = []
+
+            def execute(query, params=()):
+                executed.append(tuple(params))
+                if 'CHECKSUM' in query:
+                    months = {}
+                    for date, count in sorted(warehouse.items()):
+                        months.setdefault(date // 100, []).append((date, count))
+                    remaining[:] = [(m, hash(tuple(rows))) for m, rows in months.items()]
+                else:
+                    start, end = (params or ('0', '99999999'))
+                    remaining[:] = [(d, c) for d, c in sorted(warehouse.items())
+                                    if start <= str(d) <= end]
+
+            def fetchmany(size):
+                batch = remaining[:size]
+                del remaining[:size]
+                return batch
+
+            cursor.execute.side_effect = execute
+            cursor.fetchmany.side_effect = fetchmany
+            return cursor
+
+        db.connection = MagicMock()
+        db.connection.cursor.side_effect = cursor_factory
+        db.pool = ConnectionPool(lambda: db.connection, 1, initial=[db.connection])
+        return db, executed
+
+    def test_only_changed_months_are_pulled(self, tmp_path):
+        """Test a restated month is re-pulled and spliced in, other months untouched"""
+        warehouse = {20240115: 1, 20240215: 2, 20240315: 3, 20240415: 4}
+        db, executed = self.make_warehouse_db(warehouse)
+        csv_file = str(tmp_path / 'rounds.csv')
+
+        db.refresh_full_csv('t', csv_file, checksum_query=self.CHECKSUM_QUERY)
+        assert read_csv(csv_file) == [(str(d), c) for d, c in sorted(warehouse.items())]
+
+        warehouse[20240216] = 20
+        warehouse[20240315] = 30
+        del executed[:]
+        db.refresh_full_csv('t', csv_file, checksum_query=self.CHECKSUM_QUERY)
+
+        # Checksum statement, then one statement for the adjacent Feb-Mar run
+        assert executed == [(), ('20240201', '20240331')]
+        assert read_csv(csv_file) == [('20240115', 1), ('20240215', 2), ('20240216', 20),
+                                      ('20240315', 30), ('20240415', 4)]
+
+    def test_kept_months_are_streamed(self, tmp_path, monkeypatch):
+        """Test the unchanged months are read from the cache as they are written out"""
+        warehouse = {20240115: 1, 20240215: 2, 20240315: 3}
+        db, _ = self.make_warehouse_db(warehouse)
+        csv_file = str(tmp_path / 'rounds.csv')
+        db.refresh_full_csv('t', csv_file, checksum_query=self.CHECKSUM_QUERY)
+        warehouse[20240215] = 20
+
+        read = []
+        read_cache_rows = db._read_cache_rows
+        export_to_csv = db.export_to_csv
+
+        def counting_rows(path):
+            for row in read_cache_rows(path):
+                read.append(row)
+                yield row
+
+        def export(rows, path):
+            assert read == []
+            return export_to_csv(rows, path)
+
+        monkeypatch.setattr(db, '_read_cache_rows', counting_rows)
+        monkeypatch.setattr(db, 'export_to_csv', export)
+        db.refresh_full_csv('t', csv_file, checksum_query=self.CHECKSUM_QUERY)
+
+        assert len(read) == 3
+        assert read_csv(csv_file) == [('20240115', 1), ('20240215', 20), ('20240315', 3)]
+
+    def test_unchanged_warehouse_pulls_nothing(self, tmp_path, capsys):
+        """Test a refresh with matching checksums runs only the checksum statement"""
+        db, executed = self.make_warehouse_db({20240115: 1, 20240215: 2})
+        csv_file = str(tmp_path / 'rounds.csv')
+        db.refresh_full_csv('t', csv_file, checksum_query=self.CHECKSUM_QUERY)
+        del executed[:]
+
+        db.refresh_full_csv('t', csv_file, checksum_query=self.CHECKSUM_QUERY)
+
+        assert executed == [()]
+        assert 'months unchanged' in capsys.readouterr().out
+
+    def test_vanished_month_is_dropped(self, tmp_path):
+        """Test a month that no longer exists in the warehouse is removed from the cache"""
+        warehouse = {20240115: 1, 20240215: 2}
+        db, _ = self.make_warehouse_db(warehouse)
+        csv_file = str(tmp_path / 'rounds.csv')
+        db.refresh_full_csv('t', csv_file, checksum_query=self.CHECKSUM_QUERY)
+
+        del warehouse[20240215]
+        db.refresh_full_csv('t', csv_file, checksum_query=self.CHECKSUM_QUERY)
+
+        assert read_csv(csv_file) == [('20240115', 1)]
+
+    def test_restatement_within_cache_ttl_is_pulled_fresh(self, tmp_path):
+        """Test changed months bypass the result cache rather than replaying stale rows"""
+        from db_query import ResultCache
+        warehouse = {20240115: 1, 20240215: 2}
+        cache = ResultCache(str(tmp_path / 'cache'), default_ttl=3600)
+        db, executed = self.make_warehouse_db(warehouse, result_cache=cache)
+        csv_file = str(tmp_path / 'rounds.csv')
+        db.refresh_full_csv('t', csv_file, checksum_query=self.CHECKSUM_QUERY, cache_ttl=3600)
+
+        # The same month restated twice within the TTL is pulled by the same statement
+        for count in (115, 215):
+            warehouse[20240215] = count
+            db.refresh_full_csv('t', csv_file, checksum_query=self.CHECKSUM_QUERY, cache_ttl=3600)
+
+        assert read_csv(csv_file) == [('20240115', 1), ('20240215', 215)]
+        assert cache.stats() == (0, 0)
+
+    def test_month_date_ranges_merge_consecutive_months(self):
+        """Test adjacent months share one range, across a year boundary"""
+        from db_query import month_date_ranges
+
+        assert month_date_ranges(['202312', '202401', '202403']) == [
+            ('20231201', '20240131'), ('20240301', '20240331')]
@@ -0,0 +1,379 @@
+"""
+Tests for year-over-year anomaly analysis
+"""
+import os
+from datetime import datetime, timedelta
+import pytest
+
+
+def write_series(path, start, counts, fmt='%Y%m%d'):
+    """Write a daily CSV cache starting at `start`"""
+    lines = ['playdatekey,count']
+    for i, count in enumerate(counts):
+        lines.append(f"{(start + timedelta(days=i)).strftime(fmt)},{count}")
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def two_year_counts(drop_day=None):
+    """Two years of steady counts, optionally with one collapsed day"""
+    counts = [1000] * 731
+    if drop_day is not None:
+        counts[drop_day] = 100
+    return counts
+
+
+class TestAnalyzeCsv:
+    """Tests for analyze_csv"""
+
+    def test_flags_year_over_year_drop(self, tmp_path):
+        """Test a >50% drop against the prior-year same weekday is flagged"""
+        from past_low_anomalies import analyze_csv
+        csv_file = write_series(tmp_path / 'r.csv', datetime(2024, 1, 1), two_year_counts(400))
+
+        anomalies = analyze_csv(csv_file, 'q', 'd', 'c', threshold_min=50,
+                                today=datetime(2026, 1, 1), min_date=datetime(2025, 1, 1))
+
+        assert [a['date_str'] for a in anomalies] == ['20250204']
+        assert anomalies[0]['prior_year_date'] == '20240206'
+        assert anomalies[0]['yoy_pct'] == -90.0
+        assert anomalies[0]['day_name'] == 'Tuesday'
+
+    def test_flags_below_minimum(self, tmp_path):
+        """Test counts under threshold_min are flagged with prior-year context"""
+        from past_low_anomalies import analyze_csv
+        csv_file = write_series(tmp_path / 'r.csv', datetime(2024, 1, 1), two_year_counts(400),
+                                fmt='%Y-%m-%d')
+
+        anomalies = analyze_csv(csv_file, 'q', 'd', 'c', threshold_min=500,
+                                today=datetime(2026, 1, 1), min_date=datetime(2025, 1, 1))
+
+        assert len(anomalies) == 1
+        assert anomalies[0]['reason'] == 'Below minimum threshold'
+        assert anomalies[0]['prior_year_count'] == 1000
+
+    def test_unsorted_csv_keeps_every_day_in_range(self, tmp_path):
+        """Test a cache without a manifest isn't cut as if it were sorted"""
+        from past_low_anomalies import analyze_csv
+        csv_file = tmp_path / 'r.csv'
+        csv_file.write_text('playdatekey,count\n20250105,100\n20230101,1000\n20250110,1000\n')
+
+        anomalies = analyze_csv(str(csv_file), 'q', 'd', 'c', threshold_min=500,
+                                today=datetime(2026, 1, 1), min_date=datetime(2025, 1, 1))
+
+        assert [a['date_str'] for a in anomalies] == ['20250105']
+
+    def test_series_argument_matches_csv(self, tmp_path):
+        """Test analyzing arrays gives the same result as reading the CSV"""
+        from cache_files import read_series
+        from past_low_anomalies import analyze_csv
+        csv_file = write_series(tmp_path / 'r.csv', datetime(2024, 1, 1), two_year_counts(500))
+        kwargs = dict(threshold_min=50, today=datetime(2026, 1, 1), min_date=datetime(2025, 1, 1))
+
+        from_csv = analyze_csv(csv_file, 'q', 'd', 'c', **kwargs)
+        from_series = analyze_csv(None, 'q', 'd', 'c', series=read_series(csv_file), **kwargs)
+
+        assert from_csv == from_series
+        assert len(from_csv) == 1
+
+    def test_series_store_matches_csv(self, tmp_path):
+        """Test analyzing from the consolidated store gives the same result"""
+        from cache_files import build_manifest, open_series_store, write_manifest, write_series_store
+        from past_low_anomalies import analyze_csv
+        csv_file = write_series(tmp_path / 'r.csv', datetime(2024, 1, 1), two_year_counts(500))
+        write_manifest(csv_file, build_manifest(csv_file))
+        kwargs = dict(threshold_min=50, today=datetime(2026, 1, 1), min_date=datetime(2025, 1, 1))
+        write_series_store(str(tmp_path / 'series.store'), {'q': csv_file})
+        store = open_series_store(str(tmp_path / 'series.store'))
+
+        from_store = analyze_csv(csv_file, 'q', 'd', 'c', store=store, **kwargs)
+
+        assert from_store == analyze_csv(csv_file, 'q', 'd', 'c', **kwargs)
+        assert len(from_store) == 1
+
+    def test_indexed_read_skips_old_history(self, tmp_path, capsys):
+        """Test rows over a year before min_date are never parsed"""
+        from cache_files import build_manifest, write_manifest
+        from past_low_anomalies import analyze_csv
+        counts = [1000] * 365 + two_year_counts(400)
+        csv_file = write_series(tmp_path / 'r.csv', datetime(2023, 1, 1), counts)
+        kwargs = dict(threshold_min=50, today=datetime(2026, 1, 1), min_date=datetime(2025, 1, 1))
+        expected = analyze_csv(csv_file, 'q', 'd', 'c', **kwargs)
+
+        # Corrupt a 2023 row; only a full read would trip over it
+        text = open(csv_file).read().replace('20230105,1000', '20230105,oops')
+        open(csv_file, 'w').write(text)
+        write_manifest(csv_file, build_manifest(csv_file))
+
+        assert analyze_csv(csv_file, 'q', 'd', 'c', **kwargs) == expected
+        assert 'ERROR' not in capsys.readouterr().out
+
+    def test_binary_mirror_matches_csv(self, tmp_path, capsys):
+        """Test the mapped mirror is used when current and gives the same result"""
+        from cache_files import build_manifest, write_manifest, write_series_mirror
+        from past_low_anomalies import analyze_csv
+        csv_file = write_series(tmp_path / 'r.csv', datetime(2024, 1, 1), two_year_counts(500))
+        kwargs = dict(threshold_min=50, today=datetime(2026, 1, 1), min_date=datetime(2025, 1, 1))
+        from_csv = analyze_csv(csv_file, 'q', 'd', 'c', **kwargs)
+
+        manifest = build_manifest(csv_file)
+        write_manifest(csv_file, manifest)
+        write_series_mirror(csv_file, manifest)
+        # Break the CSV header without changing its size or tail: only the
+        # mirror can still be read
+        with open(csv_file, 'r+') as f:
+            f.write('x')
+
+        assert analyze_csv(csv_file, 'q', 'd', 'c', **kwargs) == from_csv
+        assert 'ERROR' not in capsys.readouterr().out
+
+    def test_numpy_engine_matches_loop(self, tmp_path, monkeypatch):
+        """Test the vectorized engine flags exactly what the per-date loop does"""
+        pytest.importorskip('numpy')
+        import random
+        import past_low_anomalies
+        from cache_files import SeriesColumns
+        from past_low_anomalies import analyze_csv
+        rng = random.Random(3)
+        rows = []
+        day = datetime(2019, 11, 1)
+        while day < datetime(2025, 3, 1):
+            # Gaps, zero and restated (duplicate) days, and leap days
+            if rng.random() > 0.05:
+                rows.append((day.strftime('%Y%m%d'), rng.choice([0, 80, rng.randint(100, 1200)])))
+            if rng.random() < 0.01:
+                rows.append((day.strftime('%Y%m%d'), rng.randint(0, 1200)))
+            day += timedelta(days=1)
+        series = SeriesColumns()
+        series.extend_rows(rows)
+        kwargs = dict(threshold_min=100, today=datetime(2025, 2, 1, 9), min_date=datetime(2020, 2, 1))
+
+        vectorized = analyze_csv(None, 'q', 'd', 'c', series=series, **kwargs)
+        monkeypatch.setattr(past_low_anomalies, 'numpy', None)
+        past_low_anomalies._prior_year_indexes.clear()
+        looped = analyze_csv(None, 'q', 'd', 'c', series=series, **kwargs)
+
+        assert vectorized == looped
+        assert {a['reason'] for a in looped} == {'Below minimum threshold', 'Year-over-year decrease'}
+
+
+class TestDates:
+    """Tests for date parsing and naming"""
+
+    def test_parse_date_formats(self):
+        """Test both cache date formats parse and anything else is rejected"""
+        from past_low_anomalies import parse_date
+        assert parse_date('20240229') == datetime(2024, 2, 29)
+        assert parse_date('2024-02-29') == datetime(2024, 2, 29)
+        with pytest.raises(ValueError, match='Unable to parse date'):
+            parse_date('2023-02-29')
+
+    def test_day_names_match_strftime(self):
+        """Test the weekday table agrees with strftime for a whole week"""
+        from past_low_anomalies import get_day_name
+        for offset in range(7):
+            day = datetime(2025, 3, 1) + timedelta(days=offset)
+            assert get_day_name(day) == day.strftime('%A')
+
+
+class TestPriorYearIndex:
+    """Tests for the prior-year alignment index"""
+
+    @pytest.mark.parametrize('use_numpy', [True, False])
+    def test_matches_find_prior_year_date(self, monkeypatch, use_numpy):
+        """Test every date aligns to the row find_prior_year_date would pick"""
+        import random
+        import past_low_anomalies
+        from array import array
+        from past_low_anomalies import date_from_key, find_prior_year_date, prior_year_index
+        if use_numpy:
+            pytest.importorskip('numpy')
+        else:
+            monkeypatch.setattr(past_low_anomalies, 'numpy', None)
+        past_low_anomalies._prior_year_indexes.clear()
+        rng = random.Random(5)
+        dates = []
+        day = datetime(2019, 1, 1)
+        while day < datetime(2025, 1, 1):
+            if rng.random() > 0.1:
+                dates.append(int(day.strftime('%Y%m%d')))
+            day += timedelta(days=1)
+
+        index = prior_year_index(array('i', dates))
+
+        by_date = {date_from_key(key): i for i, key in enumerate(dates)}
+        for i, key in enumerate(dates):
+            prior_date = find_prior_year_date(date_from_key(key), by_date)
+            assert index.prior[i] == (by_date[prior_date] if prior_date else -1), key
+
+    def test_shared_calendar_is_aligned_once(self):
+        """Test queries with the same dates reuse one index"""
+        from array import array
+        from past_low_anomalies import prior_year_index
+        first = prior_year_index(array('i', [20230102, 20240101, 20240102]))
+        second = prior_year_index(memoryview(array('i', [20230102, 20240101, 20240102])))
+
+        assert second is first
+        assert list(first.prior) == [-1, 0, -1]
+        assert prior_year_index(array('i', [20240101])) is not first
+
+    def test_invalid_date_is_reported(self, tmp_path, capsys):
+        """Test an impossible date key is reported rather than misaligned"""
+        from past_low_anomalies import analyze_csv
+        csv_file = tmp_path / 'r.csv'
+        csv_file.write_text('playdatekey,count\n20250131,5\n20250231,6\n')
+
+        assert analyze_csv(str(csv_file), 'q', 'd', 'c', today=datetime(2026, 1, 1),
+                           min_date=datetime(2025, 1, 1)) == []
+        assert 'ERROR reading' in capsys.readouterr().out
+
+
+class TestAnalyzeQueries:
+    """Tests for analyzing several queries"""
+
+    def test_process_pool_matches_sequential_run(self, tmp_path, capsys):
+        """Test --workers gives the same anomalies and output order as one process"""
+        from past_low_anomalies import analyze_queries
+        queries = []
+        for i, drop_day in enumerate([400, 450, None, 500]):
+            name = f'pool_{i}'
+            queries.append({
+                'name': name, 'description': f'Query {i}',
+                'csv_file': write_series(tmp_path / f'{name}.csv', datetime(2024, 1, 1),
+                                         two_year_counts(drop_day)),
+                'date_column': 'playdatekey', 'count_column': 'count',
+                'anomaly_threshold_z': -2.5, 'anomaly_threshold_min': 50,
+            })
+        args = (queries, datetime(2026, 1, 1), datetime(2025, 1, 1), ['pool_1'])
+
+        sequential = analyze_queries(*args, workers=1)
+        sequential_out = capsys.readouterr().out
+        pooled = analyze_queries(*args, workers=3)
+        pooled_out = capsys.readouterr().out
+
+        assert pooled == sequential
+        assert [len(anomalies) for anomalies in pooled] == [1, 1, 0, 1]
+        # Same sections in the same order; only the parse timings differ
+        def untimed(out):
+            return [line for line in out.splitlines() if not line.startswith('Parsed ')]
+        assert untimed(pooled_out) == untimed(sequential_out)
+        assert pooled_out.index('pool_0') < pooled_out.index('pool_1') < pooled_out.index('pool_3')
+        assert 'STALE' in pooled_out
+
+
+class TestIncrementalAnalysis:
+    """Tests for analysis state carried between runs"""
+
+    def test_matches_full_run_after_new_and_restated_days(self, tmp_path, capsys):
+        """Test only changed dates are re-examined and the result equals a full run"""
+        from cache_files import analysis_path
+        from past_low_anomalies import analyze_csv
+        counts = two_year_counts(400)
+        csv_file = write_series(tmp_path / 'r.csv', datetime(2024, 1, 1), counts[:700])
+        kwargs = dict(threshold_min=50, min_date=datetime(2025, 1, 1))
+        first = analyze_csv(csv_file, 'q', 'd', 'c', today=datetime(2025, 12, 1),
+                            incremental=True, **kwargs)
+        assert [a['date_str'] for a in first] == ['20250204']
+        assert os.path.exists(analysis_path(csv_file))
+        capsys.readouterr()
+
+        # New days arrive, a 2024 day is restated (its 2025 partner is now a drop)
+        # and the flagged 2025 day is corrected
+        counts[100] = 5000
+        counts[400] = 1000
+        write_series(tmp_path / 'r.csv', datetime(2024, 1, 1), counts)
+        today = datetime(2026, 1, 1)
+        incremental = analyze_csv(csv_file, 'q', 'd', 'c', today=today, incremental=True, **kwargs)
+
+        assert incremental == analyze_csv(csv_file, 'q', 'd', 'c', today=today, **kwargs)
+        assert [a['date_str'] for a in incremental] == ['20250409']
+        out = capsys.readouterr().out
+        assert 'Incremental analysis: re-examined' in out
+        examined = int(out.split('re-examined ')[1].split(' ')[0])
+        assert examined < 200
+
+    def test_changed_thresholds_run_in_full(self, tmp_path, capsys):
+        """Test state saved under other thresholds is not reused"""
+        from past_low_anomalies import analyze_csv
+        csv_file = write_series(tmp_path / 'r.csv', datetime(2024, 1, 1), two_year_counts(400))
+        kwargs = dict(today=datetime(2026, 1, 1), min_date=datetime(2025, 1, 1))
+        analyze_csv(csv_file, 'q', 'd', 'c', threshold_min=50, incremental=True, **kwargs)
+        capsys.readouterr()
+
+        anomalies = analyze_csv(csv_file, 'q', 'd', 'c', threshold_min=2000, incremental=True, **kwargs)
+
+        assert len(anomalies) == 365
+        assert 'Incremental analysis' not in capsys.readouterr().out
+
+
+class TestZScoreDetector:
+    """Tests for the per-weekday rolling z-score detector"""
+
+    @staticmethod
+    def weekly_counts(days, seed=0):
+        """Noisy counts with busy weekends"""
+        import random
+        rng = random.Random(seed)
+        start = datetime(2024, 1, 1)
+        return [int(rng.gauss(2000 if (start + timedelta(days=i)).weekday() >= 5 else 1000, 20))
+                for i in range(days)]
+
+    def test_flags_day_far_below_its_weekday(self, tmp_path):
+        """Test a weekend day at weekday volume is flagged, with its baseline"""
+        from past_low_anomalies import analyze_csv
+        counts = self.weekly_counts(731)
+        counts[405] = 1000  # Sunday 2025-02-09 at a weekday's volume
+        csv_file = write_series(tmp_path / 'r.csv', datetime(2024, 1, 1), counts)
+
+        anomalies = analyze_csv(csv_file, 'q', 'd', 'c', threshold_z=-4, threshold_min=0,
+                                today=datetime(2026, 1, 1), min_date=datetime(2025, 1, 1),
+                                detector='zscore')
+
+        assert [a['date_str'] for a in anomalies] == ['20250209']
+        assert anomalies[0]['reason'] == 'Below day-of-week baseline'
+        assert anomalies[0]['z_score'] < -4
+        assert anomalies[0]['baseline_mean'] == pytest.approx(2000, abs=20)
+        assert anomalies[0]['prior_year_date'] == '20240211'
+
+    def test_repeated_date_counts_once(self):
+        """Test only the last row of a repeated date is scored and enters the window"""
+        from past_low_anomalies import analyze_csv
+        from cache_files import SeriesColumns
+        counts = self.weekly_counts(731)
+        counts[412] = 1000  # Sunday 2025-02-16 at a weekday's volume
+        rows = [((datetime(2024, 1, 1) + timedelta(days=i)).strftime('%Y%m%d'), count)
+                for i, count in enumerate(counts)]
+        clean, repeated = SeriesColumns(), SeriesColumns()
+        clean.extend_rows(rows)
+        # Sunday 2025-02-09 first stated at a weekday's volume, then corrected
+        repeated.extend_rows(rows[:405] + [('20250209', 1000)] + rows[405:])
+        kwargs = dict(threshold_z=-4, threshold_min=0, today=datetime(2026, 1, 1),
+                      min_date=datetime(2025, 1, 1), detector='zscore')
+
+        anomalies = analyze_csv(None, 'q', 'd', 'c', series=repeated, **kwargs)
+
+        assert [a['date_str'] for a in anomalies] == ['20250216']
+        assert anomalies == analyze_csv(None, 'q', 'd', 'c', series=clean, **kwargs)
+
+    def test_matches_recomputed_window_statistics(self, tmp_path):
+        """Test the rolling statistics equal each day's window recomputed from scratch"""
+        import statistics
+        from past_low_anomalies import _zscore_hits
+        from cache_files import read_series
+        counts = self.weekly_counts(400, seed=1)
+        counts[200:210] = [900] * 10
+        series = read_series(write_series(tmp_path / 'r.csv', datetime(2024, 1, 1), counts))
+
+        hits, baselines = _zscore_hits(series, -2, 0, datetime(2026, 1, 1),
+                                       datetime(2024, 1, 1), window=10)
+
+        expected = {}
+        for i in range(len(counts)):
+            history = counts[i % 7:i:7][-10:]
+            if len(history) >= 8:
+                z_score = (counts[i] - statistics.mean(history)) / statistics.stdev(history)
+                if z_score < -2:
+                    expected[i] = z_score
+        assert [i for i, _ in hits] == sorted(expected)
+        for i, z_score in expected.items():
+            assert baselines[i][0] == pytest.approx(z_score)
@@ -0,0 +1,171 @@
+"""
+Tests for queries.json loading and validation
+"""
+import json
+import pytest
+
+
+def write_queries(path, queries):
+    """Write a queries.json file"""
+    path.write_text(json.dumps({'queries': queries}))
+    return str(path)
+
+
+def make_query(name, **overrides):
+    """Build a minimal valid query definition"""
+    query = {
+        'name': name,
+        'csv_file': f'{name}.csv',
+        'date_column': 'playdatekey',
+        'count_column': 'rounds_total',
+    }
+    query.update(overrides)
+    return query
+
+
+class TestLoadQueries:
+    """Tests for load_queries"""
+
+    def test_defaults_are_applied(self, tmp_path):
+        """Test optional fields get their defaults"""
+        from query_loader import load_queries
+        queries = load_queries(write_queries(tmp_path / 'queries.json', [make_query('a')]))
+
+        assert queries[0]['description'] == 'a'
+        assert queries[0]['date_param_type'] == 'str'
+        assert queries[0]['anomaly_threshold_min'] == 5000
+        assert queries[0]['detector'] == 'yoy'
+
+    def test_missing_required_field_raises(self, tmp_path):
+        """Test a query without csv_file is rejected"""
+        from query_loader import load_queries
+        query = make_query('a')
+        del query['csv_file']
+
+        with pytest.raises(ValueError, match='csv_file'):
+            load_queries(write_queries(tmp_path / 'queries.json', [query]))
+
+    def test_invalid_date_param_type_raises(self, tmp_path):
+        """Test unknown date parameter types are rejected"""
+        from query_loader import load_queries
+        path = write_queries(tmp_path / 'queries.json', [make_query('a', date_param_type='datetime2')])
+
+        with pytest.raises(ValueError, match='date_param_type'):
+            load_queries(path)
+
+    def test_compression_suffix_is_added_to_csv_file(self, tmp_path):
+        """Test a compressed query's cache file gets the codec's suffix"""
+        from query_loader import load_queries
+        queries = load_queries(write_queries(tmp_path / 'queries.json', [
+            make_query('a', compression='gzip'),
+            make_query('b', compression='lzma', csv_file='b.csv.xz'),
+        ]))
+
+        assert queries[0]['csv_file'] == 'a.csv.gz'
+        assert queries[1]['csv_file'] == 'b.csv.xz'
+
+    def test_invalid_compression_raises(self, tmp_path):
+        """Test unknown codecs are rejected"""
+        from query_loader import load_queries
+        path = write_queries(tmp_path / 'queries.json', [make_query('a', compression='zip')])
+
+        with pytest.raises(ValueError, match='compression'):
+            load_queries(path)
+
+    @pytest.mark.parametrize('overrides, field', [
+        ({'detector': 'iqr'}, 'detector'),
+        ({'detector': 'zscore', 'zscore_window': 4}, 'zscore_window'),
+    ])
+    def test_invalid_detector_settings_raise(self, tmp_path, overrides, field):
+        """Test unknown detectors and too-short z-score windows are rejected"""
+        from query_loader import load_queries
+        path = write_queries(tmp_path / 'queries.json', [make_query('a', **overrides)])
+
+        with pytest.raises(ValueError, match=field):
+            load_queries(path)
+
+
+def factbooking_query(name, source):
+    """FactBooking query for one sourcesystemkey, as in queries_template.json"""
+    return make_query(
+        name,
+        base_query=("SELECT playdatekey, SUM(NetRoundsTotal) as rounds_total FROM dbo.FactBooking "
+                    f"WHERE sourcesystemkey = {source} GROUP BY playdatekey"),
+        filtered_query=("SELECT playdatekey, SUM(NetRoundsTotal) as rounds_total FROM dbo.FactBooking "
+                        f"WHERE sourcesystemkey = {source} AND {{where_clause}} GROUP BY playdatekey"),
+        order_by="ORDER BY playdatekey",
+        date_param_type='int',
+    )
+
+
+class TestQueryFusion:
+    """Tests for fusing queries that share a source table"""
+
+    def test_queries_differing_in_one_predicate_are_fused(self):
+        """Test the two FactBooking source queries become one grouped statement"""
+        from query_loader import find_fusion_groups
+        groups = find_fusion_groups([factbooking_query('ezl', 34), factbooking_query('gn', 1)])
+
+        assert len(groups) == 1
+        group = groups[0]
+        assert group['fuse_column'] == 'sourcesystemkey'
+        assert list(group['members']) == [34, 1]
+        assert group['fuse_integer'] is True
+        assert group['filtered_query'] == (
+            "SELECT sourcesystemkey, playdatekey, SUM(NetRoundsTotal) as rounds_total "
+            "FROM dbo.FactBooking WHERE sourcesystemkey IN (34, 1) AND {where_clause} "
+            "GROUP BY sourcesystemkey, playdatekey")
+
+    def test_string_literals_are_keyed_by_normalized_text(self):
+        """Test string members are keyed stripped and case-folded, like the rows they match"""
+        from query_loader import find_fusion_groups, fuse_key
+        queries = [
+            make_query(n, base_query=f"SELECT {{date_column}}, SUM(n) FROM t WHERE k = '{v}' "
+                                     f"GROUP BY {{date_column}}",
+                       filtered_query=f"SELECT {{date_column}}, SUM(n) FROM t WHERE k = '{v}' "
+                                      f"AND {{where_clause}} GROUP BY {{date_column}}")
+            for n, v in [('a', 'ABC '), ('b', 'xy')]
+        ]
+
+        group = find_fusion_groups(queries)[0]
+
+        assert list(group['members']) == ['abc', 'xy']
+        assert fuse_key('abc       ', group['fuse_integer']) == 'abc'
+
+    def test_non_integer_literals_are_not_fused(self):
+        """Test decimal literals, and literals equal once normalized, stay separate"""
+        from query_loader import find_fusion_groups
+        decimals = [factbooking_query('ezl', '1.0'), factbooking_query('gn', '2.0')]
+        same = [factbooking_query('ezl', 1), factbooking_query('gn', '01')]
+
+        assert find_fusion_groups(decimals) == []
+        assert find_fusion_groups(same) == []
+
+    def test_queries_on_different_tables_are_not_fused(self):
+        """Test queries whose templates differ elsewhere stay separate"""
+        from query_loader import find_fusion_groups
+        other = factbooking_query('cust', 1)
+        other['base_query'] = other['base_query'].replace('FactBooking', 'DimCustomer')
+        other['filtered_query'] = other['filtered_query'].replace('FactBooking', 'DimCustomer')
+
+        assert find_fusion_groups([factbooking_query('ezl', 34), other]) == []
+
+    def test_ungrouped_queries_are_not_fused(self):
+        """Test templates without GROUP BY on the date column are left alone"""
+        from query_loader import find_fusion_groups
+        queries = [
+            make_query(n, base_query=f"SELECT {{date_column}}, {{count_column}} FROM t WHERE k = {v}",
+                       filtered_query=f"SELECT {{date_column}}, {{count_column}} FROM t "
+                                      f"WHERE k = {v} AND {{where_clause}}")
+            for n, v in [('a', 1), ('b', 2)]
+        ]
+
+        assert find_fusion_groups(queries) == []
+
+    def test_fuse_queries_keeps_order(self):
+        """Test a fusion group takes its first member's position"""
+        from query_loader import fuse_queries
+        queries = [make_query('first'), factbooking_query('ezl', 34),
+                   make_query('middle'), factbooking_query('gn', 1)]
+
+        assert [w['name'] for w in fuse_queries(queries)] == ['first', 'ezl+gn', 'middle']
@@ -0,0 +1,67 @@
+"""
+Tests for warehouse statement instrumentation
+"""
+import json
+import pytest
+
+from tests.test_db_query import make_db
+
+
+def read_log(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestStatementMetrics:
+    """Tests for per-statement timing records"""
+
+    def test_statement_is_logged_with_phases(self, tmp_path):
+        """Test a pull writes one labelled JSONL record with rows and timings"""
+        from query_metrics import QueryMetrics, labelled
+        metrics = QueryMetrics(str(tmp_path / 'metrics.jsonl'))
+        db, _ = make_db([(20240101, 5), (20240102, 60)], metrics=metrics)
+
+        with labelled('ezlinks_rounds'):
+            db.query_rounds_data('t', start_date='20240101')
+
+        [record] = read_log(metrics.path)
+        assert record['query'] == 'ezlinks_rounds'
+        assert record['rows'] == 2
+        assert record['bytes'] == len('202401015') + len('2024010260')
+        assert record['status'] == 'ok'
+        assert record['run_id'] == metrics.run_id
+        for phase in ('connect_s', 'execute_s', 'first_row_s', 'fetch_s', 'total_s'):
+            assert record[phase] >= 0
+
+    def test_abandoned_and_cancelled_statements_are_logged(self, tmp_path):
+        """Test statements that end early record why"""
+        from query_metrics import QueryMetrics
+        metrics = QueryMetrics(str(tmp_path / 'metrics.jsonl'))
+        db, _ = make_db([(20240100 + d, d) for d in range(1, 9)], fetch_batch_size=2,
+                        metrics=metrics)
+
+        rows = db.iter_rounds_data('t')
+        next(rows)
+        rows.close()
+        db.cancel()
+        db.query_rounds_data('t')
+
+        assert [r['status'] for r in read_log(metrics.path)] == ['abandoned', 'cancelled']
+
+    def test_summary_flags_query_slower_than_usual(self, tmp_path):
+        """Test the run summary compares each query with its earlier runs"""
+        from query_metrics import QueryMetrics, labelled
+        path = str(tmp_path / 'metrics.jsonl')
+        with open(path, 'w') as f:
+            for run in range(3):
+                f.write(json.dumps({'run_id': f'old{run}', 'query': 'q', 'total_s': 2.0}) + '\n')
+
+        metrics = QueryMetrics(path)
+        with labelled('q'):
+            metrics.record('SELECT 1', {'first_row_s': 5.0, 'fetch_s': 5.0, 'total_s': 10.0,
+                                        'rows': 100})
+
+        [entry] = metrics.summary()
+        assert entry['usual_s'] == 2.0
+        assert entry['slower'] is True
+        assert entry['rows_per_s'] == 10.0
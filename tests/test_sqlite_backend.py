@@ -0,0 +1,165 @@
+"""
+Tests for the local SQLite stand-in for the warehouse
+"""
+import json
+import sqlite3
+from pathlib import Path
+import pytest
+
+from db_query import EZLinksRoundsDB
+
+
+ROOT_DIR = Path(__file__).parent.parent
+
+with open(ROOT_DIR / 'queries_template.json') as f:
+    TEMPLATE = json.load(f)['queries']
+
+
+def template(name):
+    return next(q for q in TEMPLATE if q['name'] == name)
+
+
+@pytest.fixture(scope='module')
+def standin(tmp_path_factory):
+    from sqlite_backend import seed_database
+    path = str(tmp_path_factory.mktemp('standin') / 'standin.db')
+    seed_database(path, '20240101', '20240310')
+    return path
+
+
+def make_standin_db(path, **backend_args):
+    from sqlite_backend import SQLiteBackend
+    backend = SQLiteBackend(path, **backend_args)
+    db = EZLinksRoundsDB('sqlite', path, connection_factory=backend)
+    assert db.connect()
+    return db
+
+
+class TestSQLiteBackend:
+    """Tests for running queries.json templates against the stand-in"""
+
+    def test_seed_is_deterministic(self, tmp_path):
+        """Test the same arguments seed the same rows"""
+        from sqlite_backend import seed_database
+        first = seed_database(str(tmp_path / 'a.db'), '20240101', '20240131', scale=0.1)
+        second = seed_database(str(tmp_path / 'b.db'), '20240101', '20240131', scale=0.1)
+        assert first == second
+        assert first[0] > 0 and first[1] > 0
+
+    def test_filtered_int_query(self, standin):
+        """Test a FactBooking template returns one row per day in range"""
+        q = template('ezlinks_rounds')
+        db = make_standin_db(standin)
+        rows = db.query_rounds_data('N/A', q['date_column'], q['count_column'],
+                                    start_date='20240201', end_date='20240229',
+                                    base_query=q['base_query'], filtered_query=q['filtered_query'],
+                                    order_by=q['order_by'], date_param_type=q['date_param_type'])
+        db.disconnect()
+
+        dates = [row['playdatekey'] for row in rows]
+        assert dates == sorted(dates)
+        assert dates[0] == '20240201' and dates[-1] == '20240229'
+        assert all(row['count'] > 0 for row in rows)
+
+    def test_date_param_query(self, standin):
+        """Test DATE parameters bind against the ISO date column"""
+        q = template('ezlinks_customers')
+        db = make_standin_db(standin)
+        rows = db.query_rounds_data('N/A', q['date_column'], q['count_column'],
+                                    start_date='20240301',
+                                    base_query=q['base_query'], filtered_query=q['filtered_query'],
+                                    order_by=q['order_by'], date_param_type=q['date_param_type'])
+        latest = db.get_latest_date('N/A', q['date_column'], max_date_query=q['max_date_query'])
+        db.disconnect()
+
+        assert len(rows) == 10
+        assert latest is not None and latest.replace('-', '').startswith('20240310')
+
+    def test_checksum_query(self, standin):
+        """Test checksum_query templates run via the T-SQL checksum stand-ins"""
+        q = template('ezlinks_rounds')
+        db = make_standin_db(standin)
+        checksums = db.get_month_checksums(q['checksum_query'])
+        assert db.get_month_checksums(q['checksum_query']) == checksums
+        db.disconnect()
+
+        assert sorted(checksums) == ['202401', '202402', '202403']
+
+        with sqlite3.connect(standin) as conn:
+            conn.execute("UPDATE FactBooking SET NetRoundsTotal = NetRoundsTotal + 1 "
+                         "WHERE bookingKey = (SELECT MIN(bookingKey) FROM FactBooking "
+                         "WHERE sourcesystemkey = 34 AND playdatekey >= 20240301)")
+        db = make_standin_db(standin)
+        changed = db.get_month_checksums(q['checksum_query'])
+        db.disconnect()
+
+        assert changed['202403'] != checksums['202403']
+        assert changed['202401'] == checksums['202401']
+
+    def test_standin_queries_run(self, standin):
+        """Test every query in queries_standin.json runs against the stand-in"""
+        from query_loader import load_queries
+        db = make_standin_db(standin)
+        for q in load_queries(str(ROOT_DIR / 'queries_standin.json')):
+            rows = db.query_rounds_data('N/A', q['date_column'], q['count_column'],
+                                        start_date='20240301', base_query=q['base_query'],
+                                        filtered_query=q['filtered_query'],
+                                        order_by=q['order_by'],
+                                        date_param_type=q.get('date_param_type', 'str'))
+            assert rows, q['name']
+            assert db.get_latest_date('N/A', q['date_column'],
+                                      max_date_query=q['max_date_query']) is not None
+        db.disconnect()
+
+    def test_deleted_duplicate_bookings_are_repulled(self, tmp_path):
+        """Test deleting two identical bookings changes the month checksum"""
+        from sqlite_backend import seed_database
+        from cache_files import read_series
+        path = str(tmp_path / 'standin.db')
+        seed_database(path, '20240101', '20240331', scale=0.2)
+        q = template('ezlinks_rounds')
+        csv_file = str(tmp_path / 'ezlrounds.csv')
+        args = dict(date_column=q['date_column'], count_column=q['count_column'],
+                    base_query=q['base_query'], filtered_query=q['filtered_query'],
+                    order_by=q['order_by'], date_param_type=q['date_param_type'],
+                    checksum_query=q['checksum_query'])
+        db = make_standin_db(path)
+        db.refresh_full_csv('N/A', csv_file, **args)
+
+        with sqlite3.connect(path) as conn:
+            day, first, second = conn.execute(
+                "SELECT a.playdatekey, a.bookingKey, MIN(b.bookingKey) "
+                "FROM FactBooking a JOIN FactBooking b ON b.playdatekey = a.playdatekey "
+                "AND b.sourcesystemkey = a.sourcesystemkey "
+                "AND b.NetRoundsTotal = a.NetRoundsTotal AND b.bookingKey > a.bookingKey "
+                "WHERE a.sourcesystemkey = 34 AND a.playdatekey = 20240315").fetchone()
+            conn.execute("DELETE FROM FactBooking WHERE bookingKey IN (?, ?)", (first, second))
+            expected = conn.execute("SELECT SUM(NetRoundsTotal) FROM FactBooking "
+                                    "WHERE sourcesystemkey = 34 AND playdatekey = 20240315"
+                                    ).fetchone()[0]
+        db.refresh_full_csv('N/A', csv_file, **args)
+        db.disconnect()
+
+        series = read_series(csv_file)
+        assert series.counts[list(series.dates).index(day)] == expected
+
+    def test_injected_failure(self, standin):
+        """Test injected failures surface as pyodbc.Error like a dropped link"""
+        import pyodbc
+        from sqlite_backend import SQLiteBackend
+        backend = SQLiteBackend(standin, failure_rate=1.0)
+        with pytest.raises(pyodbc.Error):
+            backend()
+
+    def test_statement_timeout(self, standin):
+        """Test connection.timeout aborts a long statement with HYT00"""
+        import pyodbc
+        from sqlite_backend import SQLiteBackend
+        conn = SQLiteBackend(standin)()
+        conn.timeout = 1e-9
+        cursor = conn.cursor()
+        with pytest.raises(pyodbc.Error) as excinfo:
+            cursor.execute("SELECT COUNT(*) FROM dbo.FactBooking a, dbo.FactBooking b")
+            cursor.fetchone()
+        assert 'HYT00' in str(excinfo.value)
+        conn.close()
@@ -0,0 +1,158 @@
+"""
+Tests for the update_and_analyze refresh driver
+"""
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+
+class TestParallelRefresh:
+    """Tests for --parallel query refresh"""
+
+    def test_parallel_output_is_not_interleaved(self, capsys):
+        """Test each query's output is printed as one block in config order"""
+        import update_and_analyze
+
+        def fake_refresh(db, query, **kwargs):
+            for step in range(3):
+                print(f"{query['name']} step {step}")
+                time.sleep(query['delay'])
+
+        queries = [{'name': 'slow', 'delay': 0.02}, {'name': 'fast', 'delay': 0}]
+        with patch.object(update_and_analyze, 'refresh_query', side_effect=fake_refresh):
+            update_and_analyze.refresh_queries_parallel(MagicMock(), queries, workers=2)
+
+        lines = [l for l in capsys.readouterr().out.splitlines() if 'step' in l]
+        assert lines == [f"slow step {i}" for i in range(3)] + [f"fast step {i}" for i in range(3)]
+
+    def test_parallel_failure_is_reported_per_query(self, capsys):
+        """Test one failing query does not abort the others"""
+        import update_and_analyze
+
+        def fake_refresh(db, query, **kwargs):
+            if query['name'] == 'bad':
+                raise RuntimeError('boom')
+            print(f"{query['name']} done")
+
+        queries = [{'name': 'bad', 'csv_file': 'bad.csv'}, {'name': 'good', 'csv_file': 'good.csv'}]
+        db = MagicMock()
+        with patch.object(update_and_analyze, 'refresh_query', side_effect=fake_refresh):
+            update_and_analyze.refresh_queries_parallel(db, queries, workers=2)
+
+        out = capsys.readouterr().out
+        assert 'ERROR: Query bad failed: boom' in out
+        assert 'good done' in out
+        db.mark_stale.assert_called_once_with('bad.csv')
+
+
+class TestAsyncRefresh:
+    """Tests for --async query refresh"""
+
+    @pytest.fixture(autouse=True)
+    def driver_threads(self):
+        """Release blocked updates and join the driver threads before the next test"""
+        self.release = threading.Event()
+        self.adbs = []
+        yield
+        self.release.set()
+        for adb in self.adbs:
+            adb._executor.shutdown(wait=True)
+
+    def make_adb(self, latest, manifest, blocked=False):
+        from async_db_query import AsyncEZLinksRoundsDB
+
+        adb = AsyncEZLinksRoundsDB('server', 'db', max_workers=2)
+        adb.db = MagicMock(cancelled=False, stale_caches=set())
+        adb.db.get_latest_date.return_value = latest
+        self.adbs.append(adb)
+
+        def slow_update(**kwargs):
+            if blocked:
+                self.release.wait()
+            print("updated")
+        adb.db.update_csv.side_effect = slow_update
+        return adb, patch('update_and_analyze.load_manifest', return_value=manifest)
+
+    def query(self, name='q'):
+        return {'name': name, 'csv_file': f'{name}.csv', 'date_column': 'playdatekey',
+                'count_column': 'count', 'max_date_query': 'SELECT MAX(x) FROM t'}
+
+    def test_up_to_date_cache_skips_pull(self, capsys):
+        """Test the max-date probe skips queries the warehouse has nothing newer for"""
+        import asyncio
+        import update_and_analyze
+
+        adb, patched = self.make_adb('2026-03-01', {'max_date': '20260301'})
+        with patched:
+            failed = asyncio.run(update_and_analyze.refresh_queries_async(adb, [self.query()]))
+
+        assert failed == []
+        adb.db.update_csv.assert_not_called()
+        assert 'Up to date' in capsys.readouterr().out
+
+    def test_newer_data_is_pulled(self, capsys):
+        """Test the query is updated when the warehouse is ahead of the cache"""
+        import asyncio
+        import update_and_analyze
+
+        adb, patched = self.make_adb('20260302', {'max_date': '20260301'})
+        with patched:
+            asyncio.run(update_and_analyze.refresh_queries_async(adb, [self.query()]))
+
+        adb.db.update_csv.assert_called_once()
+        assert 'updated' in capsys.readouterr().out
+
+    def test_timeout_is_reported_per_query(self, capsys):
+        """Test a slow query times out without affecting the others"""
+        import asyncio
+        import update_and_analyze
+
+        adb, patched = self.make_adb('20260302', {'max_date': '20260301'}, blocked=True)
+        with patched:
+            failed = asyncio.run(update_and_analyze.refresh_queries_async(
+                adb, [self.query('slow')], query_timeout=0.05))
+
+        assert failed == ['slow']
+        assert 'ERROR: Query slow timed out' in capsys.readouterr().out
+
+
+class TestRunDeadline:
+    """Tests for --deadline"""
+
+    def test_queries_after_deadline_are_skipped_and_stale(self, capsys):
+        """Test queries not started before the deadline are reported stale"""
+        import update_and_analyze
+
+        db = MagicMock(cancelled=True, stale_caches=set())
+        db.mark_stale.side_effect = db.stale_caches.add
+        query = {'name': 'late', 'csv_file': 'late.csv'}
+
+        update_and_analyze.refresh_query(db, query)
+
+        db.update_csv.assert_not_called()
+        assert update_and_analyze.report_stale(db, [query]) == ['late']
+        assert 'STALE (cache not refreshed this run): late' in capsys.readouterr().out
+
+    def test_deadline_run_is_not_reported_successful(self, capsys):
+        """Test the summary lists stale queries instead of claiming success"""
+        import update_and_analyze
+
+        db = MagicMock(cancelled=True, stale_caches={'late.csv'})
+        work = [{'name': 'done', 'csv_file': 'done.csv'}, {'name': 'late', 'csv_file': 'late.csv'}]
+
+        assert update_and_analyze.report_update(db, work) == ['late']
+
+        out = capsys.readouterr().out
+        assert 'successfully' not in out
+        assert 'did not finish before the run deadline' in out
+        assert 'STALE (cache not refreshed this run): late' in out
+
+    def test_finished_run_is_reported_successful(self, capsys):
+        """Test success is reported when every query finished"""
+        import update_and_analyze
+
+        db = MagicMock(cancelled=False, stale_caches=set())
+
+        assert update_and_analyze.report_update(db, [{'name': 'q', 'csv_file': 'q.csv'}]) == []
+        assert 'CSV files updated successfully!' in capsys.readouterr().out